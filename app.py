@@ -1,10 +1,11 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session
+from flask import Flask, render_template, redirect, url_for, flash, request
 from flask_login import LoginManager, current_user
 import os
 import datetime
-import requests
+import logging
 from dotenv import load_dotenv
-from models.user import User
+from services import api_client, applicants, matchmakers, dashboard_stats, images, metrics, assets, submissions, sessions, templating, conditional, applicant_changes, applicant_index, prescreen, compatibility
+from services.dashboard_stats import dashboard_stats as stats_cache
 
 
 # Load environment variables
@@ -12,16 +13,156 @@ from models.user import User
 load_dotenv()
 
 
+# Logging (set LOG_LEVEL=DEBUG to see backend payload details)
+
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
+
 # Initialize Flask app
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 app.config['API_URL'] = os.getenv('API_URL', 'https://theqlick.chaya.dev/api')
 
+# Server-side sessions: the cookie only carries a random session id.
+# SESSION_BACKEND is memory (single worker only), filesystem or sqlite.
+app.config['SESSION_BACKEND'] = os.getenv('SESSION_BACKEND', 'sqlite')
+app.config['SESSION_SQLITE_PATH'] = os.getenv('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.sqlite3'))
+app.config['SESSION_FILE_FOLDER'] = os.getenv('SESSION_FILE_FOLDER', os.path.join(app.instance_path, 'sessions'))
+app.config['SESSION_MEMORY_MAX_ENTRIES'] = int(os.getenv('SESSION_MEMORY_MAX_ENTRIES', 10000))
+# Sessions expire this long after their last write (extended while the user is active)
+app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(seconds=int(os.getenv('SESSION_LIFETIME', 7 * 24 * 3600)))
+
+# Backend client: keep-alive pool per worker, timeouts in seconds
+app.config['API_POOL_SIZE'] = int(os.getenv('API_POOL_SIZE', 10))
+app.config['API_CONNECT_TIMEOUT'] = float(os.getenv('API_CONNECT_TIMEOUT', 3.05))
+app.config['API_READ_TIMEOUT'] = float(os.getenv('API_READ_TIMEOUT', 10))
+app.config['API_GET_RETRIES'] = int(os.getenv('API_GET_RETRIES', 2))
+app.config['API_RETRY_BACKOFF'] = float(os.getenv('API_RETRY_BACKOFF', 0.3))
+# Identical GETs in flight at the same time (same matchmaker, path and params) share one backend call
+app.config['API_COALESCE_GETS'] = os.getenv('API_COALESCE_GETS', 'true').lower() == 'true'
+# Bulk applicant endpoint, e.g. "/users?ids={ids}" (comma-separated ids); unset = one /user/{id} call per applicant
+app.config['API_USER_BATCH_PATH'] = os.getenv('API_USER_BATCH_PATH', '')
+# Circuit breaker per endpoint group (first path segment, e.g. /matchmaker/...): opens when
+# BREAKER_FAILURE_RATE of at least BREAKER_MIN_CALLS calls in BREAKER_WINDOW seconds failed,
+# then fails fast for BREAKER_OPEN_SECONDS before letting a trial call through
+app.config['BREAKER_FAILURE_RATE'] = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+app.config['BREAKER_MIN_CALLS'] = int(os.getenv('BREAKER_MIN_CALLS', 5))
+app.config['BREAKER_WINDOW'] = float(os.getenv('BREAKER_WINDOW', 30))
+app.config['BREAKER_OPEN_SECONDS'] = float(os.getenv('BREAKER_OPEN_SECONDS', 15))
+# Overall time budget for pages that fan out several backend calls
+app.config['API_PAGE_DEADLINE'] = float(os.getenv('API_PAGE_DEADLINE', 8))
+app.config['PROFILE_PAGE_DEADLINE'] = float(os.getenv('PROFILE_PAGE_DEADLINE', 5))
+
+# Per-matchmaker cache of /user/{id} records
+app.config['USER_CACHE_TTL'] = float(os.getenv('USER_CACHE_TTL', 60))
+app.config['USER_CACHE_MAX_ENTRIES'] = int(os.getenv('USER_CACHE_MAX_ENTRIES', 2000))
+app.config['USER_CACHE_MAX_BYTES'] = int(os.getenv('USER_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+# Per-matchmaker in-memory index of /matchmaker/users, for filtering and sorting the applicants list;
+# rebuilt from the backend when it expires, updated in place when applicants are created or edited here
+app.config['APPLICANT_INDEX_TTL'] = float(os.getenv('APPLICANT_INDEX_TTL', 300))
+app.config['APPLICANT_INDEX_MAX_ENTRIES'] = int(os.getenv('APPLICANT_INDEX_MAX_ENTRIES', 500))
+app.config['APPLICANT_INDEX_MAX_BYTES'] = int(os.getenv('APPLICANT_INDEX_MAX_BYTES', 64 * 1024 * 1024))
+# Applicants created or edited here are logged in a file shared by the host's workers, which update
+# or drop their cached records and indexes from it
+app.config['APPLICANT_CHANGES_PATH'] = os.getenv('APPLICANT_CHANGES_PATH', os.path.join(app.instance_path, 'applicant_changes.sqlite3'))
+
+# Per-matchmaker cache of /matches/compatibility/{a}/{b} payloads, shared by the compatibility page and matrix;
+# a matrix shows up to MAX_APPLICANTS applicants, its pairs fetched by at most WORKERS calls at a time per worker
+# (and per matrix). Both orders of a pair are fetched, n * (n - 1) calls; a matrix gets CALL_SECONDS for each
+# round of WORKERS calls it needs (50 uncached applicants: 307 rounds, 77 s), then missing pairs show as unavailable
+app.config['COMPATIBILITY_CACHE_TTL'] = float(os.getenv('COMPATIBILITY_CACHE_TTL', 300))
+app.config['COMPATIBILITY_CACHE_MAX_ENTRIES'] = int(os.getenv('COMPATIBILITY_CACHE_MAX_ENTRIES', 20000))
+app.config['COMPATIBILITY_CACHE_MAX_BYTES'] = int(os.getenv('COMPATIBILITY_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+app.config['COMPATIBILITY_MATRIX_WORKERS'] = int(os.getenv('COMPATIBILITY_MATRIX_WORKERS', 8))
+app.config['COMPATIBILITY_MATRIX_MAX_APPLICANTS'] = int(os.getenv('COMPATIBILITY_MATRIX_MAX_APPLICANTS', 50))
+app.config['COMPATIBILITY_MATRIX_CALL_SECONDS'] = float(os.getenv('COMPATIBILITY_MATRIX_CALL_SECONDS', 0.25))
+
+# Local pre-screening of the indexed applicants against each other's hard preferences (what-if previews);
+# how many of the best-scoring fits a preview lists, and the memory all matchmakers' encoded engines may use
+app.config['PRESCREEN_PREVIEW_LIMIT'] = int(os.getenv('PRESCREEN_PREVIEW_LIMIT', 50))
+app.config['PRESCREEN_MAX_BYTES'] = int(os.getenv('PRESCREEN_MAX_BYTES', 64 * 1024 * 1024))
+
+# Dashboard stats are kept warm in the background while a matchmaker is active
+app.config['STATS_REFRESH_INTERVAL'] = float(os.getenv('STATS_REFRESH_INTERVAL', 60))
+app.config['STATS_IDLE_TIMEOUT'] = float(os.getenv('STATS_IDLE_TIMEOUT', 30 * 60))
+# Threads for those refreshes, separate from the API_POOL_SIZE threads that page fan-outs use
+app.config['STATS_REFRESH_WORKERS'] = int(os.getenv('STATS_REFRESH_WORKERS', 2))
+
+# Matches list paging (passed through to the backend as limit/offset)
+app.config['MATCHES_PAGE_SIZE'] = int(os.getenv('MATCHES_PAGE_SIZE', 50))
+app.config['MATCHES_MAX_PAGE_SIZE'] = int(os.getenv('MATCHES_MAX_PAGE_SIZE', 200))
+# The backend pages an applicant's matches by limit only, so page N of /matches/user/<id>/data
+# asks it for N pages; this caps how many matches deep that can go
+app.config['USER_MATCHES_MAX_DEPTH'] = int(os.getenv('USER_MATCHES_MAX_DEPTH', 1000))
+# Applicants list: first page rendered with the page, the rest loaded from /users/data while scrolling
+app.config['USERS_PAGE_SIZE'] = int(os.getenv('USERS_PAGE_SIZE', 30))
+app.config['USERS_MAX_PAGE_SIZE'] = int(os.getenv('USERS_MAX_PAGE_SIZE', 200))
+
+# Public matchmaker directory is refreshed in the background after this many seconds
+app.config['MATCHMAKER_DIRECTORY_REFRESH'] = float(os.getenv('MATCHMAKER_DIRECTORY_REFRESH', 300))
+
 # Folder for uploaded applicant pictures
 app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, "static/uploads/profile_pictures")
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Uploads: whole request bodies are capped before they are read; pictures are capped while streaming to disk
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 6 * 1024 * 1024))
+app.config['PROFILE_PICTURE_MAX_BYTES'] = 5 * 1024 * 1024
+
+# Public applications are queued on local disk and delivered to the backend in the background
+app.config['SUBMISSION_QUEUE_PATH'] = os.getenv('SUBMISSION_QUEUE_PATH', os.path.join(app.instance_path, 'submissions.sqlite3'))
+app.config['SUBMISSION_SPOOL_FOLDER'] = os.getenv('SUBMISSION_SPOOL_FOLDER', os.path.join(app.instance_path, 'submissions'))
+app.config['SUBMISSION_WORKERS'] = int(os.getenv('SUBMISSION_WORKERS', 2))
+app.config['SUBMISSION_MAX_ATTEMPTS'] = int(os.getenv('SUBMISSION_MAX_ATTEMPTS', 12))
+# Retry delay doubles per attempt from SUBMISSION_RETRY_BACKOFF up to SUBMISSION_MAX_BACKOFF seconds
+app.config['SUBMISSION_RETRY_BACKOFF'] = float(os.getenv('SUBMISSION_RETRY_BACKOFF', 5))
+app.config['SUBMISSION_MAX_BACKOFF'] = float(os.getenv('SUBMISSION_MAX_BACKOFF', 600))
+
+# Static files are copied under content-hashed names (with gzip/brotli variants) at startup;
+# in debug mode templates link the plain files so CSS/JS edits show up without a restart
+app.config['ASSET_FINGERPRINTING'] = os.getenv('ASSET_FINGERPRINTING', 'true').lower() == 'true'
+app.config['ASSET_BUILD_FOLDER'] = os.getenv('ASSET_BUILD_FOLDER', os.path.join(app.instance_path, 'assets'))
+
+# Compiled templates are kept on disk and shared by workers (unset TEMPLATE_CACHE_FOLDER to disable);
+# all templates are compiled at startup unless TEMPLATE_PRECOMPILE=false
+app.config['TEMPLATE_CACHE_FOLDER'] = os.getenv('TEMPLATE_CACHE_FOLDER', os.path.join(app.instance_path, 'jinja_cache'))
+app.config['TEMPLATE_PRECOMPILE'] = os.getenv('TEMPLATE_PRECOMPILE', 'true').lower() == 'true'
+# Data pages (matches, applicants) carry an ETag from the backend data and answer 304 when unchanged;
+# backend ETags are remembered (up to this many) to revalidate upstream as well
+app.config['CONDITIONAL_GET'] = os.getenv('CONDITIONAL_GET', 'true').lower() == 'true'
+app.config['CONDITIONAL_VALIDATOR_MAX_ENTRIES'] = int(os.getenv('CONDITIONAL_VALIDATOR_MAX_ENTRIES', 10000))
+# Rendered {% cache %} blocks (e.g. match cards) are reused for FRAGMENT_CACHE_TTL seconds; 0 disables.
+# Cached cards cost memory that a streamed matches list otherwise does not hold, so one request stores
+# at most FRAGMENT_CACHE_MAX_PER_REQUEST new blocks: the first pages of a list, not all of a long one
+app.config['FRAGMENT_CACHE_TTL'] = float(os.getenv('FRAGMENT_CACHE_TTL', 60))
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 20000))
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = int(os.getenv('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+app.config['FRAGMENT_CACHE_MAX_PER_REQUEST'] = int(os.getenv('FRAGMENT_CACHE_MAX_PER_REQUEST', 200))
+
+
+# Shared backend API client
+
+sessions.init_app(app)
+api_client.init_app(app)
+applicant_changes.init_app(app)
+applicants.init_app(app)
+applicant_index.init_app(app)
+prescreen.init_app(app)
+compatibility.init_app(app)
+conditional.init_app(app)
+matchmakers.init_app(app)
+dashboard_stats.init_app(app)
+submissions.init_app(app)
+images.init_app(app)
+assets.init_app(app)
+templating.init_app(app)
+metrics.init_app(app)
+
 
 # Setup login manager
 
@@ -31,17 +172,8 @@ login_manager.login_view = 'auth.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user from session if logged in."""
-    if 'user_data' in session:
-        user_data = session['user_data']
-        if str(user_data.get('id')) == str(user_id):
-            return User(
-                id=user_data.get('id'),
-                email=user_data.get('email'),
-                name=user_data.get('name'),
-                token=user_data.get('token')
-            )
-    return None
+    """Load user from the server-side session if logged in (built once per session)."""
+    return sessions.session_user(user_id)
 
 
 # Template context processors
@@ -62,30 +194,30 @@ app.register_blueprint(user_routes.bp)
 app.register_blueprint(match_routes.bp)
 app.register_blueprint(applicant_public_bp, url_prefix="/apply")
 
+# Every blueprint's templates are known now; compile them before the first request
+if app.config['TEMPLATE_PRECOMPILE']:
+    templating.precompile(app)
+
 
 # Home page route
 
 @app.route('/')
 def index():
-    """Landing page with stats (fetched from backend if logged in)."""
+    """Landing page with stats (from the background-refreshed cache if logged in)."""
     stats = {'applicants': 0, 'matches': 0, 'recent': 0}
 
     if current_user.is_authenticated:
-        try:
-            headers = {'Authorization': f'Bearer {current_user.token}'}
-            response = requests.get(
-                f"{app.config['API_URL']}/matchmaker/stats",
-                headers=headers
-            )
-            if response.status_code == 200:
-                stats = response.json()
-        except requests.exceptions.RequestException:
+        # Never blocks: shows the last fetched stats, or zeros until the first fetch lands
+        cached_stats = stats_cache().get(current_user.token)
+        if cached_stats is not None:
+            stats = cached_stats
+        elif stats_cache().last_error(current_user.token):
             flash("⚠️ Could not fetch stats from backend.", "warning")
 
     return render_template('index.html', stats=stats)
 
 
-# Run app
+# Run app (development server; see serve_async.py to serve many concurrent sessions on gevent)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5006)
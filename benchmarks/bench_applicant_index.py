@@ -0,0 +1,113 @@
+"""Time filter-and-sort queries and typeahead search on the applicant index.
+
+Filter-and-sort queries are compared with a scan, which is what a request
+did before the index: filter the applicant records one by one and sort
+what is left. Both answer the same queries over --applicants stub records
+(given varied names, cities and occupations), and their answers are
+checked to be equal. Search queries are timed on their own.
+
+Usage:  python -m benchmarks.bench_applicant_index --applicants 5000 --iterations 200
+"""
+import argparse
+import random
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stub_backend import fake_user
+from services.applicant_index import ApplicantIndex, column_value
+
+FIRST_NAMES = ['Avi', 'Ben', 'Chaya', 'David', 'Dina', 'Eli', 'Esther', 'Leah', 'Miriam', 'Moshe',
+               'Noa', 'Rachel', 'Rivka', 'Sarah', 'Shira', 'Tamar', 'Yael', 'Yosef']
+LAST_NAMES = ['Azoulay', 'Biton', 'Cohen', 'Dahan', 'Friedman', 'Goldberg', 'Katz', 'Klein', 'Levi',
+              'Mizrahi', 'Peretz', 'Rosen', 'Shapiro', 'Stern', 'Weiss']
+CITIES = ['Brooklyn', 'Chicago', 'Haifa', 'Jerusalem', 'Lakewood', 'London', 'Los Angeles', 'Miami',
+          'New York', 'Paris', 'Tel Aviv', 'Toronto']
+OCCUPATIONS = ['Accountant', 'Architect', 'Designer', 'Doctor', 'Engineer', 'Lawyer', 'Nurse',
+               'Student', 'Teacher']
+
+QUERIES = [
+    ({'gender': 'male'}, 'age', True),
+    ({'gender': 'female', 'age_min': 30, 'age_max': 35}, 'name', False),
+    ({'name': 'cohen'}, None, False),
+    ({'city': 'jerusalem', 'height_min': 180}, 'height', False),
+]
+# Typeahead as typed: prefixes, two words, a typo, a city, an occupation, no match
+SEARCHES = ['sa', 'sarah', 'sarah coh', 'shapro', 'jerus', 'tel av', 'engin', 'zzz']
+
+
+def applicant(user_id, rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return dict(fake_user(user_id), name=f"{first} {last}", first_name=first, last_name=last,
+                city=rng.choice(CITIES), occupation=rng.choice(OCCUPATIONS))
+
+
+def scan(users, filters, sort, descending):
+    """Filter and sort the records directly, as a request without the index would."""
+    matching = []
+    for user in users:
+        for name, value in filters.items():
+            field, _, side = name.rpartition('_')
+            if side in ('min', 'max') and field in ('age', 'height'):
+                actual = column_value(field, user)
+                if actual is None or (actual < value if side == 'min' else actual > value):
+                    break
+            elif name == 'name':
+                if value.casefold() not in (column_value('name', user) or ''):
+                    break
+            elif column_value(name, user) != value.casefold():
+                break
+        else:
+            matching.append(user)
+    if sort is not None:
+        present = [user for user in matching if column_value(sort, user) is not None]
+        missing = [user for user in matching if column_value(sort, user) is None]
+        # Reverse-then-sort keeps ties in reverse order, as walking the index backwards does
+        present = sorted(present[::-1] if descending else present, key=lambda user: column_value(sort, user),
+                         reverse=descending)
+        matching = present + missing
+    return matching
+
+
+def timed(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--applicants', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    users = [applicant(user_id, rng) for user_id in range(1, args.applicants + 1)]
+    started = time.perf_counter()
+    index = ApplicantIndex(users, 'bench')
+    print(f"build index over {args.applicants} applicants: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    print(f"{'query':<70}{'scan ms':>9}{'index ms':>10}{'rows':>7}")
+    for filters, sort, descending in QUERIES:
+        scanned, expected = timed(lambda: scan(users, filters, sort, descending), args.iterations)
+        indexed, result = timed(lambda: index.query(filters, sort, descending), args.iterations)
+        assert [user['id'] for user in result] == [user['id'] for user in expected], filters
+        label = f"{filters} sort={'-' if descending else ''}{sort}"
+        print(f"{label:<70}{scanned['p50'] * 1000:>9.2f}{indexed['p50'] * 1000:>10.2f}{len(result):>7}")
+
+    print(f"{'search':<20}{'p50 ms':>9}{'p95 ms':>9}  top result")
+    for text in SEARCHES:
+        timings, results = timed(lambda: index.search(text, 8), args.iterations)
+        top = f"{results[0][0]['name']}, {results[0][0]['city']} ({results[0][1]:.2f})" if results else '-'
+        print(f"{text!r:<20}{timings['p50'] * 1000:>9.3f}{timings['p95'] * 1000:>9.3f}  {top}")
+
+    started = time.perf_counter()
+    for user_id in range(1, 101):
+        index.upsert(dict(applicant(user_id, rng), age=60))
+    print(f"update 100 applicants in place: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
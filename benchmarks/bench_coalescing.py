@@ -0,0 +1,73 @@
+"""Count backend calls during a burst of identical page loads.
+
+A burst of concurrent requests for the same applicant arrives while the
+applicant cache is cold, with GET coalescing off and then on. Then one
+compatibility page is loaded with and without a bulk user endpoint.
+
+Usage:  python -m benchmarks.bench_coalescing --burst 50 --latency 0.2
+"""
+import argparse
+import os
+import threading
+
+from benchmarks.stub_backend import serve_in_thread
+from benchmarks.harness import logged_in_client
+
+
+def burst(app, cookie, url, size):
+    """Send `size` requests for `url` at the same moment from separate threads."""
+    barrier = threading.Barrier(size)
+    statuses = []
+
+    def one():
+        client = app.test_client()
+        client.set_cookie('session', cookie)
+        barrier.wait()
+        statuses.append(client.get(url).status_code)
+
+    threads = [threading.Thread(target=one) for _ in range(size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--burst', type=int, default=50, help='concurrent requests for the same page')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per backend call')
+    args = parser.parse_args()
+
+    os.environ['API_POOL_SIZE'] = str(args.burst * 2)
+    server, api_url = serve_in_thread(latency=args.latency)
+    calls = server.RequestHandlerClass.calls
+    client = logged_in_client(api_url)
+    from app import app
+    cookie = client.get_cookie('session').value
+    backend = app.extensions['api_client']
+    singleflight = backend.singleflight
+
+    print(f"burst of {args.burst} x /matches/user/7 with a cold applicant cache:")
+    for label, coalesce in (('coalescing off', None), ('coalescing on', singleflight)):
+        backend.singleflight = coalesce
+        app.extensions['user_cache'].clear()
+        app.extensions['compatibility_cache'].clear()
+        calls.clear()
+        statuses = burst(app, cookie, '/matches/user/7', args.burst)
+        assert all(status == 200 for status in statuses), statuses
+        print(f"  {label:<16}: {calls['GET /api/user/7']:3d} backend call(s) for /user/7")
+
+    print("one /matches/compatibility/3/4 with a cold applicant cache:")
+    for label, batch_path in (('per-id lookups', ''), ('bulk endpoint', '/users?ids={ids}')):
+        app.config['API_USER_BATCH_PATH'] = batch_path
+        app.extensions['user_cache'].clear()
+        app.extensions['compatibility_cache'].clear()
+        calls.clear()
+        assert client.get('/matches/compatibility/3/4').status_code == 200
+        print(f"  {label:<16}: {sum(calls.values()):3d} backend calls ({', '.join(sorted(calls))})")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Benchmark /matches/compatibility against a stub backend with injected latency.
+
+The page makes three backend calls. Issued concurrently, the page should
+take about one round trip instead of three. Once the pair is in the pair
+compatibility cache (and its applicants in the applicant cache), it should
+need none.
+
+Usage:  python -m benchmarks.bench_compatibility --latency 0.2 --iterations 20
+"""
+import argparse
+
+from benchmarks.stub_backend import serve_in_thread
+from benchmarks.harness import logged_in_client, time_requests, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per backend call')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    server, api_url = serve_in_thread(latency=args.latency)
+    client = logged_in_client(api_url)
+
+    # Expire pairs at once, so every page fetches its pair as on a first visit
+    pairs = client.application.extensions['compatibility_cache']
+    ttl, pairs.ttl = pairs.ttl, 0
+    time_requests(client, '/matches/compatibility/1/2', 2)  # warm up pool and templates
+    stats = summarize(time_requests(client, '/matches/compatibility/1/2', args.iterations))
+    pairs.ttl = ttl
+    time_requests(client, '/matches/compatibility/1/2', 1)
+    cached = summarize(time_requests(client, '/matches/compatibility/1/2', args.iterations))
+
+    print(f"backend latency per call : {args.latency * 1000:7.1f} ms")
+    print(f"sequential lower bound   : {3 * args.latency * 1000:7.1f} ms (3 round trips)")
+    print(f"page mean                : {stats['mean'] * 1000:7.1f} ms")
+    print(f"page p50 / p95           : {stats['p50'] * 1000:7.1f} / {stats['p95'] * 1000:.1f} ms")
+    print(f"page / one round trip    : {stats['mean'] / args.latency:7.2f}x")
+    print(f"page, pair cached p50    : {cached['p50'] * 1000:7.1f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Compare thread-pool and gevent workers at many concurrent sessions.
+
+Starts the stub backend and then the app under gunicorn twice: once with a
+gthread worker (a fixed pool of OS threads, each held for a whole backend
+round trip) and once with a gevent worker (one greenlet per request).
+Both runs are driven by the same number of logged-in sessions requesting
+one page back to back, and throughput and latency are reported.
+
+Usage:  python -m benchmarks.bench_concurrency --sessions 200 --latency 0.2 --duration 15
+"""
+from gevent import monkey
+
+monkey.patch_all(thread=False)
+
+import argparse  # noqa: E402
+from collections import Counter  # noqa: E402
+import os  # noqa: E402
+import re  # noqa: E402
+import socket  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+from gevent.pool import Pool  # noqa: E402
+import requests  # noqa: E402
+
+from benchmarks.harness import summarize  # noqa: E402
+from benchmarks.stub_backend import add_arguments, command_line  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_app(mode, port, api_url, args, workdir):
+    env = dict(
+        os.environ,
+        API_URL=api_url,
+        LOG_LEVEL='WARNING',
+        SESSION_SQLITE_PATH=os.path.join(workdir, f'{mode}-sessions.sqlite3'),
+        SUBMISSION_QUEUE_PATH=os.path.join(workdir, f'{mode}-submissions.sqlite3'),
+        SUBMISSION_SPOOL_FOLDER=os.path.join(workdir, f'{mode}-spool'),
+        APPLICANT_CHANGES_PATH=os.path.join(workdir, f'{mode}-applicant-changes.sqlite3'),
+        ASSET_BUILD_FOLDER=os.path.join(workdir, 'assets')
+    )
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '-w', str(args.workers),
+               '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    if mode == 'threads':
+        command += ['-k', 'gthread', '--threads', str(args.threads)]
+        env['API_POOL_SIZE'] = str(args.threads * 2)
+    else:
+        command += ['-k', 'gevent', '--worker-connections', str(args.sessions * 2)]
+        env['API_POOL_SIZE'] = str(args.sessions * 2)
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def login(base_url):
+    session = requests.Session()
+    token = CSRF_TOKEN.search(session.get(f'{base_url}/auth/login').text).group(1)
+    response = session.post(
+        f'{base_url}/auth/login',
+        data={'csrf_token': token, 'email': 'stub@example.com', 'password': 'stub-password'},
+        allow_redirects=False
+    )
+    if response.status_code != 302:
+        alerts = re.findall(r'class="alert[^"]*"[^>]*>\s*([^<]+)', response.text)
+        raise RuntimeError(f"login returned {response.status_code}: {alerts}")
+    return session
+
+
+def run_load(base_url, path, sessions, duration):
+    """Each session requests `path` back to back for `duration` seconds. Returns (timings, errors, elapsed)."""
+    clients = Pool(20).map(lambda _: login(base_url), range(sessions))
+    timings, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    def user(session):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=120)
+                if response.status_code == 200:
+                    timings.append(time.perf_counter() - started)
+                else:
+                    errors.append(response.status_code)
+            except requests.RequestException as e:
+                errors.append(type(e).__name__)
+
+    started = time.perf_counter()
+    gevent.joinall([gevent.spawn(user, session) for session in clients])
+    return timings, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.set_defaults(latency=0.2)
+    parser.add_argument('--sessions', type=int, default=200, help='concurrent logged-in sessions')
+    parser.add_argument('--duration', type=float, default=15, help='seconds of load per mode')
+    parser.add_argument('--path', default='/users/', help='page every session requests')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=16, help='threads per gthread worker')
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, '-m', 'benchmarks.stub_backend', '--port', str(stub_port),
+                             *command_line(args)],
+                            cwd=ROOT, stdout=subprocess.DEVNULL)
+    api_url = f'http://127.0.0.1:{stub_port}/api'
+    results = {}
+    try:
+        wait_until_up(f'{api_url}/matchmaker')
+        with tempfile.TemporaryDirectory() as workdir:
+            for mode in ('threads', 'gevent'):
+                port = free_port()
+                server = start_app(mode, port, api_url, args, workdir)
+                try:
+                    base_url = f'http://127.0.0.1:{port}'
+                    wait_until_up(f'{base_url}/auth/login')
+                    run_load(base_url, args.path, min(args.sessions, 20), 2)  # warm up
+                    timings, errors, elapsed = run_load(base_url, args.path, args.sessions, args.duration)
+                    results[mode] = (timings, errors, elapsed)
+                finally:
+                    server.terminate()
+                    server.wait()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"{args.sessions} sessions on {args.path}, backend latency {args.latency * 1000:.0f} ms, "
+          f"{args.workers} worker(s), {args.duration:.0f}s per mode")
+    labels = {'threads': f'gthread x{args.threads}', 'gevent': 'gevent'}
+    print(f"{'mode':<14}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, (timings, errors, elapsed) in results.items():
+        stats = summarize(timings)
+        print(f"{labels[mode]:<14}{len(timings) / elapsed:>9.1f}{stats['p50'] * 1000:>10.0f}"
+              f"{stats['p95'] * 1000:>10.0f}{stats['p99'] * 1000:>10.0f}{len(errors):>8}")
+    for mode, (_, errors, _) in results.items():
+        if errors:
+            print(f"{labels[mode]} errors: {dict(Counter(errors))}")
+    threads, gevent_ = (len(results[m][0]) / results[m][2] for m in ('threads', 'gevent'))
+    print(f"gevent / gthread throughput: {gevent_ / threads:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Peak memory of the matches list as the result set grows.
+
+Compares the streamed path used by matches.index (incremental JSON parse,
+streamed template) with the old approach of calling response.json() and
+building every transformed match before rendering. The stub backend runs
+in a subprocess so only frontend allocations are measured.
+
+The streamed path is measured with the fragment cache starting empty (a
+request stores at most FRAGMENT_CACHE_MAX_PER_REQUEST cards in it) and
+with the cache turned off.
+
+Usage:  python -m benchmarks.bench_match_memory --sizes 1000 10000 50000
+"""
+import argparse
+import contextlib
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import requests
+
+from benchmarks.harness import logged_in_client
+
+
+def start_stub(total_matches):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.stub_backend', '--port', str(port), '--total-matches', str(total_matches)],
+        stdout=subprocess.DEVNULL
+    )
+    api_url = f"http://127.0.0.1:{port}/api"
+    for _ in range(50):
+        try:
+            requests.get(f"{api_url}/matchmaker/stats", timeout=1)
+            break
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    return process, api_url
+
+
+def measure(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    largest = max(args.sizes)
+    os.environ['MATCHES_MAX_PAGE_SIZE'] = str(largest)
+    process, api_url = start_stub(largest)
+    try:
+        client = logged_in_client(api_url)
+        from routes.match_routes import transform_match
+
+        env = client.application.jinja_env
+        fragment_cache = env.fragment_cache
+
+        def streamed(size, cache=fragment_cache):
+            env.fragment_cache = cache
+            if cache is not None:
+                cache.clear()
+            response = client.get(f'/matches/?limit={size}', buffered=False)
+            for _ in response.response:
+                pass
+            response.close()
+
+        def buffered(size):
+            data = requests.get(f"{api_url}/matchmaker/matches", params={'limit': size}).json()
+            matches = [transform_match(match) for match in data['matches']]
+            assert len(matches) == size
+
+        streamed(10)  # warm up imports, pool and template cache
+        print(f"{'matches':>8}  {'streamed peak':>14}  {'without cache':>14}  {'response.json() peak':>21}")
+        for size in args.sizes:
+            cached = measure(lambda: streamed(size)) / 2**20
+            uncached = measure(lambda: streamed(size, cache=None)) / 2**20
+            print(f"{size:>8}  {cached:>11.2f} MB  {uncached:>11.2f} MB  {measure(lambda: buffered(size)) / 2**20:>18.2f} MB")
+        env.fragment_cache = fragment_cache
+    finally:
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
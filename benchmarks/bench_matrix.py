@@ -0,0 +1,66 @@
+"""Time /matches/matrix against a stub backend with injected latency.
+
+The matrix of --applicants applicants has n * (n - 1) pairs, one backend
+call each. Fetched one after another they would take that many round
+trips; the matrix workers (COMPATIBILITY_MATRIX_WORKERS) should bring it
+close to that divided by the number of workers. The table should arrive
+before any pair is back, and the first cell after about one round trip.
+A second run is answered from the pair cache.
+
+Usage:  python -m benchmarks.bench_matrix --applicants 20 --latency 0.05
+"""
+import argparse
+import time
+
+from benchmarks.stub_backend import serve_in_thread
+from benchmarks.harness import logged_in_client
+
+CELL = b'<template data-cell'
+
+
+def timed_matrix(client, url):
+    """(seconds to the table, to the first cell, to the end, cells) for one streamed matrix."""
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    assert response.status_code == 200, f"{url} returned {response.status_code}"
+    table = first_cell = None
+    body = b''
+    for chunk in response.response:
+        body += chunk
+        if table is None and b'compatibilityMatrix' in body:
+            table = time.perf_counter() - started
+        if first_cell is None and CELL in chunk:
+            first_cell = time.perf_counter() - started
+    response.close()
+    return table, first_cell, time.perf_counter() - started, body.count(CELL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--applicants', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per backend call')
+    args = parser.parse_args()
+
+    server, api_url = serve_in_thread(latency=args.latency, applicants=max(args.applicants, 25))
+    client = logged_in_client(api_url)
+    workers = client.application.config['COMPATIBILITY_MATRIX_WORKERS']
+    url = '/matches/matrix?ids=' + ','.join(str(user_id) for user_id in range(1, args.applicants + 1))
+    pairs = args.applicants * (args.applicants - 1)
+
+    table, first_cell, total, cells = timed_matrix(client, url)
+    assert cells == pairs, f"{cells} cells for {pairs} pairs"
+    print(f"{args.applicants} applicants, {pairs} pairs, {workers} workers, backend latency {args.latency * 1000:.0f} ms")
+    print(f"sequential lower bound   : {pairs * args.latency:8.2f} s")
+    print(f"concurrent lower bound   : {pairs * args.latency / workers:8.2f} s")
+    print(f"table / first cell       : {table * 1000:8.1f} / {first_cell * 1000:.1f} ms")
+    print(f"all cells                : {total:8.2f} s ({pairs / total:.0f} pairs/s)")
+
+    compatibility_calls = sum(count for call, count in server.RequestHandlerClass.calls.items() if '/compatibility/' in call)
+    _, _, cached, _ = timed_matrix(client, url)
+    again = sum(count for call, count in server.RequestHandlerClass.calls.items() if '/compatibility/' in call)
+    print(f"again, from pair cache   : {cached * 1000:8.1f} ms ({again - compatibility_calls} backend calls)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
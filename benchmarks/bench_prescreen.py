@@ -0,0 +1,128 @@
+"""Time local pre-screening of every applicant pair, and what-if previews.
+
+--applicants synthetic applicants with varied profiles and preferences are
+encoded once; then every applicant's best fits are found over all
+applicants x applicants pairs, a block of rows at a time. A sample of rows
+is checked against a pair-by-pair evaluation of the same preferences, fits
+are checked to be symmetric and the best fits to be the best-scoring ones.
+Previews (one applicant against everyone, with a widened age range) are
+timed on their own.
+
+Usage:  python -m benchmarks.bench_prescreen --applicants 5000 --block 256
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from benchmarks.bench_applicant_index import applicant
+from benchmarks.harness import summarize
+from services.prescreen import PrescreenEngine, RELIGIOUS_LEVELS
+
+CHILDREN = ['yes', 'yes', 'undecided', 'no', None]
+KOSHER = ['strict', 'kosher_out', 'vegetarian', 'not_strict', None]
+SHABBAT = ['strict', 'partial', 'not_observant', None]
+
+
+def profile(user_id, rng):
+    """An applicant with hard preferences; about one in ten leaves each preference blank."""
+    age = rng.randint(20, 45)
+
+    def maybe(value):
+        return None if rng.random() < 0.1 else value
+    return dict(
+        applicant(user_id, rng),
+        age=age,
+        height=rng.randint(150, 195),
+        religious_level=maybe(rng.choice(list(RELIGIOUS_LEVELS))),
+        kosher_level=rng.choice(KOSHER),
+        shabbat_observance=rng.choice(SHABBAT),
+        wants_children=rng.choice(CHILDREN),
+        age_range_min=maybe(age - rng.randint(2, 6)),
+        age_range_max=maybe(age + rng.randint(2, 8)),
+        height_preference_min=maybe(rng.randint(150, 170)),
+        height_preference_max=maybe(rng.randint(175, 200)),
+        religious_preference=None if rng.random() < 0.6 else rng.choice(list(RELIGIOUS_LEVELS)),
+        location_preference=None if rng.random() < 0.7 else rng.choice(['Jerusalem', 'Tel Aviv or Haifa', 'New York, Brooklyn']),
+    )
+
+
+def accepts_pair(engine, a, b):
+    """Does row a accept row b? Evaluated one pair at a time in plain Python, as a reference."""
+    def known(values, row):
+        value = values[row]
+        return None if np.isnan(value) else value
+    p = {key: values[a] for key, values in engine.preferences.items()}
+    if engine.gender[a] < 0 or engine.gender[b] < 0 or engine.gender[a] == engine.gender[b]:
+        return False
+    for value, low, high in ((engine.age[b], p['age_min'], p['age_max']),
+                             (engine.height[b], p['height_min'], p['height_max'])):
+        if value < low or value > high:
+            return False
+    wanted, religious = p['religious'], known(engine.religious, b)
+    if not np.isnan(wanted) and religious is not None and wanted != religious:
+        return False
+    if p['has_place'] and not (p['places'][engine.city[b]] or p['places'][engine.country[b]]):
+        return False
+    for values in (engine.kosher, engine.shabbat):
+        if known(values, a) is not None and known(values, b) is not None and abs(values[a] - values[b]) > 1:
+            return False
+    children_a, children_b = known(engine.children, a), known(engine.children, b)
+    return not (children_a is not None and children_b is not None and children_a * children_b < 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--applicants', type=int, default=5000)
+    parser.add_argument('--block', type=int, default=256)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--checked-rows', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    users = [profile(user_id, rng) for user_id in range(1, args.applicants + 1)]
+    started = time.perf_counter()
+    engine = PrescreenEngine(users)
+    print(f"encode {args.applicants} applicants: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    started = time.perf_counter()
+    ids, scores, counts = engine.screen_all(top=args.top, block=args.block)
+    elapsed = time.perf_counter() - started
+    pairs = args.applicants ** 2
+    print(f"screen {args.applicants} x {args.applicants} pairs ({args.block} rows a block): {elapsed * 1000:.0f} ms, "
+          f"{pairs / elapsed / 1e6:.1f} M pairs/s; {counts.mean():.1f} fits per applicant on average")
+
+    everyone = np.arange(len(engine))
+    for a in rng.sample(range(len(engine)), min(args.checked_rows, len(engine))):
+        fits = engine.fits(np.array([a]), everyone)[0]
+        expected = [accepts_pair(engine, a, b) and accepts_pair(engine, b, a) for b in everyone]
+        assert fits.tolist() == expected, a
+        assert fits.sum() == counts[a]
+        assert (engine.fits(everyone, np.array([a]))[:, 0] == fits).all(), a
+        overall, _ = engine.scores(a, everyone)
+        expected_best = np.sort(np.where(fits, overall, -1))[::-1][:args.top]
+        assert np.allclose(scores[a], expected_best), a
+        assert set(ids[a][ids[a] >= 0]) <= set(engine.ids[fits].tolist()), a
+    print(f"checked {min(args.checked_rows, len(engine))} rows against pair-by-pair evaluation")
+
+    sample = rng.sample(range(len(engine)), args.iterations)
+    plain, widened = [], []
+    for row in sample:
+        user = engine.records[row]
+        started = time.perf_counter()
+        _, before = engine.preview(user['id'])
+        plain.append(time.perf_counter() - started)
+        overrides = {'age_range_min': user['age'] - 10, 'age_range_max': user['age'] + 10}
+        started = time.perf_counter()
+        _, after = engine.preview(user['id'], overrides)
+        widened.append(time.perf_counter() - started)
+        assert after >= before or user.get('age_range_min') is None or user.get('age_range_max') is None
+    for label, timings in (('preview', plain), ('what-if preview (age range +-10)', widened)):
+        summary = summarize(timings)
+        print(f"{label:<36}p50 {summary['p50'] * 1000:.2f} ms  p95 {summary['p95'] * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Time template compilation and the rendering of a 1,000-match page.
+
+Compilation: every template compiled from source, then loaded from a cold
+and from a warm bytecode cache, each in a fresh Jinja environment as a new
+worker would start. Rendering: matches/index.html over --matches matches with
+the fragment cache off, on its first (cold) render, and once its match cards
+are cached. No backend calls are made.
+
+Usage:  python -m benchmarks.bench_render --matches 1000 --iterations 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+from benchmarks.harness import summarize
+from benchmarks.stub_backend import fake_match
+
+
+def compile_all(app, bytecode_cache):
+    """Seconds to load every template into a fresh environment."""
+    env = app.create_jinja_environment()
+    env.bytecode_cache = bytecode_cache
+    from services.templating import FragmentCacheExtension
+    env.add_extension(FragmentCacheExtension)
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=('html',)):
+        env.get_template(name)
+    return time.perf_counter() - started
+
+
+def time_renders(app, matches, iterations):
+    from flask import render_template
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        html = render_template('matches/index.html', matches=matches, page=1, limit=len(matches))
+        timings.append(time.perf_counter() - started)
+    return timings, html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--matches', type=int, default=1000, help='match cards on the page')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['TEMPLATE_CACHE_FOLDER'] = ''
+    os.environ['SESSION_SQLITE_PATH'] = os.path.join(workdir.name, 'sessions.sqlite3')
+    from app import app
+    from flask_login import login_user
+    from models.user import User
+    from routes.match_routes import transform_match
+
+    no_cache = min(compile_all(app, None) for _ in range(3))
+    bytecode_folder = os.path.join(workdir.name, 'jinja_cache')
+    os.makedirs(bytecode_folder)
+    cold = compile_all(app, FileSystemBytecodeCache(bytecode_folder))
+    warm = min(compile_all(app, FileSystemBytecodeCache(bytecode_folder)) for _ in range(3))
+    print(f"compile all templates (fresh environment, {len(app.jinja_env.list_templates(extensions=('html',)))} templates):")
+    print(f"  from source            : {no_cache * 1000:7.1f} ms")
+    print(f"  cold bytecode cache    : {cold * 1000:7.1f} ms (compiles and writes)")
+    print(f"  warm bytecode cache    : {warm * 1000:7.1f} ms ({no_cache / warm:.1f}x faster than source)")
+
+    matches = [transform_match(fake_match(i, i + 1)) for i in range(1, args.matches + 1)]
+    fragments = app.jinja_env.fragment_cache
+    with app.test_request_context('/matches/'):
+        login_user(User(1, 'stub@example.com', 'Stub Matchmaker', 'stub-token'))
+        time_renders(app, matches, 2)  # warm up the compiled template
+
+        app.jinja_env.fragment_cache = None
+        off, plain = time_renders(app, matches, args.iterations)
+
+        app.jinja_env.fragment_cache = fragments
+        fragments.clear()
+        first, _ = time_renders(app, matches, 1)
+        cached, html = time_renders(app, matches, args.iterations)
+    assert html == plain, "cached cards differ from freshly rendered ones"
+
+    off, cached = summarize(off), summarize(cached)
+    print(f"render matches/index.html with {args.matches} matches ({len(html) / 1024:.0f} KB):")
+    print(f"  fragment cache off     : {off['p50'] * 1000:7.1f} ms p50, {off['p95'] * 1000:.1f} ms p95")
+    print(f"  first render (cold)    : {first[0] * 1000:7.1f} ms")
+    print(f"  cards cached           : {cached['p50'] * 1000:7.1f} ms p50, {cached['p95'] * 1000:.1f} ms p95 "
+          f"({off['p50'] / cached['p50']:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Load-test every route of the auth, users, matches and apply blueprints.
+
+Each scenario is one route: a method, a URL and, for POSTs, the form it
+submits. It runs the app in-process against the stub backend, driven by
+--concurrency threads (each with its own logged-in session) for --duration
+seconds. The report shows throughput and p50/p95/p99 latency per route. Any
+response whose status or redirect target is not the expected one counts as
+an error.
+
+Use --save to record a run and --compare to check a later run against it with
+the same settings. The script exits with status 1 if a route's p95 grew by
+more than --tolerance, or if a route that had no errors now has some.
+
+Usage:  python -m benchmarks.bench_routes --latency 0.05 --concurrency 8 --duration 5
+        python -m benchmarks.bench_routes --only matches users --error-rate 0.02
+        python -m benchmarks.bench_routes --save before.json
+        python -m benchmarks.bench_routes --compare before.json
+"""
+import argparse
+from collections import Counter, namedtuple
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+from benchmarks.stub_backend import serve_in_thread, add_arguments, settings_from
+from benchmarks.harness import logged_in_client, login, summarize
+
+# session: 'user' reuses the thread's logged-in client, 'anonymous' uses a new
+# client per request, 'fresh' logs a new client in (untimed) before each request
+Scenario = namedtuple('Scenario', 'blueprint method url status redirect form session',
+                      defaults=(None, None, 'user'))
+
+
+def profile_form():
+    return {
+        'first_name': 'Load', 'last_name': 'Test', 'email': 'load@example.com', 'phone': '5551234567',
+        'age': '30', 'gender': 'female', 'height': '165', 'city': 'New York', 'country': 'USA',
+        'religious_level': 'modern_orthodox', 'kosher_level': 'strict', 'shabbat_observance': 'strict',
+        'education': 'masters', 'wants_children': 'yes', 'religious_preference': 'any'
+    }
+
+
+def matchmaker_profile_form():
+    return {'name': 'Stub Matchmaker', 'email': 'stub@example.com', 'experience_years': '5',
+            'specializations': ['religious', 'cultural'], 'bio': 'Load test'}
+
+
+def picture_form():
+    image = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 80, 120)).save(image, 'PNG')
+    image.seek(0)
+    return {'profile_picture': (image, 'picture.png')}
+
+
+def application_form():
+    return {'first_name': 'Load', 'last_name': 'Test', 'email': 'load@example.com', 'phone': '5551234567',
+            'gender': 'female', 'city': 'New York', 'country': 'USA', 'matchmaker_id': '1'}
+
+
+SCENARIOS = [
+    Scenario('auth', 'GET', '/auth/login', 200, session='anonymous'),
+    Scenario('auth', 'POST', '/auth/login', 302, '/', session='anonymous',
+             form=lambda: {'email': 'stub@example.com', 'password': 'stub-password'}),
+    Scenario('auth', 'GET', '/auth/register', 200, session='anonymous'),
+    Scenario('auth', 'POST', '/auth/register', 302, '/auth/login', session='anonymous',
+             form=lambda: {'name': 'Load Test', 'email': 'load@example.com',
+                           'password': 'load-password', 'confirm_password': 'load-password'}),
+    Scenario('auth', 'GET', '/auth/reset-password', 200, session='anonymous'),
+    Scenario('auth', 'POST', '/auth/reset-password', 302, '/auth/login', session='anonymous',
+             form=lambda: {'email': 'stub@example.com'}),
+    Scenario('auth', 'GET', '/auth/logout', 302, '/auth/login', session='fresh'),
+    Scenario('users', 'GET', '/users/', 200),
+    Scenario('users', 'GET', '/users/data?page=2', 200),
+    Scenario('users', 'GET', '/users/search?q=applicant1', 200),
+    Scenario('users', 'GET', '/users/test', 200),
+    Scenario('users', 'GET', '/users/profile', 200),
+    Scenario('users', 'POST', '/users/profile', 302, '/users/profile', form=matchmaker_profile_form),
+    Scenario('users', 'POST', '/users/profile/upload-picture', 200, form=picture_form),
+    Scenario('users', 'GET', '/users/new', 200),
+    Scenario('users', 'POST', '/users/new', 302, '/users/', form=profile_form),
+    Scenario('users', 'GET', '/users/7', 200),
+    Scenario('users', 'GET', '/users/7/edit', 200),
+    Scenario('users', 'POST', '/users/7/edit', 302, '/users/7', form=profile_form),
+    Scenario('matches', 'GET', '/matches/', 200),
+    Scenario('matches', 'GET', '/matches/data?page=2', 200),
+    Scenario('matches', 'GET', '/matches/user/7', 200),
+    Scenario('matches', 'GET', '/matches/user/7/data?page=2', 200),
+    Scenario('matches', 'GET', '/matches/compatibility/3/4', 200),
+    Scenario('matches', 'GET', '/matches/preview/3', 200),
+    Scenario('matches', 'GET', '/matches/preview/3?age_range_min=25&age_range_max=35', 200),
+    Scenario('matches', 'GET', '/matches/preview/3/4', 200),
+    Scenario('matches', 'GET', '/matches/matrix?ids=1,2,3,4,5,6', 200),
+    Scenario('matches', 'GET', '/matches/all', 200),
+    Scenario('apply', 'GET', '/apply/', 200, session='anonymous'),
+    Scenario('apply', 'GET', '/apply/1', 200, session='anonymous'),
+    Scenario('apply', 'POST', '/apply/1', 302, '/', session='anonymous', form=application_form),
+]
+
+
+def outcome(scenario, response):
+    """None if the response is what the route returns on success, else a short description."""
+    location = urlsplit(response.headers.get('Location', '')).path
+    if response.status_code == scenario.status and (scenario.redirect is None or location == scenario.redirect):
+        return None
+    return f"{response.status_code} -> {location}" if location else str(response.status_code)
+
+
+def run_scenario(app, scenario, clients, duration):
+    """Drive one route from every client for `duration` seconds. Returns (timings, errors, elapsed)."""
+    timings, errors = [], Counter()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(client):
+        while time.perf_counter() < deadline:
+            if scenario.session == 'anonymous':
+                client = app.test_client()
+            elif scenario.session == 'fresh':
+                client = login(app.test_client())
+            data = scenario.form() if scenario.form else None
+            started = time.perf_counter()
+            response = client.open(scenario.url, method=scenario.method, data=data)
+            response.get_data()  # streamed pages are rendered as the body is read
+            elapsed = time.perf_counter() - started
+            response.close()
+            error = outcome(scenario, response)
+            with lock:
+                if error is None:
+                    timings.append(elapsed)
+                else:
+                    errors[error] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors, time.perf_counter() - started
+
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a saved run; return True if there are any."""
+    regressed = False
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['p95'] is not None and before['p95'] and result['p95'] > before['p95'] * (1 + tolerance):
+            print(f"REGRESSION {name}: p95 {before['p95'] * 1000:.1f} -> {result['p95'] * 1000:.1f} ms")
+            regressed = True
+        if result['errors'] and not before['errors']:
+            print(f"REGRESSION {name}: {result['errors']} errors (none before)")
+            regressed = True
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.set_defaults(latency=0.05)
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent sessions per route')
+    parser.add_argument('--duration', type=float, default=5, help='seconds of load per route')
+    parser.add_argument('--only', nargs='+', choices=sorted({s.blueprint for s in SCENARIOS}),
+                        help='run only these blueprints')
+    parser.add_argument('--save', metavar='FILE', help='write the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='check the results against a saved run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth over the saved run')
+    args = parser.parse_args()
+
+    # Sessions, the submission queue and uploads go to a scratch folder, not instance/
+    workdir = tempfile.TemporaryDirectory()
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['API_POOL_SIZE'] = str(args.concurrency * 4)
+    os.environ['SESSION_SQLITE_PATH'] = os.path.join(workdir.name, 'sessions.sqlite3')
+    os.environ['SUBMISSION_QUEUE_PATH'] = os.path.join(workdir.name, 'submissions.sqlite3')
+    os.environ['SUBMISSION_SPOOL_FOLDER'] = os.path.join(workdir.name, 'submissions')
+    os.environ['APPLICANT_CHANGES_PATH'] = os.path.join(workdir.name, 'applicant_changes.sqlite3')
+
+    server, api_url = serve_in_thread(latency=args.latency, **settings_from(args))
+    logged_in_client(api_url)
+    from app import app
+    app.config['UPLOAD_FOLDER'] = os.path.join(workdir.name, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    clients = [login(app.test_client()) for _ in range(args.concurrency)]
+
+    scenarios = [s for s in SCENARIOS if not args.only or s.blueprint in args.only]
+    print(f"{args.concurrency} sessions x {args.duration:.0f}s per route, backend latency "
+          f"{args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f} ms jitter), error rate {args.error_rate:.0%}")
+    print(f"{'route':<42}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    results, failures = {}, {}
+    for scenario in scenarios:
+        name = f"{scenario.method} {scenario.url}"
+        run_scenario(app, scenario, clients[:1], 0)  # warm up templates and caches
+        timings, errors, elapsed = run_scenario(app, scenario, clients, args.duration)
+        stats = summarize(timings) if timings else {'p50': None, 'p95': None, 'p99': None}
+        results[name] = {'rps': len(timings) / elapsed, 'errors': sum(errors.values()),
+                         **{k: stats[k] for k in ('p50', 'p95', 'p99')}}
+        if errors:
+            failures[name] = errors
+        cells = ''.join(f"{stats[k] * 1000:>9.1f}" if stats[k] is not None else f"{'-':>9}" for k in ('p50', 'p95', 'p99'))
+        print(f"{name:<42}{len(timings) / elapsed:>8.1f}{cells}{sum(errors.values()):>8}")
+    server.shutdown()
+
+    for name, errors in failures.items():
+        print(f"{name} errors: {dict(errors)}")
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
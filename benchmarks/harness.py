@@ -0,0 +1,43 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def logged_in_client(api_url):
+    """Import the app against `api_url` and return a test client with a matchmaker session."""
+    os.environ['API_URL'] = api_url
+    from app import app
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    return login(app.test_client())
+
+
+def login(client):
+    """Log `client` in as the stub matchmaker and return it (safe to call from several threads)."""
+    client.post('/auth/login', data={'email': 'stub@example.com', 'password': 'stub-password'})
+    return client
+
+
+def time_requests(client, url, iterations):
+    """GET `url` repeatedly and return the per-request wall times in seconds."""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, f"{url} returned {response.status_code}"
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        'mean': statistics.mean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    }
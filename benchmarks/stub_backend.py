@@ -0,0 +1,228 @@
+"""Local stand-in for the backend API, used by the benchmarks.
+
+Covers every endpoint the blueprints call: auth, the matchmaker's users,
+matches, stats, profile and activity, user CRUD, compatibility,
+`/matches/all` and public applications. Every response is delayed by a
+configurable latency (plus optional random jitter), a configurable share of
+requests fail with 503, GETs carry an ETag and are answered 304 when the
+client sends it back, and the number of applicants, the number of matches
+and the padding added to each record set the payload sizes.
+
+Run standalone with:
+    python -m benchmarks.stub_backend --port 5005 --latency 0.1 --jitter 0.05 --error-rate 0.01
+"""
+import argparse
+from collections import Counter
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def fake_user(user_id, padding=0):
+    return {
+        'id': user_id,
+        'name': f'Applicant{user_id} Stub',
+        'first_name': f'Applicant{user_id}',
+        'last_name': 'Stub',
+        'age': 22 + user_id % 20,
+        'gender': 'male' if user_id % 2 else 'female',
+        'height': 160 + user_id % 30,
+        'city': 'New York',
+        'country': 'USA',
+        'religious_level': 'modern_orthodox',
+        'kosher_level': 'strict',
+        'shabbat_observance': 'strict',
+        'occupation': 'Engineer',
+        'additional_info': 'x' * padding
+    }
+
+
+def fake_match(applicant_id, match_id):
+    return {
+        'applicant_id': applicant_id,
+        'applicant_name': f'Applicant{applicant_id} Stub',
+        'match_id': match_id,
+        'match_name': f'Applicant{match_id} Stub',
+        'score': 50 + (applicant_id * 7 + match_id) % 50
+    }
+
+
+def fake_compatibility(user_a_id, user_b_id):
+    return {
+        'score': 50 + (user_a_id * 7 + user_b_id) % 50,
+        'compatibility': {
+            'religious_level': {'score': 90, 'weight': 3, 'details': {'a': 'modern_orthodox', 'b': 'modern_orthodox'}},
+            'age': {'score': 75, 'weight': 2, 'details': {'difference': 3}},
+            'location': {'score': 60, 'weight': 1, 'details': {'a': 'New York', 'b': 'New York'}}
+        }
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    # Settings; override per server through serve_in_thread() or the command line
+    latency = 0.0         # seconds added to every response
+    jitter = 0.0          # up to this many extra seconds, uniformly random
+    error_rate = 0.0      # share of requests answered with 503 (logins excepted)
+    applicants = 25       # size of /matchmaker/users
+    total_matches = 1000  # size of /matchmaker/matches
+    padding = 0           # bytes of filler text in every applicant record
+    etags = True          # send ETags on GETs and answer If-None-Match with 304
+    # Requests received, by "METHOD /path" (shared by all handler threads)
+    calls = Counter()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, method='GET'):
+        body = json.dumps(payload).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"' if self.etags and method == 'GET' and status == 200 else None
+        if etag is not None and etag == self.headers.get('If-None-Match'):
+            status, body = 304, b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self, method, path, query):
+        if method == 'POST' and path == '/api/auth/login':
+            return 200, {'token': 'stub-token', 'matchmaker': {'id': 1, 'email': 'stub@example.com', 'name': 'Stub Matchmaker'}}
+        if method == 'POST' and path == '/api/auth/register':
+            return 201, {'message': 'Matchmaker registered'}
+        if method == 'POST' and path == '/api/auth/reset-password':
+            return 200, {'message': 'Password reset email sent'}
+        if method == 'GET' and path == '/api/matchmaker':
+            return 200, [{'id': i, 'name': f'Matchmaker {i}'} for i in range(1, 11)]
+        if method == 'GET' and path == '/api/matchmaker/stats':
+            return 200, {'applicants': self.applicants, 'matches': 12, 'recent': 3}
+        if method == 'PUT' and path == '/api/matchmaker/profile':
+            return 200, {'message': 'Profile updated'}
+        if method == 'GET' and path == '/api/matchmaker/profile':
+            return 200, {'name': 'Stub Matchmaker', 'email': 'stub@example.com', 'location': 'New York, NY'}
+        if method == 'GET' and path == '/api/matchmaker/activity':
+            return 200, {'activities': [{'title': 'New Match Created', 'description': 'Stub activity', 'time': 'just now', 'icon': 'heart'}]}
+        if method == 'GET' and path == '/api/matchmaker/users':
+            return 200, {'users': [fake_user(i, self.padding) for i in range(1, self.applicants + 1)]}
+        if method == 'GET' and path == '/api/matchmaker/matches':
+            limit = int(query.get('limit', ['100'])[0])
+            offset = int(query.get('offset', ['0'])[0])
+            ids = range(offset + 1, min(offset + limit, self.total_matches) + 1)
+            return 200, {'matches': [fake_match(i, i + 1) for i in ids], 'has_more': offset + limit < self.total_matches}
+        if method == 'GET' and path == '/api/matches/all':
+            per_applicant = int(query.get('limit_per_match', ['5'])[0])
+            min_score = float(query.get('min_score', ['50'])[0])
+            matches = (fake_match(i, i + j) for i in range(1, self.applicants + 1) for j in range(1, per_applicant + 1))
+            return 200, [match for match in matches if match['score'] >= min_score]
+        m = re.fullmatch(r'/api/matches/compatibility/(\d+)/(\d+)', path)
+        if method == 'GET' and m:
+            return 200, fake_compatibility(int(m.group(1)), int(m.group(2)))
+        if method == 'POST' and re.fullmatch(r'/api/applicants/apply/\d+', path):
+            return 201, {'message': 'Application received'}
+        if method == 'GET' and path == '/api/users' and 'ids' in query:
+            return 200, {'users': [fake_user(int(i), self.padding) for i in query['ids'][0].split(',')]}
+        m = re.fullmatch(r'/api/user/(\d+)/matches', path)
+        if method == 'GET' and m:
+            user_id, limit = int(m.group(1)), int(query.get('limit', ['10'])[0])
+            return 200, {'matches': [fake_match(user_id, user_id + i) for i in range(1, limit + 1)]}
+        if method == 'POST' and path == '/api/user':
+            return 201, {'id': self.applicants + 1, 'message': 'User created'}
+        m = re.fullmatch(r'/api/user/(\d+)', path)
+        if method == 'GET' and m:
+            return 200, fake_user(int(m.group(1)), self.padding)
+        if method == 'PUT' and m:
+            return 200, {'message': 'User updated'}
+        return 404, {'message': 'Not found'}
+
+    def handle_any(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        url = urlsplit(self.path)
+        self.calls[f"{method} {url.path}"] += 1
+        if url.path != '/api/auth/login' and random.random() < self.error_rate:
+            # Benchmark sessions can always log in; everything else may fail
+            return self.send_json(503, {'message': 'Stub backend error'})
+        status, payload = self.route(method, url.path, parse_qs(url.query))
+        self.send_json(status, payload, method)
+
+    def do_GET(self):
+        self.handle_any('GET')
+
+    def do_POST(self):
+        self.handle_any('POST')
+
+    def do_PUT(self):
+        self.handle_any('PUT')
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under concurrent load
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients that hit their deadline hang up mid-response; that is expected here
+        pass
+
+
+def serve_in_thread(latency=0.0, port=0, **settings):
+    """Start the stub on a daemon thread. Returns (server, api_url).
+
+    `settings` override the StubHandler settings, e.g. error_rate=0.05.
+    """
+    handler = type('Handler', (StubHandler,), {'latency': latency, 'calls': Counter(), **settings})
+    server = StubServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
+
+
+def add_arguments(parser):
+    """Add the stub settings to an argparse parser (shared with the load suite)."""
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many random extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--applicants', type=int, default=25, help='size of /matchmaker/users')
+    parser.add_argument('--total-matches', type=int, default=1000, help='size of /matchmaker/matches')
+    parser.add_argument('--padding', type=int, default=0, help='bytes of filler in every applicant record')
+    parser.add_argument('--etags', type=int, default=1, choices=(0, 1), help='send ETags and answer 304 (1) or not (0)')
+
+
+def settings_from(args):
+    """The StubHandler settings from parsed `add_arguments()` options, minus latency."""
+    return {
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'applicants': args.applicants,
+        'total_matches': args.total_matches,
+        'padding': args.padding,
+        'etags': bool(args.etags)
+    }
+
+
+def command_line(args):
+    """The `add_arguments()` options as stub command-line flags, for starting it as a subprocess."""
+    flags = ['--latency', str(args.latency)]
+    for name, value in settings_from(args).items():
+        flags += ['--' + name.replace('_', '-'), str(int(value) if isinstance(value, bool) else value)]
+    return flags
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=5005)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    handler = type('Handler', (StubHandler,), {'latency': args.latency, **settings_from(args)})
+    print(f"Stub backend on http://127.0.0.1:{args.port}/api (latency {args.latency}s)")
+    StubServer(('127.0.0.1', args.port), handler).serve_forever()
@@ -1,15 +1,49 @@
-from flask_login import UserMixin
+class User:
+    """The logged-in matchmaker, as Flask-Login expects it.
+
+    Built from the server-side session once per session and reused across
+    requests, so it is kept small: fixed slots, no per-instance __dict__
+    (which rules out inheriting from flask_login.UserMixin).
+    """
+
+    __slots__ = ('id', 'email', 'name', 'token')
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
 
-class User(UserMixin):
     def __init__(self, id, email, name, token):
         self.id = id
         self.email = email
         self.name = name
         self.token = token
-    
+
+    @classmethod
+    def from_session(cls, user_data):
+        return cls(
+            id=user_data.get('id'),
+            email=user_data.get('email'),
+            name=user_data.get('name'),
+            token=user_data.get('token')
+        )
+
+    def to_session(self):
+        return {'id': self.id, 'email': self.email, 'name': self.name, 'token': self.token}
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.get_id())
+
     @staticmethod
     def get(user_id):
         # This method is required by Flask-Login but
         # in this case, we're using a JWT token-based approach
         # so we'll return None (users are loaded from the backend)
-        return None 
\ No newline at end of file
+        return None
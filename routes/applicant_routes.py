@@ -1,5 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
-import requests
+from werkzeug.utils import secure_filename
+import os
+import re
+import uuid
+from services.matchmakers import get_matchmakers, matchmaker_directory
+from services.submissions import submission_queue
+from services.uploads import save_upload, UploadTooLarge
 
 applicant_public_bp = Blueprint("applicant_public", __name__, template_folder="../templates")
 
@@ -9,14 +15,10 @@ applicant_public_bp = Blueprint("applicant_public", __name__, template_folder=".
 @applicant_public_bp.route("/", methods=["GET", "POST"])
 @applicant_public_bp.route("/<int:matchmaker_id>", methods=["GET", "POST"])
 def apply(matchmaker_id=None):
-    # ✅ Fetch all matchmakers from backend
-    matchmakers = []
-    try:
-        response = requests.get(f"{current_app.config['API_URL']}/matchmaker")
-        if response.status_code == 200:
-            matchmakers = response.json()
-    except Exception as e:
-        flash(f"Error fetching matchmakers: {e}", "danger")
+    # ✅ Matchmakers come from a process-wide cache refreshed in the background
+    matchmakers = get_matchmakers()
+    if not matchmakers and matchmaker_directory().last_error:
+        flash(f"Error fetching matchmakers: {matchmaker_directory().last_error}", "danger")
 
     if request.method == "POST":
         # Collect form data
@@ -35,31 +37,71 @@ def apply(matchmaker_id=None):
             "shabbat_observance": request.form.get("shabbat_observance"),
         }
 
-        # Matchmaker comes either from dropdown or preselected route
-        chosen_matchmaker = request.form.get("matchmaker_id") or matchmaker_id
+        # Matchmaker comes either from dropdown or preselected route; it must be
+        # 0 (general submission) or one listed in the directory, since the queue
+        # delivers later and a bad path would only fail after we reported success
+        chosen_matchmaker = valid_matchmaker_id(request.form.get("matchmaker_id") or matchmaker_id, matchmakers)
+        if chosen_matchmaker is None:
+            flash("Please choose a matchmaker from the list.", "danger")
+            return render_form(matchmakers, matchmaker_id)
 
-        # Handle file upload
-        file = request.files.get("picture")
-        files = {}
-        if file and file.filename != "":
-            files = {"picture": (file.filename, file.stream, file.mimetype)}
+        # Hidden per-form key: a double-click or browser resubmit is queued only once,
+        # and the backend gets the same Idempotency-Key on every delivery attempt
+        key = request.form.get("submission_key", "")
+        if not re.fullmatch(r"[0-9a-f]{32}", key):
+            key = uuid.uuid4().hex
 
+        queue = submission_queue()
+        picture = {}
         try:
-            # Send data to backend API
-            api_url = f"{current_app.config['API_URL']}/applicants/apply/{chosen_matchmaker}"
-            response = requests.post(api_url, data=data, files=files)
+            # Spool the picture next to the queue under a name of its own; it is sent
+            # with the form and removed once delivered
+            file = request.files.get("picture")
+            if file and file.filename != "":
+                _, ext = os.path.splitext(secure_filename(file.filename))
+                picture = {
+                    "picture_path": save_upload(
+                        file,
+                        current_app.config['SUBMISSION_SPOOL_FOLDER'],
+                        f"{key}-{uuid.uuid4().hex}{ext.lower()}",
+                        current_app.config['PROFILE_PICTURE_MAX_BYTES']
+                    ),
+                    "picture_name": file.filename,
+                    "picture_mimetype": file.mimetype,
+                }
+        except UploadTooLarge:
+            flash("Picture is too large. Maximum size is 5 MB.", "danger")
+            return render_form(matchmakers, matchmaker_id)
+
+        # ✅ Queued durably; delivered to the backend in the background with retries
+        if not queue.enqueue(key, f"/applicants/apply/{chosen_matchmaker}", data, **picture):
+            # A resubmit of a form already queued: this picture is not needed
+            if picture:
+                os.remove(picture["picture_path"])
+            if queue.status(key) == "failed":
+                flash("This application could not be delivered. Please check the form and submit it again.", "danger")
+                return render_form(matchmakers, matchmaker_id)
+        flash("Application submitted successfully!", "success")
+        return redirect(url_for("index"))
+
+    return render_form(matchmakers, matchmaker_id)
 
-            if response.status_code == 201:
-                flash("Application submitted successfully!", "success")
-                return redirect(url_for("index"))
-            else:
-                flash(f"Failed to submit: {response.json().get('error', 'Unknown error')}", "danger")
 
-        except Exception as e:
-            flash(f"Error connecting to API: {e}", "danger")
+def valid_matchmaker_id(value, matchmakers):
+    """`value` as a matchmaker id if it is 0 or in the directory, else None."""
+    try:
+        matchmaker_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    if matchmaker_id == 0 or any(str(m.get("id")) == str(matchmaker_id) for m in matchmakers if isinstance(m, dict)):
+        return matchmaker_id
+    return None
+
 
+def render_form(matchmakers, matchmaker_id):
     return render_template(
         "applicants/public_apply.html",
         matchmakers=matchmakers,
-        selected_matchmaker_id=matchmaker_id
+        selected_matchmaker_id=matchmaker_id,
+        submission_key=uuid.uuid4().hex
     )
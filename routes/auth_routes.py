@@ -1,10 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session
 from flask_login import login_user, logout_user, login_required, current_user
-import requests
+import logging
 from models.user import User
+from services.api_client import api
+from services.dashboard_stats import dashboard_stats
 from forms.auth_forms import LoginForm, RegisterForm, PasswordResetForm
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
+logger = logging.getLogger(__name__)
 
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -15,10 +18,7 @@ def login():
     if form.validate_on_submit():
         try:
             # Make API request to backend for authentication
-            api_url = f"{current_app.config['API_URL']}/auth/login"
-            print(f"DEBUG: API_URL config: {current_app.config['API_URL']}")
-            print(f"DEBUG: Making POST request to: {api_url}")
-            print(f"DEBUG: Request data: {{'email': '{form.email.data}', 'password': '[REDACTED]'}}")
+            logger.debug("Making POST request to %s for %s", api.url('/auth/login'), form.email.data)
             
             # Try making the request with explicit headers
             headers = {
@@ -26,8 +26,8 @@ def login():
                 'Accept': 'application/json'
             }
             
-            response = requests.post(
-                api_url,
+            response = api.post(
+                '/auth/login',
                 json={
                     'email': form.email.data,
                     'password': form.password.data
@@ -35,19 +35,11 @@ def login():
                 headers=headers
             )
             
-            print(f"DEBUG: Response status: {response.status_code}")
-            print(f"DEBUG: Response headers: {dict(response.headers)}")
-            print(f"DEBUG: Response text: {response.text}")
+            # Never log the body here: it carries the bearer token
+            logger.debug("Login response status: %s", response.status_code)
             
             if response.status_code == 200:
                 data = response.json()
-                # Store user data in session
-                session['user_data'] = {
-                    'id': data['matchmaker']['id'],
-                    'email': data['matchmaker']['email'],
-                    'name': data['matchmaker']['name'],
-                    'token': data['token']
-                }
                 # Create a user object and log them in
                 user = User(
                     id=data['matchmaker']['id'],
@@ -55,7 +47,12 @@ def login():
                     name=data['matchmaker']['name'],
                     token=data['token']
                 )
+                # New session id on login; user data (and the token) stay server-side
+                session.regenerate()
+                session['user_data'] = user.to_session()
                 login_user(user)
+                # Fetch the dashboard stats while the browser follows the redirect
+                dashboard_stats().warm(user.token)
                 next_page = request.args.get('next', url_for('index'))
                 return redirect(next_page)
             else:
@@ -75,8 +72,8 @@ def register():
     if form.validate_on_submit():
         try:
             # Make API request to backend for registration
-            response = requests.post(
-                f"{current_app.config['API_URL']}/auth/register",
+            response = api.post(
+                '/auth/register',
                 json={
                     'email': form.email.data,
                     'password': form.password.data,
@@ -98,9 +95,11 @@ def register():
 @bp.route('/logout')
 @login_required
 def logout():
-    # Clear user data from session
+    # Clear user data from session; the old session id is deleted from the store
+    dashboard_stats().forget(current_user.token)
     session.pop('user_data', None)
     logout_user()
+    session.regenerate()
     flash('You have been logged out.', 'info')
     return redirect(url_for('auth.login'))
 
@@ -110,8 +109,8 @@ def reset_password():
     if form.validate_on_submit():
         try:
             # Make API request to backend for password reset
-            response = requests.post(
-                f"{current_app.config['API_URL']}/auth/reset-password",
+            response = api.post(
+                '/auth/reset-password',
                 json={'email': form.email.data}
             )
             
@@ -1,297 +1,332 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
-from flask_login import login_required, current_user
-import requests
+from flask import Blueprint, render_template, stream_template, request, redirect, url_for, flash, get_flashed_messages, current_app, jsonify, Response
+from flask_login import login_required
+import logging
+from itertools import islice
+from services.api_client import api
+from services.applicants import get_user, cached_user, user_lookup_paths, users_from_results
+from services.json_stream import iter_matches
+from services.conditional import ConditionalPage
+from services.json_pages import BadQuery, page_args, requested_fields, select_fields
+from services.applicant_index import applicant_index, filters_from
+from services.prescreen import PREFERENCE_FIELDS, prescreen_engine
+from services.compatibility import cached_compatibility, store_compatibility, compatibility_cells
 
 bp = Blueprint('matches', __name__, url_prefix='/matches')
+logger = logging.getLogger(__name__)
+
+# Fields the JSON endpoints return by default (what a match card shows), and all they can return
+MATCH_FIELDS = ('score', 'date_created', 'user_a.id', 'user_a.name', 'user_a.age', 'user_a.current_location',
+                'user_b.id', 'user_b.name', 'user_b.age', 'user_b.current_location')
+USER_MATCH_FIELDS = ('compatibility_score', 'compatibility', 'user_b.id', 'user_b.name', 'user_b.age',
+                     'user_b.gender', 'user_b.current_location')
+ALL_MATCH_FIELDS = set(MATCH_FIELDS) | set(USER_MATCH_FIELDS) | {
+    'user_a.gender', 'user_a.first_name', 'user_a.last_name', 'user_b.first_name', 'user_b.last_name'
+}
 
 @bp.route('/')
 @login_required
 def index():
+    # One page of matches, passed through to the backend as limit/offset
     try:
-        # Fetch all matches for the matchmaker's users
-        headers = {'Authorization': f'Bearer {current_user.token}'}
-        
-        # Get optional limit parameter
-        limit = request.args.get('limit', 100)
-        
-        response = requests.get(
-            f"{current_app.config['API_URL']}/matchmaker/matches",
-            params={'limit': limit},
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            print("Matchmaker matches data:", data)
+        page, limit = page_args(current_app.config['MATCHES_PAGE_SIZE'], current_app.config['MATCHES_MAX_PAGE_SIZE'])
+    except BadQuery:
+        page, limit = 1, current_app.config['MATCHES_PAGE_SIZE']
+    
+    feed = MatchFeed('/matchmaker/matches', params={'limit': limit, 'offset': (page - 1) * limit})
+    
+    # The ETag depends on the matches, so with conditional GETs on the backend is asked
+    # before the header goes out (the body still streams if the backend sends an ETag)
+    conditional = ConditionalPage()
+    if conditional.enabled:
+        feed.open(conditional)
+        if conditional.fresh():
+            return conditional.respond()
+    
+    # Pop flashed messages now: the session cookie is sent before the body streams
+    get_flashed_messages(with_categories=True)
+    
+    # The header goes out first; the match cards follow as they render
+    return conditional.respond(Response(stream_template('matches/index.html', matches=feed, page=page, limit=limit)))
+
+@bp.route('/data')
+@login_required
+def data():
+    """One page of matches as JSON, for infinite scroll and in-place refresh on the matches list.
+
+    Query: `page`, `limit` and `fields` (comma-separated, e.g. `score,user_b.name`).
+    """
+    try:
+        page, limit = page_args(current_app.config['MATCHES_PAGE_SIZE'], current_app.config['MATCHES_MAX_PAGE_SIZE'])
+        fields = requested_fields(MATCH_FIELDS, ALL_MATCH_FIELDS)
+    except BadQuery as e:
+        return jsonify({'message': str(e)}), 400
+    
+    feed = MatchFeed('/matchmaker/matches', params={'limit': limit, 'offset': (page - 1) * limit})
+    conditional = ConditionalPage()
+    feed.open(conditional)
+    if conditional.fresh():
+        return conditional.respond()
+    
+    matches = [select_fields(match, fields) for match in feed]
+    if feed.error:
+        return jsonify({'message': feed.error}), 502
+    return conditional.respond(jsonify({'matches': matches, 'page': page, 'limit': limit, 'has_next': feed.has_next}))
+
+class MatchFeed:
+    """Lazily fetch one page of matches and yield them transformed for the templates.
+
+    The backend is only called when the template starts iterating, so a
+    streamed page can send its header before the data arrives, unless
+    `open()` sent the request earlier. Errors are recorded on `error` for
+    the template to show after the list.
+    """
+    
+    def __init__(self, path, params, applicant_id=None):
+        self.path = path
+        self.params = params
+        self.applicant_id = applicant_id
+        self.response = None
+        self.body_read = False
+        self.error = None
+        self.has_next = False
+    
+    def open(self, conditional):
+        """Send the request now through a ConditionalPage, so the page ETag covers the matches."""
+        try:
+            self.response = conditional.get(self.path, params=self.params, stream=True)
+            # Without a backend ETag the body was read to digest it, and is parsed from memory
+            self.body_read = self.response is not None and conditional.body_read(self.response)
+        except Exception as e:
+            logger.exception("Error fetching matches from %s", self.path)
+            self.error = f"Connection error: {str(e)}"
+    
+    def __iter__(self):
+        if self.error:
+            return
+        try:
+            # Matches are parsed from the response stream one at a time
+            response = self.response if self.response is not None else api.get(self.path, params=self.params, stream=True)
             
-            # Transform the data to match what our template expects
-            transformed_matches = []
+            if response.status_code != 200:
+                logger.warning("Matches API returned status %s", response.status_code)
+                response.close()
+                self.error = 'Failed to retrieve matches.'
+                return
             
-            # Handle different response formats
-            if isinstance(data, list):
-                match_list = data
-            elif isinstance(data, dict) and 'matches' in data:
-                match_list = data['matches']
+            meta = {}
+            count = 0
+            for match in iter_matches(response, meta, body_read=self.body_read):
+                count += 1
+                transformed_match = transform_match(match, self.applicant_id)
+                if transformed_match is not None:
+                    yield transformed_match
+            
+            # A full page means there may be more; trust the backend if it says so
+            if 'has_more' in meta:
+                self.has_next = bool(meta['has_more'])
             else:
-                match_list = []
-                
-            for match in match_list:
-                try:
-                    # Skip if match is not a dictionary
-                    if not isinstance(match, dict):
-                        print(f"Skipping non-dict match: {match}")
-                        continue
-                        
-                    # Get required fields safely
-                    applicant_id = match.get('applicant_id', 0)
-                    applicant_name = match.get('applicant_name', 'Unknown')
-                    match_id = match.get('match_id', 0)
-                    match_name = match.get('match_name', 'Unknown')
-                    score = match.get('score', 0)
-                    
-                    # Create basic user objects
-                    user_a = {
-                        'id': applicant_id,
-                        'name': applicant_name,
-                        'first_name': applicant_name.split(' ')[0] if ' ' in applicant_name else applicant_name,
-                        'last_name': applicant_name.split(' ')[1] if ' ' in applicant_name else '',
-                        'age': match.get('applicant_age', 0),
-                        'current_location': match.get('applicant_location', 'Unknown'),
-                        'gender': match.get('applicant_gender', 'Unknown')
-                    }
-                    
-                    user_b = {
-                        'id': match_id,
-                        'name': match_name,
-                        'first_name': match_name.split(' ')[0] if ' ' in match_name else match_name,
-                        'last_name': match_name.split(' ')[1] if ' ' in match_name else '',
-                        'age': match.get('match_age', 0),
-                        'current_location': match.get('match_location', 'Unknown'),
-                        'gender': match.get('match_gender', 'Unknown')
-                    }
-                    
-                    # Get compatibility data if available
-                    compatibility = {}
-                    if 'compatibility' in match and isinstance(match['compatibility'], dict):
-                        compatibility = match['compatibility']
-                    
-                    # Create a transformed match object
-                    transformed_match = {
-                        'compatibility_score': score,
-                        'score': score,
-                        'user_a': user_a,
-                        'user_b': user_b,
-                        'compatibility': compatibility,
-                        'date_created': match.get('date_created', 'Recent')
-                    }
-                    transformed_matches.append(transformed_match)
-                except Exception as e:
-                    print(f"Error processing match: {e}")
-                    continue
+                self.has_next = count >= int(self.params.get('limit', 0))
+        except Exception as e:
+            logger.exception("Error streaming matches from %s", self.path)
+            self.error = f"Connection error: {str(e)}"
+
+def transform_match(match, applicant_id=None):
+    """Transform one backend match into what our templates expect, or None if unusable"""
+    try:
+        # Skip if match is not a dictionary
+        if not isinstance(match, dict):
+            logger.debug("Skipping non-dict match: %r", match)
+            return None
             
-            return render_template('matches/index.html', matches=transformed_matches)
-        else:
-            print(response.json())
-            flash('Failed to retrieve matches.', 'danger')
-            return render_template('matches/index.html', matches=[])
+        # Get required fields safely
+        if applicant_id is None:
+            applicant_id = match.get('applicant_id', 0)
+        applicant_name = match.get('applicant_name', 'Unknown')
+        match_id = match.get('match_id', 0)
+        match_name = match.get('match_name', 'Unknown')
+        score = match.get('score', 0)
+        
+        # Create basic user objects
+        user_a = {
+            'id': applicant_id,
+            'name': applicant_name,
+            'first_name': applicant_name.split(' ')[0] if ' ' in applicant_name else applicant_name,
+            'last_name': applicant_name.split(' ')[1] if ' ' in applicant_name else '',
+            'age': match.get('applicant_age', 0),
+            'current_location': match.get('applicant_location', 'Unknown'),
+            'gender': match.get('applicant_gender', 'Unknown')
+        }
+        
+        user_b = {
+            'id': match_id,
+            'name': match_name,
+            'first_name': match_name.split(' ')[0] if ' ' in match_name else match_name,
+            'last_name': match_name.split(' ')[1] if ' ' in match_name else '',
+            'age': match.get('match_age', 0),
+            'current_location': match.get('match_location', 'Unknown'),
+            'gender': match.get('match_gender', 'Unknown')
+        }
+        
+        # Get compatibility data if available
+        compatibility = {}
+        if 'compatibility' in match and isinstance(match['compatibility'], dict):
+            compatibility = match['compatibility']
+        
+        # Create a transformed match object
+        return {
+            'compatibility_score': score,
+            'score': score,
+            'user_a': user_a,
+            'user_b': user_b,
+            'compatibility': compatibility,
+            'date_created': match.get('date_created', 'Recent')
+        }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        flash(f"Connection error: {str(e)}", 'danger')
-        return render_template('matches/index.html', matches=[])
+        logger.warning("Error processing match: %s", e)
+        return None
 
 @bp.route('/user/<int:user_id>')
 @login_required
 def user_matches(user_id):
     try:
         # Fetch matches for a specific user
-        headers = {'Authorization': f'Bearer {current_user.token}'}
         
         # Get optional limit parameter
-        limit = request.args.get('limit', 10)
+        try:
+            _, limit = page_args(10, current_app.config['MATCHES_MAX_PAGE_SIZE'])
+        except BadQuery:
+            limit = 10
+        
+        # Get user details first: the page ETag covers them, and must be known
+        # before the matches are (conditionally) requested
+        user = get_user(user_id)
+        if user is None:
+            flash('User not found or access denied.', 'danger')
+            return redirect(url_for('matches.index'))
         
-        response = requests.get(
-            f"{current_app.config['API_URL']}/user/{user_id}/matches",
+        page = ConditionalPage()
+        page.add(user)
+        response = page.get(
+            f"/user/{user_id}/matches",
             params={'limit': limit},
-            headers=headers
+            stream=True
         )
+        if page.fresh():
+            return page.respond()
         
         if response.status_code == 200:
-            data = response.json()
-            print("User matches data:", data)
-            
-            # Transform the data to match what our template expects
+            # Transform the data to match what our template expects,
+            # parsing the matches from the response stream one at a time
             transformed_matches = []
             
-            # Handle different response formats
-            if isinstance(data, list):
-                match_list = data
-            elif isinstance(data, dict) and 'matches' in data:
-                match_list = data['matches']
-            else:
-                match_list = []
-                
-            for match in match_list:
-                try:
-                    # Skip if match is not a dictionary
-                    if not isinstance(match, dict):
-                        print(f"Skipping non-dict match: {match}")
-                        continue
-                        
-                    # Get required fields safely
-                    applicant_name = match.get('applicant_name', 'Unknown')
-                    match_id = match.get('match_id', 0)
-                    match_name = match.get('match_name', 'Unknown')
-                    score = match.get('score', 0)
-                    
-                    # Create basic user objects
-                    user_a = {
-                        'id': user_id,  # This is the current user we're viewing
-                        'name': applicant_name,
-                        'first_name': applicant_name.split(' ')[0] if ' ' in applicant_name else applicant_name,
-                        'last_name': applicant_name.split(' ')[1] if ' ' in applicant_name else '',
-                        'age': match.get('applicant_age', 0),
-                        'current_location': match.get('applicant_location', 'Unknown'),
-                        'gender': match.get('applicant_gender', 'Unknown')
-                    }
-                    
-                    user_b = {
-                        'id': match_id,
-                        'name': match_name,
-                        'first_name': match_name.split(' ')[0] if ' ' in match_name else match_name,
-                        'last_name': match_name.split(' ')[1] if ' ' in match_name else '',
-                        'age': match.get('match_age', 0),
-                        'current_location': match.get('match_location', 'Unknown'),
-                        'gender': match.get('match_gender', 'Unknown')
-                    }
-                    
-                    # Get compatibility data if available
-                    compatibility = {}
-                    if 'compatibility' in match and isinstance(match['compatibility'], dict):
-                        compatibility = match['compatibility']
-                    
-                    # Create a transformed match object
-                    transformed_match = {
-                        'compatibility_score': score,
-                        'score': score,
-                        'user_a': user_a,
-                        'user_b': user_b,
-                        'compatibility': compatibility,
-                        'date_created': match.get('date_created', 'Recent')
-                    }
+            for match in iter_matches(response, body_read=page.body_read(response)):
+                # This is the current user we're viewing
+                transformed_match = transform_match(match, applicant_id=user_id)
+                if transformed_match is not None:
                     transformed_matches.append(transformed_match)
-                except Exception as e:
-                    print(f"Error processing match: {e}")
-                    continue
             
-            # Get user details
-            user_response = requests.get(
-                f"{current_app.config['API_URL']}/user/{user_id}",
-                headers=headers
-            )
-            
-            if user_response.status_code == 200:
-                user = user_response.json()
-                # Ensure user has all required fields
-                processed_user = ensure_user_fields(user, user_id)
-                return render_template('matches/user_matches.html', matches=transformed_matches, user=processed_user)
-            else:
-                flash('User not found or access denied.', 'danger')
-                return redirect(url_for('matches.index'))
+            # Ensure user has all required fields
+            processed_user = ensure_user_fields(user, user_id)
+            return page.respond(render_template('matches/user_matches.html', matches=transformed_matches, user=processed_user,
+                                                limit=limit, has_next=len(transformed_matches) >= limit))
         else:
+            response.close()
             flash('Failed to retrieve matches.', 'danger')
             return redirect(url_for('matches.index'))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error loading matches for user %s", user_id)
         flash(f"Connection error: {str(e)}", 'danger')
         return redirect(url_for('matches.index'))
 
+@bp.route('/user/<int:user_id>/data')
+@login_required
+def user_matches_data(user_id):
+    """One page of an applicant's matches as JSON (`page`, `limit`, `fields` as for `data`).
+
+    The backend only takes a limit, so page N asks it for N pages' worth and
+    the last page is returned; pages past USER_MATCHES_MAX_DEPTH matches are
+    a 400.
+    """
+    try:
+        page, limit = page_args(10, current_app.config['MATCHES_MAX_PAGE_SIZE'])
+        fields = requested_fields(USER_MATCH_FIELDS, ALL_MATCH_FIELDS)
+        depth = current_app.config['USER_MATCHES_MAX_DEPTH']
+        if page * limit > depth:
+            raise BadQuery(f"only the first {depth} matches can be paged through")
+    except BadQuery as e:
+        return jsonify({'message': str(e)}), 400
+    
+    feed = MatchFeed(f"/user/{user_id}/matches", params={'limit': page * limit}, applicant_id=user_id)
+    conditional = ConditionalPage()
+    feed.open(conditional)
+    if conditional.fresh():
+        return conditional.respond()
+    
+    # Earlier pages are parsed and skipped, never collected
+    feed_matches = iter(feed)
+    matches = [select_fields(match, fields) for match in islice(feed_matches, (page - 1) * limit, page * limit)]
+    for _ in feed_matches:
+        # Anything after the page: finishing the feed closes the response and sets has_next
+        pass
+    if feed.error:
+        return jsonify({'message': feed.error}), 502
+    has_next = feed.has_next and page * limit < current_app.config['USER_MATCHES_MAX_DEPTH']
+    return conditional.respond(jsonify({'matches': matches, 'page': page, 'limit': limit, 'has_next': has_next}))
+
 @bp.route('/compatibility/<int:user_a_id>/<int:user_b_id>')
 @login_required
 def compatibility(user_a_id, user_b_id):
     try:
-        # Fetch detailed compatibility between two users
-        headers = {'Authorization': f'Bearer {current_user.token}'}
-        response = requests.get(
-            f"{current_app.config['API_URL']}/matches/compatibility/{user_a_id}/{user_b_id}",
-            headers=headers
-        )
+        # Fetch the compatibility and any uncached users concurrently under one deadline
+        # (the users in a single bulk call when the backend offers one)
+        users = {'user_a': cached_user(user_a_id), 'user_b': cached_user(user_b_id)}
+        missing = [user_id for key, user_id in (('user_a', user_a_id), ('user_b', user_b_id)) if users[key] is None]
+        # A pair already fetched (here or for a compatibility matrix) comes from the pair cache
+        compatibility_data = cached_compatibility(user_a_id, user_b_id)
+        paths = {} if compatibility_data is not None else {'compatibility': f"/matches/compatibility/{user_a_id}/{user_b_id}"}
+        paths.update(user_lookup_paths(missing))
+        results = api.get_many(paths, deadline=current_app.config['API_PAGE_DEADLINE']) if paths else {}
         
-        if response.status_code == 200:
-            compatibility_data = response.json()
-            print("Compatibility data:", compatibility_data)
+        response = results.get('compatibility')
+        if isinstance(response, Exception):
+            raise response
+        
+        if compatibility_data is not None or response.status_code == 200:
+            if compatibility_data is None:
+                compatibility_data = store_compatibility(user_a_id, user_b_id, response)
+            logger.debug("Compatibility data: %s", compatibility_data)
             
             # Transform compatibility data to fit our template
-            transformed_compatibility = {
-                'overall_score': 0,
-                'score': 0,
-                'factors': []
-            }
+            transformed_compatibility = transform_compatibility(compatibility_data)
             
-            # Handle different response formats
-            if isinstance(compatibility_data, dict):
-                # Set the overall score
-                if 'score' in compatibility_data:
-                    transformed_compatibility['overall_score'] = compatibility_data['score']
-                    transformed_compatibility['score'] = compatibility_data['score']
-                
-                # Extract factors if available
-                if 'compatibility' in compatibility_data and isinstance(compatibility_data['compatibility'], dict):
-                    # Prepare factors from compatibility details
-                    factors = []
-                    for category, details in compatibility_data['compatibility'].items():
-                        if isinstance(details, dict) and 'score' in details:
-                            factor = {
-                                'name': category.replace('_', ' ').title(),
-                                'score': details['score'],
-                                'weight': details.get('weight', 1),
-                                'notes': ''
-                            }
-                            
-                            # Add details as notes if available
-                            if 'details' in details and isinstance(details['details'], dict):
-                                notes = []
-                                for key, value in details['details'].items():
-                                    notes.append(f"{key}: {value}")
-                                factor['notes'] = '; '.join(notes)
-                                
-                            factors.append(factor)
-                    
-                    transformed_compatibility['factors'] = factors
+            fetched = users_from_results(results, missing)
+            for key, user_id in (('user_a', user_a_id), ('user_b', user_b_id)):
+                if users[key] is not None:
+                    # Served from the applicant cache
+                    users[key] = ensure_user_fields(users[key], user_id)
+                    continue
+                user = fetched[int(user_id)]
+                if isinstance(user, Exception):
+                    # Render what we have rather than failing the whole page
+                    logger.warning("Could not load user %s: %s", user_id, user)
+                    flash(f"Details for user {user_id} could not be loaded; showing partial data.", 'warning')
+                    users[key] = ensure_user_fields({}, user_id)
+                elif user is not None:
+                    # Ensure user objects have required fields
+                    users[key] = ensure_user_fields(user, user_id)
+                else:
+                    flash('One or both users not found or access denied.', 'danger')
+                    return redirect(url_for('matches.index'))
             
-            # Get user A details
-            user_a_response = requests.get(
-                f"{current_app.config['API_URL']}/user/{user_a_id}",
-                headers=headers
-            )
+            logger.debug("User A: %s", users['user_a'])
+            logger.debug("User B: %s", users['user_b'])
             
-            # Get user B details
-            user_b_response = requests.get(
-                f"{current_app.config['API_URL']}/user/{user_b_id}",
-                headers=headers
+            return render_template(
+                'matches/compatibility.html',
+                compatibility=transformed_compatibility,
+                user_a=users['user_a'],
+                user_b=users['user_b']
             )
-            
-            if user_a_response.status_code == 200 and user_b_response.status_code == 200:
-                user_a = user_a_response.json()
-                user_b = user_b_response.json()
-                
-                # Ensure user objects have required fields
-                user_a_processed = ensure_user_fields(user_a, user_a_id)
-                user_b_processed = ensure_user_fields(user_b, user_b_id)
-                
-                print("User A:", user_a_processed)
-                print("User B:", user_b_processed)
-                
-                return render_template(
-                    'matches/compatibility.html',
-                    compatibility=transformed_compatibility,
-                    user_a=user_a_processed,
-                    user_b=user_b_processed
-                )
-            else:
-                flash('One or both users not found or access denied.', 'danger')
-                return redirect(url_for('matches.index'))
         else:
             flash('Failed to retrieve compatibility data.', 'danger')
             return redirect(url_for('matches.index'))
@@ -299,6 +334,172 @@ def compatibility(user_a_id, user_b_id):
         flash(f"Connection error: {str(e)}", 'danger')
         return redirect(url_for('matches.index'))
 
+@bp.route('/preview/<int:user_id>')
+@login_required
+def preview(user_id):
+    """Applicants that fit `user_id` by local pre-screening, with what-if preferences from the query.
+
+    Any PREFERENCE_FIELDS in the query replace the applicant's own (an empty
+    value removes the preference); nothing is sent to the backend beyond the
+    applicant list the index is built from.
+    """
+    try:
+        index = applicant_index()
+        if index is None:
+            flash('Failed to retrieve users.', 'danger')
+            return redirect(url_for('matches.index'))
+        engine = prescreen_engine(index)
+        user = engine.record(user_id)
+        if user is None:
+            flash('User not found or access denied.', 'danger')
+            return redirect(url_for('matches.index'))
+        
+        preferences = {field: '' if user.get(field) is None else str(user[field]) for field in PREFERENCE_FIELDS}
+        overrides = {field: request.args[field].strip() for field in PREFERENCE_FIELDS
+                     if field in request.args and request.args[field].strip() != preferences[field]}
+        candidates, fits = engine.preview(user_id, overrides, limit=current_app.config['PRESCREEN_PREVIEW_LIMIT'])
+        current_fits = engine.preview(user_id, limit=0)[1] if overrides else fits
+        
+        return render_template(
+            'matches/preview.html',
+            user=ensure_user_fields(user, user_id),
+            candidates=[ensure_user_fields(candidate, candidate['id']) for candidate in candidates],
+            preferences=dict(preferences, **overrides),
+            overrides=overrides,
+            fits=fits,
+            current_fits=current_fits
+        )
+    except Exception as e:
+        logger.exception("Error previewing matches for user %s", user_id)
+        flash(f"Connection error: {str(e)}", 'danger')
+        return redirect(url_for('matches.index'))
+
+@bp.route('/preview/<int:user_a_id>/<int:user_b_id>')
+@login_required
+def preview_compatibility(user_a_id, user_b_id):
+    """The compatibility page with the local pre-screening estimate in place of the backend's score."""
+    try:
+        index = applicant_index()
+        if index is None:
+            flash('Failed to retrieve users.', 'danger')
+            return redirect(url_for('matches.index'))
+        engine = prescreen_engine(index)
+        user_a, user_b = engine.record(user_a_id), engine.record(user_b_id)
+        if user_a is None or user_b is None:
+            flash('One or both users not found or access denied.', 'danger')
+            return redirect(url_for('matches.index'))
+        
+        estimate = engine.compatibility(user_a_id, user_b_id)
+        return render_template(
+            'matches/compatibility.html',
+            compatibility=transform_compatibility(estimate),
+            user_a=ensure_user_fields(user_a, user_a_id),
+            user_b=ensure_user_fields(user_b, user_b_id),
+            estimate=estimate
+        )
+    except Exception as e:
+        logger.exception("Error estimating compatibility of %s and %s", user_a_id, user_b_id)
+        flash(f"Connection error: {str(e)}", 'danger')
+        return redirect(url_for('matches.index'))
+
+@bp.route('/matrix')
+@login_required
+def matrix():
+    """Compatibility of every pair in a group of applicants, each cell streamed in as its pair completes.
+
+    The group is `ids` (comma-separated), or else the applicants that the
+    applicants list shows for the same filters and sort (`gender`, `city`,
+    `q`, `sort`...), up to COMPATIBILITY_MATRIX_MAX_APPLICANTS. Pairs come
+    from the pair cache or are fetched on the matrix workers.
+    """
+    try:
+        index = applicant_index()
+        if index is None:
+            flash('Failed to retrieve users.', 'danger')
+            return redirect(url_for('users.index'))
+        
+        try:
+            if request.args.get('ids', '').strip():
+                ids = list(dict.fromkeys(int(user_id) for user_id in request.args['ids'].split(',') if user_id.strip()))
+                group = [user for user in map(index.get, ids) if user is not None]
+            else:
+                group = index.query(*filters_from(request.args))
+        except (BadQuery, ValueError) as e:
+            flash(f"Invalid selection: {str(e)}", 'danger')
+            return redirect(url_for('users.index'))
+        
+        size = current_app.config['COMPATIBILITY_MATRIX_MAX_APPLICANTS']
+        applicants = [ensure_user_fields(user, user['id']) for user in group[:size]]
+        pairs = [(a['id'], b['id']) for a in applicants for b in applicants if a['id'] != b['id']]
+        
+        def cells():
+            expired = 0
+            for user_a_id, user_b_id, payload in compatibility_cells(pairs):
+                if isinstance(payload, TimeoutError):
+                    expired += 1
+                elif isinstance(payload, Exception):
+                    logger.warning("Compatibility of %s and %s failed: %s", user_a_id, user_b_id, payload)
+                yield {
+                    'user_a_id': user_a_id,
+                    'user_b_id': user_b_id,
+                    'compatibility': transform_compatibility(payload) if isinstance(payload, dict) else None
+                }
+            if expired:
+                logger.warning("Compatibility matrix deadline expired with %s of %s pairs missing", expired, len(pairs))
+        
+        # Pop flashed messages now: the session cookie is sent before the body streams
+        get_flashed_messages(with_categories=True)
+        
+        # The table goes out first, with every cell pending; cells follow as their pairs complete
+        return Response(stream_template('matches/matrix.html', applicants=applicants, cells=cells(),
+                                        pair_count=len(pairs), total=len(group),
+                                        query={key: value for key, value in request.args.items()}))
+    except Exception as e:
+        logger.exception("Error building compatibility matrix")
+        flash(f"Connection error: {str(e)}", 'danger')
+        return redirect(url_for('users.index'))
+
+def transform_compatibility(compatibility_data):
+    """Turn a backend compatibility payload into the score/factors the templates expect"""
+    transformed_compatibility = {
+        'overall_score': 0,
+        'score': 0,
+        'factors': []
+    }
+    
+    # Handle different response formats
+    if isinstance(compatibility_data, dict):
+        # Set the overall score
+        if 'score' in compatibility_data:
+            transformed_compatibility['overall_score'] = compatibility_data['score']
+            transformed_compatibility['score'] = compatibility_data['score']
+        
+        # Extract factors if available
+        if 'compatibility' in compatibility_data and isinstance(compatibility_data['compatibility'], dict):
+            # Prepare factors from compatibility details
+            factors = []
+            for category, details in compatibility_data['compatibility'].items():
+                if isinstance(details, dict) and 'score' in details:
+                    factor = {
+                        'name': category.replace('_', ' ').title(),
+                        'score': details['score'],
+                        'weight': details.get('weight', 1),
+                        'notes': ''
+                    }
+                    
+                    # Add details as notes if available
+                    if 'details' in details and isinstance(details['details'], dict):
+                        notes = []
+                        for key, value in details['details'].items():
+                            notes.append(f"{key}: {value}")
+                        factor['notes'] = '; '.join(notes)
+                        
+                    factors.append(factor)
+            
+            transformed_compatibility['factors'] = factors
+    
+    return transformed_compatibility
+
 def ensure_user_fields(user_data, user_id):
     """Ensure user object has all required fields"""
     if isinstance(user_data, str):
@@ -361,25 +562,27 @@ def ensure_user_fields(user_data, user_id):
 def all_matches():
     try:
         # Fetch all top matches across the system (admin only)
-        headers = {'Authorization': f'Bearer {current_user.token}'}
         
         # Get optional parameters
         limit_per_match = request.args.get('limit_per_match', 5)
         min_score = request.args.get('min_score', 50)
         
-        response = requests.get(
-            f"{current_app.config['API_URL']}/matches/all",
+        response = api.get(
+            '/matches/all',
             params={
                 'limit_per_match': limit_per_match,
                 'min_score': min_score
             },
-            headers=headers
+            stream=True
         )
         
         if response.status_code == 200:
-            all_matches = response.json()
-            return render_template('matches/all_matches.html', matches=all_matches)
-        elif response.status_code == 403:
+            # Stream the matches straight from the backend body into the template
+            get_flashed_messages(with_categories=True)
+            return Response(stream_template('matches/all_matches.html', matches=iter_matches(response)))
+        
+        response.close()
+        if response.status_code == 403:
             flash('Access denied. Admin privileges required.', 'danger')
             return redirect(url_for('matches.index'))
         else:
@@ -1,34 +1,135 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_required, current_user
-import requests
+import logging
+from services.api_client import api
+from services.applicants import get_user, invalidate_user
+from services.conditional import ConditionalPage
+from services.json_pages import BadQuery, page_args, requested_fields, select_fields
+from services.applicant_changes import record_change
+from services.applicant_index import applicant_index, filters_from, form_record
+from services.dashboard_stats import dashboard_stats
+from services.uploads import save_upload, UploadTooLarge
+from services.images import process_picture, InvalidImage, variant_filename, picture_url
+from werkzeug.exceptions import RequestEntityTooLarge
+import os
+import uuid
 from forms.user_forms import UserProfileForm
 
 bp = Blueprint('users', __name__, url_prefix='/users')
+logger = logging.getLogger(__name__)
+
+# Fields /users/data returns by default (what an applicant card shows), and all it can return
+USER_FIELDS = ('id', 'name', 'gender', 'age', 'height', 'city', 'country', 'current_location',
+               'religious_level', 'thumbnail')
+ALL_USER_FIELDS = set(USER_FIELDS) | {
+    'first_name', 'last_name', 'email', 'phone', 'occupation', 'kosher_level', 'shabbat_observance', 'profile_picture'
+}
+# Fields of each /users/search result
+SEARCH_RESULT_FIELDS = ('id', 'name', 'age', 'city', 'occupation', 'thumbnail')
+
+def with_thumbnail(user):
+    """A copy of `user` with the URLs of its picture thumbnail ({'jpg', 'webp'}, or None)."""
+    url = user.get('profile_picture') or user.get('picture')
+    thumbnail = {'jpg': picture_url(url, 'thumb', 'jpg') or url, 'webp': picture_url(url, 'thumb', 'webp')} if url else None
+    return dict(user, thumbnail=thumbnail)
 
 @bp.route('/')
 @login_required
 def index():
     try:
-        # Fetch all users belonging to the current matchmaker
-        headers = {'Authorization': f'Bearer {current_user.token}'}
-        response = requests.get(
-            f"{current_app.config['API_URL']}/matchmaker/users",
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            print(data)
-            # Extract users from the nested structure
-            users = data.get('users', [])
-            return render_template('users/index.html', users=users)
-        else:
-            print(response.json())
+        # All users belonging to the current matchmaker, from the applicant index;
+        # /matchmaker/users is only fetched when the index is not built yet
+        index = applicant_index()
+        if index is None:
             flash('Failed to retrieve users.', 'danger')
-            return render_template('users/index.html', users=[])
+            return render_template('users/index.html', users=[], total=0)
+        
+        page = ConditionalPage()
+        page.add(index.version)
+        if page.fresh():
+            return page.respond()
+        
+        try:
+            filters, sort, descending = filters_from(request.args)
+        except BadQuery:
+            filters, sort, descending = {}, None, False
+        users = index.query(filters, sort, descending)
+        
+        # The first page is rendered; the rest are loaded from /users/data as the list is scrolled
+        limit = current_app.config['USERS_PAGE_SIZE']
+        query = {key: value for key, value in request.args.items() if key not in ('page', 'limit', 'fields')}
+        return page.respond(render_template('users/index.html', users=users[:limit], limit=limit, query=query,
+                                            total=len(index), has_next=len(users) > limit))
     except Exception as e:
         flash(f"Connection error: {str(e)}", 'danger')
-        return render_template('users/index.html', users=[])
+        return render_template('users/index.html', users=[], total=0)
+
+@bp.route('/data')
+@login_required
+def data():
+    """One page of the matchmaker's applicants as JSON, for infinite scroll and in-place filtering.
+
+    Query: `page`, `limit`, `fields` (comma-separated), `sort` (e.g. `-age`)
+    and the filters of `filters_from()`, e.g. `q`, `gender`, `city`, `age_min`.
+    Answered from the applicant index.
+    """
+    try:
+        page, limit = page_args(current_app.config['USERS_PAGE_SIZE'], current_app.config['USERS_MAX_PAGE_SIZE'])
+        fields = requested_fields(USER_FIELDS, ALL_USER_FIELDS)
+        filters, sort, descending = filters_from(request.args)
+    except BadQuery as e:
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        index = applicant_index()
+    except Exception as e:
+        return jsonify({'message': f"Connection error: {str(e)}"}), 502
+    if index is None:
+        return jsonify({'message': 'Failed to retrieve users.'}), 502
+    
+    conditional = ConditionalPage()
+    conditional.add(index.version)
+    if conditional.fresh():
+        return conditional.respond()
+    users = index.query(filters, sort, descending)
+    
+    start = (page - 1) * limit
+    return conditional.respond(jsonify({
+        'users': [select_fields(with_thumbnail(user), fields) for user in users[start:start + limit]],
+        'page': page,
+        'limit': limit,
+        'total': len(users),
+        'has_next': start + limit < len(users)
+    }))
+
+@bp.route('/search')
+@login_required
+def search():
+    """Typeahead: the applicants best matching `q` by name, city or occupation, as JSON.
+
+    Query: `q` and `limit` (default 8). Answered from the applicant index.
+    """
+    try:
+        _, limit = page_args(8, 50)
+    except BadQuery as e:
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        index = applicant_index()
+    except Exception as e:
+        return jsonify({'message': f"Connection error: {str(e)}"}), 502
+    if index is None:
+        return jsonify({'message': 'Failed to retrieve users.'}), 502
+    
+    text = request.args.get('q', '')
+    return jsonify({
+        'q': text,
+        'results': [
+            dict(select_fields(with_thumbnail(user), SEARCH_RESULT_FIELDS), score=round(score, 2),
+                 url=url_for('users.view', user_id=user['id']))
+            for user, score in index.search(text, limit)
+        ]
+    })
 
 @bp.route('/test')
 @login_required
@@ -40,7 +141,7 @@ def test():
 @login_required
 def profile():
     """Profile page for the current matchmaker"""
-    print(f"Profile route accessed by user: {current_user.name}")
+    logger.debug("Profile route accessed by user: %s", current_user.name)
     
     try:
         # Create default profile data
@@ -61,33 +162,8 @@ def profile():
             }
         }
         
-        # Try to fetch from API if available
-        try:
-            headers = {'Authorization': f'Bearer {current_user.token}'}
-            api_url = f"{current_app.config['API_URL']}/matchmaker/profile"
-            print(f"DEBUG: Attempting to fetch profile from: {api_url}")
-            
-            response = requests.get(
-                api_url,
-                headers=headers,
-                timeout=5
-            )
-            
-            print(f"DEBUG: Profile API response status: {response.status_code}")
-            print(f"DEBUG: Profile API response text: {response.text[:500]}")
-            
-            if response.status_code == 200:
-                api_profile = response.json()
-                # Merge API data with defaults
-                profile_data.update(api_profile)
-                print("Profile data fetched from API successfully")
-            else:
-                print(f"API returned status {response.status_code}, using default data")
-        except Exception as api_error:
-            print(f"API error: {api_error}, using default data")
-        
         if request.method == 'POST':
-            print("Processing profile update...")
+            logger.debug("Processing profile update")
             # Handle profile update
             update_data = {
                 'name': request.form.get('name'),
@@ -106,15 +182,11 @@ def profile():
                 }
             }
             
-            # Update local profile data
-            profile_data.update(update_data)
-            
             # Try to update via API
             try:
-                update_response = requests.put(
-                    f"{current_app.config['API_URL']}/matchmaker/profile",
+                update_response = api.put(
+                    '/matchmaker/profile',
                     json=update_data,
-                    headers=headers,
                     timeout=5
                 )
                 
@@ -138,21 +210,6 @@ def profile():
             'pending_matches': 2
         }
         
-        # Try to fetch statistics from API
-        try:
-            stats_response = requests.get(
-                f"{current_app.config['API_URL']}/matchmaker/stats",
-                headers=headers,
-                timeout=5
-            )
-            
-            if stats_response.status_code == 200:
-                api_stats = stats_response.json()
-                stats_data.update(api_stats)
-                print("Statistics fetched from API successfully")
-        except Exception as stats_error:
-            print(f"Stats API error: {stats_error}, using default data")
-        
         # Create default recent activity
         recent_activity = [
             {
@@ -175,36 +232,62 @@ def profile():
             }
         ]
         
-        # Try to fetch activity from API
-        try:
-            activity_response = requests.get(
-                f"{current_app.config['API_URL']}/matchmaker/activity",
-                headers=headers,
-                timeout=5
-            )
-            
-            if activity_response.status_code == 200:
-                api_activity = activity_response.json().get('activities', [])
-                if api_activity:
-                    recent_activity = api_activity
-                    print("Activity data fetched from API successfully")
-        except Exception as activity_error:
-            print(f"Activity API error: {activity_error}, using default data")
+        # Statistics are shared with the landing page and kept warm in the background
+        cached_stats = dashboard_stats().get(current_user.token)
+        paths = {
+            'profile': '/matchmaker/profile',
+            'activity': '/matchmaker/activity'
+        }
+        if cached_stats is None:
+            paths['stats'] = '/matchmaker/stats'
+        else:
+            stats_data.update(cached_stats)
+        
+        # Fetch the remaining sources concurrently under one time budget.
+        # Any source that fails or misses the budget keeps its default block above.
+        results = api.get_many(paths, deadline=current_app.config['PROFILE_PAGE_DEADLINE'])
+        stale_sections = []
+        
+        for section, response in results.items():
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                if response.status_code != 200:
+                    raise ValueError(f"API returned status {response.status_code}")
+                
+                if section == 'profile':
+                    # Merge API data with defaults
+                    profile_data.update(response.json())
+                elif section == 'stats':
+                    api_stats = response.json()
+                    dashboard_stats().put(current_user.token, api_stats)
+                    stats_data.update(api_stats)
+                else:
+                    api_activity = response.json().get('activities', [])
+                    if api_activity:
+                        recent_activity = api_activity
+                logger.debug("%s data fetched from API successfully", section.title())
+            except Exception as api_error:
+                logger.warning("%s API error: %s, using default data", section.title(), api_error)
+                stale_sections.append(section)
         
-        print(f"Rendering profile page with data: {len(profile_data)} profile fields, {len(stats_data)} stats, {len(recent_activity)} activities")
+        logger.debug("Rendering profile page with data: %d profile fields, %d stats, %d activities",
+                     len(profile_data), len(stats_data), len(recent_activity))
         
         return render_template('users/profile.html', 
                              profile=profile_data, 
                              stats=stats_data, 
-                             recent_activity=recent_activity)
+                             recent_activity=recent_activity,
+                             stale_sections=stale_sections)
         
     except Exception as e:
-        print(f"Profile route error: {e}")
+        logger.exception("Profile route error")
         flash(f"Error loading profile: {str(e)}", 'danger')
         return render_template('users/profile.html', 
                              profile={'name': current_user.name, 'email': current_user.email}, 
                              stats={}, 
-                             recent_activity=[])
+                             recent_activity=[],
+                             stale_sections=['profile', 'stats', 'activity'])
 
 @bp.route('/new', methods=['GET', 'POST'])
 @login_required
@@ -213,19 +296,23 @@ def create():
     if form.validate_on_submit():
         try:
             # Create user profile via API
-            headers = {'Authorization': f'Bearer {current_user.token}'}
             user_data = form.data.copy()
             # Remove CSRF token and submit button from form data
             user_data.pop('csrf_token', None)
             user_data.pop('submit', None)
             
-            response = requests.post(
-                f"{current_app.config['API_URL']}/user",
-                json=user_data,
-                headers=headers
+            response = api.post(
+                '/user',
+                json=user_data
             )
             
             if response.status_code == 201:
+                # Every worker adds the new applicant to its list index; without an id, reloads the list
+                created = response.json()
+                if isinstance(created, dict) and 'id' in created:
+                    record_change(created['id'], form_record(user_data, base={'id': created['id']}))
+                else:
+                    record_change()
                 flash('User profile created successfully!', 'success')
                 return redirect(url_for('users.index'))
             else:
@@ -240,16 +327,15 @@ def create():
 @login_required
 def view(user_id):
     try:
-        # Fetch user details via API
-        headers = {'Authorization': f'Bearer {current_user.token}'}
-        response = requests.get(
-            f"{current_app.config['API_URL']}/user/{user_id}",
-            headers=headers
-        )
+        # Fetch user details via API (cached per matchmaker)
+        user = get_user(user_id)
         
-        if response.status_code == 200:
-            user = response.json()
-            return render_template('users/view.html', user=user)
+        if user is not None:
+            page = ConditionalPage()
+            page.add(user)
+            if page.fresh():
+                return page.respond()
+            return page.respond(render_template('users/view.html', user=user))
         else:
             flash('User not found or access denied.', 'danger')
             return redirect(url_for('users.index'))
@@ -261,18 +347,13 @@ def view(user_id):
 @login_required
 def edit(user_id):
     try:
-        # Fetch user details for editing
-        headers = {'Authorization': f'Bearer {current_user.token}'}
-        response = requests.get(
-            f"{current_app.config['API_URL']}/user/{user_id}",
-            headers=headers
-        )
+        # Fetch user details for editing (cached per matchmaker)
+        user_data = get_user(user_id)
         
-        if response.status_code != 200:
+        if user_data is None:
             flash('User not found or access denied.', 'danger')
             return redirect(url_for('users.index'))
         
-        user_data = response.json()
         form = UserProfileForm(obj=user_data)
         
         if form.validate_on_submit():
@@ -282,13 +363,17 @@ def edit(user_id):
             update_data.pop('csrf_token', None)
             update_data.pop('submit', None)
             
-            update_response = requests.put(
-                f"{current_app.config['API_URL']}/user/{user_id}",
-                json=update_data,
-                headers=headers
+            update_response = api.put(
+                f"/user/{user_id}",
+                json=update_data
             )
             
+            # Drop the cached record whether or not the update went through
+            invalidate_user(user_id)
+            
             if update_response.status_code == 200:
+                # Other workers drop their cached record and update their list index from the change log
+                record_change(user_id, form_record(update_data, base=user_data))
                 flash('User profile updated successfully!', 'success')
                 return redirect(url_for('users.view', user_id=user_id))
             else:
@@ -312,55 +397,37 @@ def upload_profile_picture():
         if file.filename == '':
             return jsonify({'success': False, 'message': 'No file selected'}), 400
         
-        # Validate file type
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
+        # Validate file type (the formats services.images.ALLOWED_FORMATS accepts)
+        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
         if not file.filename.lower().endswith(tuple('.' + ext for ext in allowed_extensions)):
             return jsonify({'success': False, 'message': 'Invalid file type. Please upload an image.'}), 400
         
-        # Validate file size (max 5MB)
-        if len(file.read()) > 5 * 1024 * 1024:
-            file.seek(0)  # Reset file pointer
+        # Stream the file to disk, enforcing the size cap (max 5MB) as bytes arrive
+        upload_dir = current_app.config['UPLOAD_FOLDER']
+        try:
+            upload_path = save_upload(file, upload_dir, f".upload-{current_user.id}-{uuid.uuid4().hex}",
+                                      current_app.config['PROFILE_PICTURE_MAX_BYTES'])
+        except UploadTooLarge:
             return jsonify({'success': False, 'message': 'File too large. Maximum size is 5MB.'}), 400
         
-        file.seek(0)  # Reset file pointer
-        
-        # Create uploads directory if it doesn't exist
-        import os
-        upload_dir = os.path.join(current_app.root_path, 'static', 'uploads', 'profile_pictures')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename
-        import uuid
-        filename = f"{current_user.id}_{uuid.uuid4().hex}.jpg"
-        filepath = os.path.join(upload_dir, filename)
-        
-        # Save file
-        file.save(filepath)
+        # Decode, validate and re-encode into content-addressed thumb/medium variants
+        try:
+            digest = process_picture(upload_path, upload_dir)
+        except InvalidImage:
+            return jsonify({'success': False, 'message': 'Invalid file type. Please upload an image.'}), 400
+        finally:
+            os.remove(upload_path)
         
-        # Generate URL for the uploaded image
-        image_url = f"/static/uploads/profile_pictures/{filename}"
+        # The stored URL is the medium JPEG; templates derive the other variants from it
+        image_url = url_for('picture', filename=variant_filename(digest, 'medium', 'jpg'))
         
         # Update profile data with new picture URL
         profile_data = {
             'profile_picture': image_url
         }
         
-        # Try to update via API
-        try:
-            headers = {'Authorization': f'Bearer {current_user.token}'}
-            update_response = requests.put(
-                f"{current_app.config['API_URL']}/matchmaker/profile",
-                json=profile_data,
-                headers=headers,
-                timeout=10
-            )
-            
-            if update_response.status_code == 200:
-                print("Profile picture updated via API successfully")
-            else:
-                print(f"API update failed with status {update_response.status_code}")
-        except Exception as api_error:
-            print(f"API error updating profile picture: {api_error}")
+        # The file is safely on disk; sync the API in the background with retries
+        api.submit('PUT', '/matchmaker/profile', json=profile_data, timeout=10)
         
         return jsonify({
             'success': True, 
@@ -368,6 +435,9 @@ def upload_profile_picture():
             'image_url': image_url
         })
         
+    except RequestEntityTooLarge:
+        # Request bodies over MAX_CONTENT_LENGTH are rejected before they are read
+        return jsonify({'success': False, 'message': 'File too large. Maximum size is 5MB.'}), 413
     except Exception as e:
-        print(f"Error uploading profile picture: {e}")
-        return jsonify({'success': False, 'message': 'Error uploading profile picture'}), 500 
\ No newline at end of file
+        logger.exception("Error uploading profile picture")
+        return jsonify({'success': False, 'message': 'Error uploading profile picture'}), 500
@@ -0,0 +1,31 @@
+"""Run the frontend on gevent instead of one OS thread per request.
+
+Every request becomes a greenlet, and blocking socket calls (the backend
+API through `requests`, the stub in benchmarks) yield to other requests
+while they wait. A single process can hold hundreds of concurrent sessions
+that are mostly waiting on the API, which a fixed pool of worker threads
+cannot.
+
+    python serve_async.py                       # development, port 5006
+    gunicorn -k gevent -w 2 --worker-connections 1000 app:app   # production
+
+The gunicorn gevent worker patches the standard library itself; this
+script does the same before anything else is imported.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import os  # noqa: E402
+
+# Concurrent requests share the per-worker backend connection pool, so size it for them
+os.environ.setdefault('API_POOL_SIZE', '200')
+
+from gevent.pywsgi import WSGIServer  # noqa: E402
+from app import app  # noqa: E402
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5006))
+    print(f"Serving on http://0.0.0.0:{port} (gevent)")
+    WSGIServer(('0.0.0.0', port), app, log=None).serve_forever()
@@ -0,0 +1,247 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+import time
+from flask import current_app, has_request_context, g
+from flask_login import current_user
+from werkzeug.local import LocalProxy
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services.circuit_breaker import CircuitBreakers, is_failure
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class BackendClient:
+    """Pooled HTTP client for the backend API, shared by every blueprint.
+
+    One client is created per worker process at app startup. It keeps
+    keep-alive connections to API_URL open, applies default connect/read
+    timeouts and retries idempotent GETs with backoff. POST/PUT are only
+    retried when the connection itself could not be established, so a
+    write is never sent twice.
+
+    Every call goes through the circuit breaker of its endpoint group, so
+    while a group is failing its calls raise CircuitOpen at once instead of
+    each waiting out its timeouts.
+
+    Identical GETs (same token, path and params) that overlap in time are
+    sent once and share the response, unless `coalesce` is off or the
+    response is streamed.
+    """
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff_factor=0.3, breakers=None, coalesce=True):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breakers = breakers or CircuitBreakers()
+        self.singleflight = SingleFlight() if coalesce else None
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Worker threads for fanning out independent calls within one page
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='api-fanout')
+        # Separate workers for deferred writes, so their retry sleeps never delay a page
+        self.background = ThreadPoolExecutor(max_workers=2, thread_name_prefix='api-background')
+
+        # Called as hook(method, path, elapsed, response, error) after every call
+        self.hooks = []
+
+    def url(self, path):
+        """Build an absolute backend URL from a path like '/user/42'."""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, token=None, **kwargs):
+        """Send a request to the backend.
+
+        The bearer header is taken from `current_user.token` unless a token
+        is passed explicitly (needed when calling from a worker thread).
+        """
+        headers = dict(kwargs.pop('headers', None) or {})
+        if token is None:
+            token = current_token()
+        if token and 'Authorization' not in headers:
+            headers['Authorization'] = f'Bearer {token}'
+        kwargs.setdefault('timeout', self.timeout)
+
+        breaker = self.breakers.for_path(path)
+        breaker.before_call()
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url(path), headers=headers, **kwargs)
+        except Exception as e:
+            breaker.record(failed=is_failure(error=e))
+            self._finished(method, path, started, error=e)
+            raise
+        breaker.record(failed=is_failure(response=response))
+        self._finished(method, path, started, response=response)
+        return response
+
+    def _finished(self, method, path, started, response=None, error=None):
+        elapsed = time.perf_counter() - started
+        add_backend_time(elapsed)
+        for hook in self.hooks:
+            hook(method, path, elapsed, response, error)
+
+    def get(self, path, **kwargs):
+        if self.singleflight is None or kwargs.get('stream'):
+            # A streamed body can only be read once, so it is never shared
+            return self.request('GET', path, **kwargs)
+
+        token = kwargs.pop('token', None) or current_token()
+        params = kwargs.get('params') or {}
+        headers = kwargs.get('headers') or {}
+        # Headers are part of the key: a conditional GET's 304 must not reach a plain GET
+        key = (token, path, tuple(sorted((str(k), str(v)) for k, v in params.items())),
+               tuple(sorted(headers.items())))
+        started = time.perf_counter()
+        leader = []
+
+        def send():
+            leader.append(True)
+            return self.request('GET', path, token=token, **kwargs)
+
+        response = self.singleflight.do(key, send)
+        if not leader:
+            # Waited on another caller's request; charge the wait to this page
+            add_backend_time(time.perf_counter() - started)
+        return response
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def get_many(self, paths, deadline, **kwargs):
+        """Issue several GETs concurrently under one overall deadline.
+
+        `paths` maps a key to a backend path. Returns a dict mapping each
+        key to either its Response or the exception it failed with; calls
+        still running when the deadline expires map to a TimeoutError.
+        """
+        token = kwargs.pop('token', None) or current_token()
+        connect_timeout, read_timeout = self.timeout
+        kwargs.setdefault('timeout', (min(connect_timeout, deadline), min(read_timeout, deadline)))
+
+        started = time.perf_counter()
+        futures = {
+            key: self.executor.submit(self.get, path, token=token, **kwargs)
+            for key, path in paths.items()
+        }
+        wait(futures.values(), timeout=max(deadline - (time.perf_counter() - started), 0))
+        # The calls overlap, so the page is charged the wall time of the whole fan-out
+        add_backend_time(time.perf_counter() - started)
+
+        results = {}
+        for key, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[key] = TimeoutError(f"{paths[key]} did not answer within {deadline}s")
+            elif future.exception() is not None:
+                results[key] = future.exception()
+            else:
+                results[key] = future.result()
+        return results
+
+    def submit(self, method, path, token=None, attempts=3, backoff=1.0, **kwargs):
+        """Send an idempotent write in the background, retrying with backoff.
+
+        Retries on connection errors and 5xx responses. Must be given the
+        token explicitly when called outside a request. Returns a Future
+        resolving to the final Response (or None if every attempt failed).
+        """
+        token = token or current_token()
+
+        def send():
+            for attempt in range(1, attempts + 1):
+                try:
+                    response = self.request(method, path, token=token, **kwargs)
+                    if response.status_code < 500:
+                        if response.status_code >= 400:
+                            logger.warning("%s %s returned status %s", method, path, response.status_code)
+                        return response
+                    logger.warning("%s %s returned status %s (attempt %d/%d)",
+                                   method, path, response.status_code, attempt, attempts)
+                except requests.exceptions.RequestException as e:
+                    logger.warning("%s %s failed: %s (attempt %d/%d)", method, path, e, attempt, attempts)
+                if attempt < attempts:
+                    time.sleep(backoff * 2 ** (attempt - 1))
+            logger.error("%s %s gave up after %d attempts", method, path, attempts)
+            return None
+
+        return self.background.submit(send)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.background.shutdown(wait=False)
+        self.session.close()
+
+
+def current_token():
+    """Bearer token of the logged-in matchmaker, or None."""
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.token
+    return None
+
+
+def add_backend_time(elapsed):
+    """Accumulate backend time for the current request (reported in Server-Timing).
+
+    Calls made from fan-out worker threads have no request context and are
+    skipped here; get_many charges their overall wall time instead.
+    """
+    if has_request_context():
+        g.backend_seconds = g.get('backend_seconds', 0.0) + elapsed
+
+
+def init_app(app):
+    """Create the backend client for this worker and attach it to the app."""
+    app.extensions['api_client'] = BackendClient(
+        app.config['API_URL'],
+        pool_size=app.config['API_POOL_SIZE'],
+        connect_timeout=app.config['API_CONNECT_TIMEOUT'],
+        read_timeout=app.config['API_READ_TIMEOUT'],
+        retries=app.config['API_GET_RETRIES'],
+        backoff_factor=app.config['API_RETRY_BACKOFF'],
+        coalesce=app.config['API_COALESCE_GETS'],
+        breakers=CircuitBreakers(
+            failure_rate=app.config['BREAKER_FAILURE_RATE'],
+            min_calls=app.config['BREAKER_MIN_CALLS'],
+            window=app.config['BREAKER_WINDOW'],
+            open_seconds=app.config['BREAKER_OPEN_SECONDS']
+        )
+    )
+
+    if app.extensions['api_client'].singleflight is not None:
+        app.extensions['backend_coalescing'] = app.extensions['api_client'].singleflight
+
+    @app.context_processor
+    def inject_backend_status():
+        # Endpoint groups failing fast; base.html shows a degraded-mode banner while any are
+        return {'degraded_groups': app.extensions['api_client'].breakers.open_groups()}
+
+    return app.extensions['api_client']
+
+
+def get_api():
+    return current_app.extensions['api_client']
+
+
+# Proxy to the current app's client, e.g. `api.get('/matchmaker/users')`
+api = LocalProxy(get_api)
@@ -0,0 +1,108 @@
+from flask import current_app
+from flask_login import current_user
+import json
+import os
+import sqlite3
+import threading
+import time
+from services import sqlite_db
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applicant_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    matchmaker_id TEXT NOT NULL,
+    user_id INTEGER,
+    record TEXT,
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS applicant_changes_matchmaker ON applicant_changes (matchmaker_id, seq);
+CREATE INDEX IF NOT EXISTS applicant_changes_user ON applicant_changes (user_id, changed_at);
+CREATE INDEX IF NOT EXISTS applicant_changes_age ON applicant_changes (changed_at);
+"""
+
+
+class ApplicantChanges:
+    """Log of the applicants created or edited through this frontend.
+
+    Applicant records (`services.applicants`) and list indexes
+    (`services.applicant_index`) are cached in each worker's memory. A
+    change is logged here, in a SQLite file shared by every worker process
+    on the host, so the workers that did not handle it drop or update their
+    copies instead of serving them until they expire.
+
+    Each change has a sequence number; a change without a record means
+    "reload the matchmaker's whole list". Changes older than `retention`
+    seconds are pruned, since every cached copy they could affect has
+    expired by then.
+
+    Lookups run on every list request and applicant-cache hit, so each
+    thread keeps one connection open for them instead of opening the file
+    every time; writes use short-lived connections.
+    """
+
+    def __init__(self, db_path, retention):
+        self.db_path = db_path
+        self.retention = retention
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite_db.connect(self.db_path)
+
+    def _reader(self):
+        """This thread's autocommit connection for lookups (opened again in a forked worker)."""
+        pid, db = getattr(self._local, 'reader', (None, None))
+        if pid != os.getpid():
+            db = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            self._local.reader = (os.getpid(), db)
+        return db
+
+    def record(self, matchmaker_id, user_id=None, record=None):
+        """Log a change to `user_id` (its new list record, if known). Returns its sequence number."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute('DELETE FROM applicant_changes WHERE changed_at < ?', (now - self.retention,))
+            cursor = db.execute(
+                'INSERT INTO applicant_changes (matchmaker_id, user_id, record, changed_at) VALUES (?, ?, ?, ?)',
+                (str(matchmaker_id), user_id, json.dumps(record) if record is not None else None, now)
+            )
+            return cursor.lastrowid
+
+    def latest(self, matchmaker_id):
+        """Sequence number of the matchmaker's last change (0 if none is logged)."""
+        row = self._reader().execute('SELECT MAX(seq) FROM applicant_changes WHERE matchmaker_id = ?',
+                                     (str(matchmaker_id),)).fetchone()
+        return row[0] or 0
+
+    def since(self, matchmaker_id, seq):
+        """The matchmaker's changes after `seq`, oldest first, as (seq, record or None)."""
+        rows = self._reader().execute('SELECT seq, record FROM applicant_changes WHERE matchmaker_id = ? AND seq > ? ORDER BY seq',
+                                      (str(matchmaker_id), seq)).fetchall()
+        return [(row['seq'], json.loads(row['record']) if row['record'] is not None else None) for row in rows]
+
+    def changed_since(self, user_id, when):
+        """Was applicant `user_id` changed at or after `when` (a `time.time()`)?"""
+        row = self._reader().execute('SELECT 1 FROM applicant_changes WHERE user_id = ? AND changed_at >= ? LIMIT 1',
+                                     (int(user_id), when)).fetchone()
+        return row is not None
+
+
+def init_app(app):
+    """Open the applicant change log shared by this host's workers."""
+    # Kept for as long as the longest-lived cached copy, with a margin
+    retention = 2 * max(app.config['USER_CACHE_TTL'], app.config['APPLICANT_INDEX_TTL'])
+    app.extensions['applicant_changes'] = ApplicantChanges(app.config['APPLICANT_CHANGES_PATH'], retention)
+    return app.extensions['applicant_changes']
+
+
+def applicant_changes():
+    return current_app.extensions['applicant_changes']
+
+
+def record_change(user_id=None, record=None):
+    """Log a change to one of the signed-in matchmaker's applicants; no `record` reloads their whole list."""
+    return applicant_changes().record(current_user.get_id(), user_id, record)
@@ -0,0 +1,368 @@
+import bisect
+from collections import Counter
+import hashlib
+import heapq
+import logging
+import math
+import re
+import threading
+from flask import current_app
+from flask_login import current_user
+from services.api_client import api, current_token
+from services.applicant_changes import applicant_changes
+from services.cache import TTLCache
+from services.json_pages import BadQuery
+
+logger = logging.getLogger(__name__)
+
+# Filtered by exact value, ignoring case: the UserProfileForm select fields and places
+CATEGORICAL_FIELDS = ('gender', 'religious_level', 'kosher_level', 'shabbat_observance', 'education',
+                      'wants_children', 'religious_preference', 'city', 'state', 'country')
+# Filtered by range (`age_min`, `age_max`, ...)
+NUMERIC_FIELDS = ('age', 'height', 'age_range_min', 'age_range_max', 'height_preference_min', 'height_preference_max')
+# Searched by substring
+TEXT_FIELDS = ('name', 'occupation', 'languages', 'background', 'location_preference')
+# Kept in sorted order, for sorting and range filters
+SORT_FIELDS = ('name', 'age', 'height', 'city', 'country', 'religious_level', 'education')
+# Trigram-indexed for typeahead search
+SEARCH_FIELDS = ('name', 'city', 'occupation')
+# Share of a query's trigrams an applicant must contain to be a search result
+SEARCH_MIN_SIMILARITY = 0.6
+
+
+class ApplicantIndex:
+    """Column-oriented index over one matchmaker's applicants.
+
+    Every indexed field is a column: a list with one normalised value per
+    row. Categorical fields also map each value to the set of rows holding
+    it, and sort fields keep their rows in sorted order, so `query()` answers
+    filters by intersecting sets and bisecting, and sorts by walking a
+    sorted key instead of sorting the records.
+
+    The words of the search fields are also split into trigrams, each
+    mapped to the rows containing it, for `search()`.
+
+    Rows are never reused: an edited applicant keeps its row.
+
+    The index is built from the backend list with validator `validator`,
+    after change `logged` of the applicant change log, and then follows the
+    log with `apply()`. Every worker that built from the same list and
+    applied the same changes holds the same index, so `version` can be the
+    validator of pages built from it.
+    """
+
+    def __init__(self, users, validator, logged=0):
+        self.validator = validator
+        self.first_change = self.last_change = logged
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._records = []
+        self._rows = {}  # applicant id -> row
+        self._columns = {field: [] for field in (*CATEGORICAL_FIELDS, *NUMERIC_FIELDS, *TEXT_FIELDS)}
+        self._postings = {field: {} for field in CATEGORICAL_FIELDS}
+        self._trigrams = {}  # trigram -> rows
+        self._name_trigrams = {}  # the same, for names only
+        for user in users:
+            if isinstance(user, dict) and 'id' in user and int(user['id']) not in self._rows:
+                self._append(user)
+        # Sorted once after a bulk load; kept sorted with insort afterwards
+        self._sorted = {
+            field: sorted((_sort_key(value), row) for row, value in enumerate(self._columns[field]))
+            for field in SORT_FIELDS
+        }
+
+    @property
+    def version(self):
+        return [self.validator, self.first_change, self.last_change]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, user_id):
+        """The record of applicant `user_id`, or None (shared with the index, like `query()`'s)."""
+        with self._lock:
+            row = self._rows.get(int(user_id))
+            return self._records[row] if row is not None else None
+
+    def _append(self, record):
+        row = len(self._records)
+        self._records.append(record)
+        self._rows[int(record['id'])] = row
+        for field, column in self._columns.items():
+            value = column_value(field, record)
+            column.append(value)
+            if field in self._postings and value is not None:
+                self._postings[field].setdefault(value, set()).add(row)
+        self._link_trigrams(row)
+        return row
+
+    def _row_trigrams(self, row):
+        """(trigrams of the search fields, trigrams of the name) of `row`."""
+        grams = {field: set() for field in SEARCH_FIELDS}
+        for field in SEARCH_FIELDS:
+            for word in search_words(self._columns[field][row]):
+                grams[field] |= trigrams(word)
+        return set().union(*grams.values()), grams['name']
+
+    def _link_trigrams(self, row):
+        everywhere, in_name = self._row_trigrams(row)
+        for gram in everywhere:
+            self._trigrams.setdefault(gram, set()).add(row)
+        for gram in in_name:
+            self._name_trigrams.setdefault(gram, set()).add(row)
+
+    def _unlink(self, row):
+        """Drop `row` from the postings and sorted keys (its columns are overwritten or left empty)."""
+        for field, postings in self._postings.items():
+            value = self._columns[field][row]
+            if value is not None:
+                postings[value].discard(row)
+        everywhere, in_name = self._row_trigrams(row)
+        for gram in everywhere:
+            self._trigrams[gram].discard(row)
+        for gram in in_name:
+            self._name_trigrams[gram].discard(row)
+        for field, entries in self._sorted.items():
+            entry = (_sort_key(self._columns[field][row]), row)
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def upsert(self, record):
+        """Add an applicant, or replace the one with the same id."""
+        with self._lock:
+            row = self._rows.get(int(record['id']))
+            if row is None:
+                row = self._append(record)
+            else:
+                self._unlink(row)
+                self._records[row] = record
+                for field, column in self._columns.items():
+                    value = column[row] = column_value(field, record)
+                    if field in self._postings and value is not None:
+                        self._postings[field].setdefault(value, set()).add(row)
+                self._link_trigrams(row)
+            for field, entries in self._sorted.items():
+                bisect.insort(entries, (_sort_key(self._columns[field][row]), row))
+
+    def apply(self, changes):
+        """Apply (seq, record) changes from the applicant change log, oldest first.
+
+        Returns False if one of them has no record: the list has to be
+        reloaded from the backend instead.
+        """
+        with self._log_lock:
+            for seq, record in changes:
+                if seq <= self.last_change:
+                    continue
+                if not isinstance(record, dict) or 'id' not in record:
+                    return False
+                self.upsert(record)
+                self.last_change = seq
+        return True
+
+    def query(self, filters=None, sort=None, descending=False):
+        """Records matching `filters`, in backend order or sorted by `sort`.
+
+        `filters` maps a categorical field to the value it must equal, a text
+        field to a substring it must contain, and `<numeric field>_min` /
+        `_max` to inclusive bounds; see `filters_from()`. Applicants missing a
+        sorted or range-filtered field sort last and fail the range. The
+        records are shared with the index: copy them before changing them.
+        """
+        with self._lock:
+            rows = None  # None means every row
+            for name, value in (filters or {}).items():
+                if name in self._postings:
+                    matching = self._postings[name].get(_normalise(value), set())
+                elif name in TEXT_FIELDS:
+                    needle = _normalise(value)
+                    column = self._columns[name]
+                    matching = {row for row in (rows if rows is not None else self._rows.values())
+                                if column[row] is not None and needle in column[row]}
+                else:
+                    matching = self._range(name, value)
+                rows = matching if rows is None else rows & matching
+                if not rows:
+                    return []
+
+            if sort is None:
+                ordered = sorted(rows) if rows is not None else sorted(self._rows.values())
+            else:
+                entries = self._sorted[sort]
+                # Missing values (sort key (True, ...)) stay last in both directions
+                present = bisect.bisect_left(entries, ((True,),))
+                keys = entries[present - 1::-1] + entries[present:] if descending and present else entries
+                ordered = [row for _, row in keys if rows is None or row in rows]
+            return [self._records[row] for row in ordered]
+
+    def search(self, text, limit=10):
+        """The best `limit` applicants for typeahead `text`, as (record, similarity) pairs.
+
+        Each query word is matched as a word prefix: its trigrams, anchored at
+        the start of a word, are looked up in the name, city and occupation
+        of every applicant. Similarity is the share of the query's trigrams
+        an applicant contains, so prefixes score 1 and a typo or a match in
+        the middle of a word scores less; below SEARCH_MIN_SIMILARITY it is
+        not a result. Among full matches, whole words of the name come first,
+        then name prefixes; ties keep backend order.
+        """
+        words = search_words(text)
+        if not words:
+            return []
+        grams = [gram for word in words for gram in trigrams(word, closed=False)]
+        with self._lock:
+            everywhere = sorted((self._trigrams.get(gram, _NO_ROWS) for gram in grams), key=len)
+            in_names = sorted((self._name_trigrams.get(gram, _NO_ROWS) for gram in grams), key=len)
+            # Full matches are set intersections, and rank above every partial one:
+            # whole words of the name first, then name prefixes, then other fields
+            full = everywhere[0].intersection(*everywhere[1:])
+            by_name = in_names[0].intersection(*in_names[1:])
+            whole_words = by_name.intersection(*(self._name_trigrams.get(f"  {word} "[-3:], _NO_ROWS) for word in words))
+            ranked = []
+            for tier in (whole_words, by_name - whole_words, full - by_name):
+                if len(ranked) < limit:
+                    ranked += [(row, 1.0) for row in sorted(tier)[:limit - len(ranked)]]
+
+            total = len(grams)
+            needed = math.ceil(total * SEARCH_MIN_SIMILARITY)
+            if len(ranked) < limit and needed < total:
+                # A partial match holds `needed` of the trigrams, so at least
+                # one of the `total - needed + 1` rarest: only those rows count
+                candidates = set().union(*everywhere[:total - needed + 1]) - full
+                counts = Counter()
+                for rows in everywhere:
+                    counts.update(candidates & rows if len(rows) > len(candidates) else rows & candidates)
+                best = heapq.nlargest(limit - len(ranked), (
+                    (count, -row) for row, count in counts.items() if count >= needed
+                ))
+                ranked += [(-row, count / total) for count, row in best]
+            return [(self._records[row], similarity) for row, similarity in ranked]
+
+    def _range(self, name, bound):
+        field, _, side = name.rpartition('_')
+        entries = self._sorted.get(field)
+        if entries is None:
+            # Not a sort field: scan its column
+            column = self._columns[field]
+            return {row for row in self._rows.values() if column[row] is not None
+                    and (column[row] >= bound if side == 'min' else column[row] <= bound)}
+        if side == 'min':
+            start, end = bisect.bisect_left(entries, ((False, bound),)), bisect.bisect_left(entries, ((True,),))
+        else:
+            start, end = 0, bisect.bisect_right(entries, ((False, bound), float('inf')))
+        return {row for _, row in entries[start:end]}
+
+
+def column_value(field, record):
+    """The normalised value of `field` in `record`: an int for numeric fields, a casefolded string otherwise."""
+    if record is None:
+        return None
+    value = record.get(field)
+    if field == 'name' and not value:
+        value = ' '.join(part for part in (record.get('first_name'), record.get('last_name')) if part)
+    if field in NUMERIC_FIELDS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return _normalise(value)
+
+
+_NO_ROWS = frozenset()
+
+
+def search_words(text):
+    return re.findall(r'\w+', str(text or '').casefold())
+
+
+def trigrams(word, closed=True):
+    """Trigrams of `word`, padded to mark its start (and, if `closed`, its end)."""
+    padded = f"  {word} " if closed else f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _normalise(value):
+    if value is None or value == '':
+        return None
+    return str(value).strip().casefold()
+
+
+def _sort_key(value):
+    # Missing values sort after every present one, without comparing types
+    return (True,) if value is None else (False, value)
+
+
+def filters_from(args):
+    """(filters, sort, descending) for `ApplicantIndex.query()` from query arguments.
+
+    Filters are the categorical fields, `q` (name substring), the other text
+    fields and `<numeric field>_min` / `_max`; `sort` is a sort field,
+    prefixed with '-' for descending order. Raises BadQuery on bad values.
+    """
+    filters = {}
+    for field in (*CATEGORICAL_FIELDS, *TEXT_FIELDS):
+        value = args.get('q' if field == 'name' else field, '').strip()
+        if value:
+            filters[field] = value
+    for field in NUMERIC_FIELDS:
+        for side in ('min', 'max'):
+            value = args.get(f'{field}_{side}', '').strip()
+            if value:
+                try:
+                    filters[f'{field}_{side}'] = int(value)
+                except ValueError:
+                    raise BadQuery(f"{field}_{side} must be an integer")
+
+    sort = args.get('sort', '').strip() or None
+    descending = sort is not None and sort.startswith('-')
+    if sort is not None:
+        sort = sort.lstrip('-')
+        if sort not in SORT_FIELDS:
+            raise BadQuery(f"cannot sort by {sort}; use one of {', '.join(SORT_FIELDS)}")
+    return filters, sort, descending
+
+
+def form_record(form_data, base=None):
+    """An applicant record as the list shows it, from UserProfileForm data laid over `base`."""
+    record = dict(base or {}, **form_data)
+    if form_data.get('first_name') or form_data.get('last_name'):
+        record['name'] = f"{record.get('first_name') or ''} {record.get('last_name') or ''}".strip()
+    return record
+
+
+def applicant_index():
+    """This matchmaker's index, built from `/matchmaker/users` on a miss.
+
+    Changes logged by any worker since the index was built are applied to
+    it first. Returns None if the backend did not answer 200; connection
+    errors propagate to the caller.
+    """
+    indexes = current_app.extensions['applicant_indexes']
+    changes = applicant_changes()
+    matchmaker_id = current_user.get_id()
+    index = indexes.get(current_token())
+    if index is not None and not index.apply(changes.since(matchmaker_id, index.last_change)):
+        index = None
+    if index is None:
+        # Read before the list, so a change made while it loads is applied on the next request
+        logged = changes.latest(matchmaker_id)
+        response = api.get('/matchmaker/users')
+        if response.status_code != 200:
+            logger.warning("Users API returned status %s", response.status_code)
+            return None
+        payload = response.json()
+        users = payload.get('users', []) if isinstance(payload, dict) else payload
+        index = ApplicantIndex(users, response.headers.get('ETag') or hashlib.sha256(response.content).hexdigest(), logged)
+        indexes.set(current_token(), index, size=len(response.content))
+    return index
+
+
+def init_app(app):
+    """Create the per-matchmaker applicant indexes for this worker."""
+    app.extensions['applicant_indexes'] = TTLCache(
+        ttl=app.config['APPLICANT_INDEX_TTL'],
+        max_entries=app.config['APPLICANT_INDEX_MAX_ENTRIES'],
+        max_bytes=app.config['APPLICANT_INDEX_MAX_BYTES']
+    )
+    return app.extensions['applicant_indexes']
@@ -0,0 +1,127 @@
+from flask import current_app
+import time
+from services.api_client import api, current_token
+from services.applicant_changes import applicant_changes
+from services.cache import TTLCache
+
+
+def init_app(app):
+    """Create the applicant record cache for this worker."""
+    app.extensions['user_cache'] = TTLCache(
+        ttl=app.config['USER_CACHE_TTL'],
+        max_entries=app.config['USER_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['USER_CACHE_MAX_BYTES']
+    )
+    return app.extensions['user_cache']
+
+
+def user_cache():
+    return current_app.extensions['user_cache']
+
+
+def _key(user_id):
+    # Scoped by matchmaker token so one matchmaker never sees another's cached view
+    return (current_token(), int(user_id))
+
+
+def _fetched_at(response):
+    # When the request was sent: a change logged after that may be missing from the response
+    return time.time() - response.elapsed.total_seconds()
+
+
+def cached_user(user_id):
+    """Return a copy of the cached applicant record, or None on a miss.
+
+    A record is a miss if the applicant change log shows the applicant
+    changed (on any worker) since it was fetched.
+    """
+    entry = user_cache().get(_key(user_id))
+    if entry is None:
+        return None
+    fetched_at, user = entry
+    if applicant_changes().changed_since(user_id, fetched_at):
+        invalidate_user(user_id)
+        return None
+    return dict(user)
+
+
+def store_user(user_id, response):
+    """Cache the applicant record from a successful `/user/{id}` response."""
+    user = response.json()
+    if isinstance(user, dict):
+        user_cache().set(_key(user_id), (_fetched_at(response), user), size=len(response.content))
+        return dict(user)
+    return user
+
+
+def invalidate_user(user_id):
+    """Drop this worker's cached record; other workers learn of edits from the applicant change log."""
+    user_cache().delete(_key(user_id))
+
+
+def get_user(user_id):
+    """Fetch `/user/{id}` through the cache.
+
+    Returns the applicant record, or None if the backend did not answer 200.
+    Connection errors propagate to the caller.
+    """
+    user = cached_user(user_id)
+    if user is not None:
+        return user
+
+    response = api.get(f"/user/{user_id}")
+    if response.status_code != 200:
+        return None
+    return store_user(user_id, response)
+
+
+def user_lookup_paths(user_ids):
+    """Backend paths that fetch `user_ids`, for use in `api.get_many()`.
+
+    One bulk call (key 'users') when API_USER_BATCH_PATH is configured and
+    more than one id is wanted; otherwise one `/user/{id}` call per id.
+    """
+    ids = sorted({int(user_id) for user_id in user_ids})
+    batch_path = current_app.config['API_USER_BATCH_PATH']
+    if batch_path and len(ids) > 1:
+        return {'users': batch_path.format(ids=','.join(str(user_id) for user_id in ids))}
+    return {f'user:{user_id}': f'/user/{user_id}' for user_id in ids}
+
+
+def users_from_results(results, user_ids):
+    """Applicant records from a `get_many()` over `user_lookup_paths(user_ids)`, cached as they are read.
+
+    Returns {id: record}, where a record is None if the backend did not
+    return it, or the exception its lookup failed with.
+    """
+    ids = sorted({int(user_id) for user_id in user_ids})
+    if 'users' not in results:
+        users = {}
+        for user_id in ids:
+            response = results[f'user:{user_id}']
+            if isinstance(response, Exception):
+                users[user_id] = response
+            elif response.status_code == 200:
+                users[user_id] = store_user(user_id, response)
+            else:
+                users[user_id] = None
+        return users
+
+    response = results['users']
+    if isinstance(response, Exception):
+        return {user_id: response for user_id in ids}
+    if response.status_code != 200:
+        return {user_id: None for user_id in ids}
+    payload = response.json()
+    records = payload.get('users', []) if isinstance(payload, dict) else payload
+    size = len(response.content) // max(len(records), 1)
+    by_id = {int(record['id']): record for record in records if isinstance(record, dict) and 'id' in record}
+    fetched_at = _fetched_at(response)
+    users = {}
+    for user_id in ids:
+        record = by_id.get(user_id)
+        if record is not None:
+            user_cache().set(_key(user_id), (fetched_at, record), size=size)
+            record = dict(record)
+        users[user_id] = record
+    return users
@@ -0,0 +1,218 @@
+from flask import abort, current_app, request, send_from_directory, url_for
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import uuid
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are built
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+mimetypes.add_type('font/woff2', '.woff2')
+
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+# Tried in order; the first one the client accepts and that was built wins
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Vendored icon stylesheets whose per-icon rules are cut down to the icons actually used
+ICON_STYLESHEETS = {'vendor/fontawesome/css/fontawesome.min.css', 'vendor/fontawesome/css/brands.min.css'}
+ICON_CLASS = re.compile(r'\bfa-[a-z0-9-]+')
+ICON_RULE = re.compile(r'((?:\.fa-[a-z0-9-]+:before,)*\.fa-[a-z0-9-]+:before)\{content:"(?:[^"\\]|\\.)*"\}')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+class AssetBuild:
+    """Fingerprinted, precompressed copies of the files under `static/`.
+
+    Each file is copied to `build_folder` as `name.<hash>.ext`, so its URL
+    changes whenever its content does and can be cached forever. `url()`
+    references inside stylesheets are rewritten to the fingerprinted names.
+    Text files also get `.gz` (and `.br`, if the brotli package is
+    installed) variants, kept only when smaller than the original.
+    """
+
+    def __init__(self, static_folder, build_folder, exclude=(), icon_sources=()):
+        self.static_folder = static_folder
+        self.build_folder = build_folder
+        self.exclude = [os.path.abspath(path) for path in exclude]
+        self.icon_sources = icon_sources
+        self.manifest = {}  # 'css/style.css' -> 'css/style.3f2a9c1b0d4e.css'
+        self.encodings = {}  # fingerprinted name -> encodings built for it
+        self._icons = None
+
+    def build(self):
+        sources = self._sources()
+        # Stylesheets last, so the files they reference already have fingerprinted names
+        for rel_path in sorted(sources, key=lambda p: p.endswith('.css')):
+            self._build_file(rel_path)
+        logger.info("Built %d static assets into %s", len(self.manifest), self.build_folder)
+        return self
+
+    def _sources(self):
+        sources = []
+        for root, dirs, files in os.walk(self.static_folder):
+            dirs[:] = [d for d in dirs if not self._excluded(os.path.join(root, d))]
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                rel_path = os.path.relpath(os.path.join(root, name), self.static_folder)
+                sources.append(rel_path.replace(os.sep, '/'))
+        return sources
+
+    def _excluded(self, path):
+        path = os.path.abspath(path)
+        return any(path == excluded or path.startswith(excluded + os.sep) for excluded in self.exclude)
+
+    def _build_file(self, rel_path):
+        with open(os.path.join(self.static_folder, rel_path), 'rb') as f:
+            content = f.read()
+        if rel_path.endswith('.css'):
+            css = content.decode('utf-8')
+            if rel_path in ICON_STYLESHEETS:
+                css = trim_icon_rules(css, self._used_icons())
+            content = self._rewrite_urls(rel_path, css).encode('utf-8')
+
+        stem, ext = os.path.splitext(rel_path)
+        fingerprinted = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+        target = os.path.join(self.build_folder, fingerprinted)
+        _write(target, content)
+        self.manifest[rel_path] = fingerprinted
+
+        built = []
+        if ext in COMPRESSIBLE:
+            compressors = [('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                compressors.insert(0, ('br', '.br', lambda data: brotli.compress(data, quality=11)))
+            for encoding, suffix, compress in compressors:
+                if os.path.exists(target + suffix):
+                    # Built by an earlier start (or another worker)
+                    built.append(encoding)
+                    continue
+                compressed = compress(content)
+                if len(compressed) < len(content):
+                    _write(target + suffix, compressed)
+                    built.append(encoding)
+        self.encodings[fingerprinted] = built
+
+    def _rewrite_urls(self, rel_path, css):
+        base = os.path.dirname(rel_path)
+
+        def replace(match):
+            quote, url = match.groups()
+            if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+                return match.group(0)
+            path, sep, suffix = _split_url(url)
+            target = os.path.normpath(os.path.join(base, path)).replace(os.sep, '/')
+            fingerprinted = self.manifest.get(target)
+            if fingerprinted is None:
+                return match.group(0)
+            relative = os.path.relpath(fingerprinted, base or '.').replace(os.sep, '/')
+            return f"url({quote}{relative}{sep}{suffix}{quote})"
+
+        return CSS_URL.sub(replace, css)
+
+    def _used_icons(self):
+        """Icon class names referenced by templates and scripts (e.g. 'fa-user')."""
+        if self._icons is None:
+            self._icons = set()
+            for folder in self.icon_sources:
+                for root, dirs, files in os.walk(folder):
+                    dirs[:] = [d for d in dirs if not self._excluded(os.path.join(root, d))]
+                    for name in files:
+                        if name.endswith(('.html', '.js')):
+                            with open(os.path.join(root, name), encoding='utf-8') as f:
+                                self._icons.update(ICON_CLASS.findall(f.read()))
+        return self._icons
+
+    def url_for(self, filename):
+        fingerprinted = self.manifest.get(filename)
+        if fingerprinted is None:
+            return url_for('static', filename=filename)
+        return url_for('asset', filename=fingerprinted)
+
+
+def _split_url(url):
+    """'font.woff2?v=2#x' -> ('font.woff2', '?', 'v=2#x')"""
+    for i, char in enumerate(url):
+        if char in '?#':
+            return url[:i], char, url[i + 1:]
+    return url, '', ''
+
+
+def trim_icon_rules(css, used):
+    """Drop the `.fa-name:before{content:...}` rules for icons not in `used`."""
+
+    def replace(match):
+        selectors = [s for s in match.group(1).split(',') if s[1:-len(':before')] in used]
+        if not selectors:
+            return ''
+        return ','.join(selectors) + match.group(0)[len(match.group(1)):]
+
+    return ICON_RULE.sub(replace, css)
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # Names are content hashes, so an existing file is already correct
+        return
+    partial_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(partial_path, 'wb') as f:
+            f.write(content)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def asset_url(filename):
+    """URL of a static file: fingerprinted when assets were built, plain `static` otherwise."""
+    build = current_app.extensions.get('assets')
+    if build is None or current_app.debug:
+        return url_for('static', filename=filename)
+    return build.url_for(filename)
+
+
+def init_app(app):
+    """Build fingerprinted assets (unless disabled), serve them and expose `asset_url` to templates."""
+    app.jinja_env.globals['asset_url'] = asset_url
+    if not app.config['ASSET_FINGERPRINTING']:
+        return None
+
+    build = AssetBuild(
+        app.static_folder,
+        app.config['ASSET_BUILD_FOLDER'],
+        exclude=[os.path.dirname(app.config['UPLOAD_FOLDER'])],
+        icon_sources=[os.path.join(app.root_path, app.template_folder), app.static_folder]
+    ).build()
+    app.extensions['assets'] = build
+
+    @app.route('/assets/<path:filename>')
+    def asset(filename):
+        if filename not in build.encodings:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding, suffix = None, ''
+        for candidate, candidate_suffix in ENCODINGS:
+            if candidate in build.encodings[filename] and request.accept_encodings[candidate]:
+                encoding, suffix = candidate, candidate_suffix
+                break
+
+        # Names change with content, so a given URL can be cached forever
+        response = send_from_directory(build.build_folder, filename + suffix, mimetype=mimetype, max_age=365 * 24 * 3600)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if encoding:
+            response.content_encoding = encoding
+        if build.encodings[filename]:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    return build
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Memory is bounded both by entry count and by the total of the `size`
+    values given to `set()` (callers pass the byte length of the cached
+    payload). Least recently used entries are evicted first.
+    """
+
+    def __init__(self, ttl, max_entries=1000, max_bytes=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, size=0):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_where(self, predicate):
+        """Remove every entry whose value matches `predicate`. Returns how many were removed."""
+        with self._lock:
+            keys = [key for key, (_, _, value) in self._entries.items() if predicate(value)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+
+class StaleWhileRevalidate:
+    """A single cached value that is served immediately and refreshed in the background.
+
+    Once the value is older than `refresh_after` seconds, the next read
+    submits one refresh to `executor` and still returns the current value.
+    If a refresh fails the last good value keeps being served. Concurrent
+    readers share one in-flight fetch, so a burst of traffic turns into at
+    most one backend call.
+    """
+
+    def __init__(self, fetch, refresh_after, executor, cold_wait=5.0):
+        self.fetch = fetch
+        self.refresh_after = refresh_after
+        self.executor = executor
+        self.cold_wait = cold_wait
+        self._value = None
+        self._has_value = False
+        self._fetched_at = None
+        self._attempted_at = 0.0
+        self._future = None
+        self._lock = threading.Lock()
+        self.last_error = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def get(self, default=None):
+        with self._lock:
+            stale = not self._has_value or time.monotonic() - self._attempted_at >= self.refresh_after
+            if stale and self._future is None:
+                self._attempted_at = time.monotonic()
+                self._future = self.executor.submit(self._refresh)
+            future = self._future
+            if self._has_value:
+                self.hits += 1
+                return self._value
+            self.misses += 1
+
+        # Nothing cached yet: wait for the shared in-flight fetch
+        try:
+            future.result(timeout=self.cold_wait)
+        except Exception:
+            pass
+        with self._lock:
+            return self._value if self._has_value else default
+
+    def _refresh(self):
+        try:
+            value = self.fetch()
+        except Exception as e:
+            with self._lock:
+                self.last_error = e
+                self.failures += 1
+                self._future = None
+            raise
+        with self._lock:
+            self._value = value
+            self._has_value = True
+            self._fetched_at = time.monotonic()
+            self.last_error = None
+            self.refreshes += 1
+            self._future = None
+        return value
+
+    def age(self):
+        """Seconds since the last successful fetch, or None if never fetched."""
+        if self._fetched_at is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'age': self.age(),
+                'last_error': str(self.last_error) if self.last_error else None
+            }
@@ -0,0 +1,139 @@
+from collections import deque
+import logging
+import threading
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """Raised instead of calling an endpoint group whose circuit is open.
+
+    A ConnectionError subclass, so code that already handles an unreachable
+    backend (route fallbacks, background retries) handles this the same way,
+    only without waiting on a socket.
+    """
+
+    def __init__(self, group, retry_in):
+        super().__init__(f"Backend unavailable ('{group}' endpoints failing), retrying in {retry_in:.0f}s")
+        self.group = group
+        self.retry_in = retry_in
+
+
+def endpoint_group(path):
+    """'/matchmaker/users?x=1' -> 'matchmaker', '/user/42' -> 'user'"""
+    return path.split('?', 1)[0].strip('/').split('/', 1)[0] or '/'
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one group of backend endpoints.
+
+    Outcomes of the calls made in the last `window` seconds are kept. Once
+    at least `min_calls` were made and `failure_rate` of them failed, the
+    circuit opens and calls fail immediately with CircuitOpen. After
+    `open_seconds` it goes half-open: up to `half_open_calls` trial calls
+    are let through, and the first result closes the circuit again or
+    re-opens it.
+    """
+
+    def __init__(self, group, failure_rate=0.5, min_calls=5, window=30.0, open_seconds=15.0, half_open_calls=1):
+        self.group = group
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._outcomes = deque()  # (finished_at, failed)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self):
+        """Raise CircuitOpen if the call must not be made."""
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.open_seconds:
+                    self.rejected += 1
+                    raise CircuitOpen(self.group, self.open_seconds - elapsed)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpen(self.group, 0)
+                self._trials += 1
+
+    def record(self, failed):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._transition(OPEN if failed else CLOSED)
+                return
+            if self.state == OPEN:
+                # A call that started before the circuit opened
+                return
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+            failures = sum(1 for _, f in self._outcomes if f)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        if state == self.state:
+            return
+        logger.warning("Circuit for '%s' backend endpoints: %s -> %s", self.group, self.state, state)
+        self.state = state
+        self._trials = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.opened += 1
+        self._outcomes.clear()
+
+    def stats(self):
+        with self._lock:
+            failures = sum(1 for _, f in self._outcomes if f)
+            return {
+                'state': self.state,
+                'calls': len(self._outcomes),
+                'failures': failures,
+                'rejected': self.rejected,
+                'opened': self.opened
+            }
+
+
+class CircuitBreakers:
+    """One CircuitBreaker per endpoint group, created on first use."""
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def for_path(self, path):
+        group = endpoint_group(path)
+        breaker = self._breakers.get(group)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(group, CircuitBreaker(group, **self.settings))
+        return breaker
+
+    def open_groups(self):
+        """Groups currently failing fast (open or half-open)."""
+        return sorted(group for group, breaker in list(self._breakers.items()) if breaker.state != CLOSED)
+
+    def stats(self):
+        return {group: breaker.stats() for group, breaker in list(self._breakers.items())}
+
+
+def is_failure(response=None, error=None):
+    """Backend trouble counts against the circuit; 4xx answers are the backend working."""
+    if error is not None:
+        return not isinstance(error, CircuitOpen)
+    return response.status_code >= 500
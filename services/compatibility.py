@@ -0,0 +1,118 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+import math
+import time
+from flask import current_app
+from services.api_client import api, current_token
+from services.cache import TTLCache
+
+
+def init_app(app):
+    """Create the pair compatibility cache and the workers that fill compatibility matrices."""
+    app.extensions['compatibility_cache'] = TTLCache(
+        ttl=app.config['COMPATIBILITY_CACHE_TTL'],
+        max_entries=app.config['COMPATIBILITY_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['COMPATIBILITY_CACHE_MAX_BYTES']
+    )
+    # Shared by every matrix on this worker, so together they never have more
+    # than this many compatibility calls in flight
+    app.extensions['compatibility_workers'] = ThreadPoolExecutor(
+        max_workers=app.config['COMPATIBILITY_MATRIX_WORKERS'],
+        thread_name_prefix='compatibility-matrix'
+    )
+    return app.extensions['compatibility_cache']
+
+
+def compatibility_cache():
+    return current_app.extensions['compatibility_cache']
+
+
+def _key(user_a_id, user_b_id, token=None):
+    # Scoped by matchmaker token, like the applicant cache; pairs are ordered
+    return (token or current_token(), int(user_a_id), int(user_b_id))
+
+
+def cached_compatibility(user_a_id, user_b_id):
+    """The cached `/matches/compatibility/{a}/{b}` payload, or None on a miss."""
+    return compatibility_cache().get(_key(user_a_id, user_b_id))
+
+
+def store_compatibility(user_a_id, user_b_id, response, token=None):
+    """Cache the payload of a successful `/matches/compatibility/{a}/{b}` response and return it."""
+    payload = response.json()
+    compatibility_cache().set(_key(user_a_id, user_b_id, token), payload, size=len(response.content))
+    return payload
+
+
+def fetch_compatibility(user_a_id, user_b_id, token=None):
+    """Fetch a pair's payload through the cache.
+
+    Returns the payload, or None if the backend did not answer 200.
+    Connection errors propagate to the caller.
+    """
+    payload = compatibility_cache().get(_key(user_a_id, user_b_id, token))
+    if payload is not None:
+        return payload
+    response = api.get(f"/matches/compatibility/{user_a_id}/{user_b_id}", token=token or current_token())
+    if response.status_code != 200:
+        response.close()
+        return None
+    return store_compatibility(user_a_id, user_b_id, response, token)
+
+
+def compatibility_cells(pairs):
+    """Yield (user_a_id, user_b_id, payload) for each pair, in the order they complete.
+
+    Cached pairs come first; the rest are fetched on the shared matrix
+    workers, at most COMPATIBILITY_MATRIX_WORKERS at a time for this matrix,
+    so one large matrix does not queue ahead of every other. The backend's
+    payload is directional (each applicant's preferences against the
+    other's profile), so (a, b) and (b, a) are separate calls: n applicants
+    take n * (n - 1). The matrix gets COMPATIBILITY_MATRIX_CALL_SECONDS for
+    each round of the window those calls need.
+
+    A payload is None if the backend did not answer 200, or the exception
+    the call failed with; pairs still missing when the time is up get a
+    TimeoutError. Closing the generator (the browser went away) cancels the
+    calls that have not started.
+    """
+    app = current_app._get_current_object()
+    token = current_token()
+    window = app.config['COMPATIBILITY_MATRIX_WORKERS']
+    missing = []
+    for user_a_id, user_b_id in pairs:
+        payload = cached_compatibility(user_a_id, user_b_id)
+        if payload is not None:
+            yield user_a_id, user_b_id, payload
+        else:
+            missing.append((user_a_id, user_b_id))
+
+    def fetch(user_a_id, user_b_id):
+        with app.app_context():
+            return fetch_compatibility(user_a_id, user_b_id, token)
+
+    workers = app.extensions['compatibility_workers']
+    deadline = time.monotonic() + math.ceil(len(missing) / window) * app.config['COMPATIBILITY_MATRIX_CALL_SECONDS']
+    waiting = iter(missing)
+    futures = {}
+
+    def submit(count):
+        for pair in islice(waiting, count):
+            futures[workers.submit(fetch, *pair)] = pair
+
+    try:
+        submit(window)
+        while futures:
+            done, _ = wait(futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            # Keep the window full while the finished cells are rendered
+            submit(len(done))
+            for future in done:
+                user_a_id, user_b_id = futures.pop(future)
+                yield user_a_id, user_b_id, future.exception() or future.result()
+        for user_a_id, user_b_id in [*futures.values(), *waiting]:
+            yield user_a_id, user_b_id, TimeoutError("compatibility matrix deadline expired")
+    finally:
+        for future in futures:
+            future.cancel()
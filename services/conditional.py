@@ -0,0 +1,160 @@
+import datetime
+import hashlib
+import json
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from services.api_client import api, current_token
+from services.cache import TTLCache
+
+
+class ConditionalPage:
+    """Strong ETag for a page, built from the backend data it renders.
+
+    Each piece of data the page shows is added as a validator: the backend's
+    own ETag when it sends one, otherwise a digest of the payload. The page
+    ETag also covers the templates and static assets, the matchmaker, the
+    URL and the degraded-mode banner, so equal tags mean identical HTML.
+
+    `get()` fetches a backend resource. When the browser is revalidating and
+    the backend sent an ETag for that resource last time, the request is made
+    conditional upstream too; if the backend answers 304 and the page is
+    unchanged, `not_modified` is set and no body is downloaded at all. Add
+    every other validator before calling `get()` so this can be decided.
+
+    Pages with pending flash messages, and all pages in debug mode, get no
+    ETag: their HTML is not determined by the data alone.
+    """
+
+    def __init__(self):
+        self.validators = []
+        self.not_modified = False
+        # Responses whose body add_response() read into memory, for body_read()
+        self._read = []
+        # Responses get() returned, closed by respond() if the page turns out fresh
+        self._responses = []
+        self.enabled = (
+            current_app.config['CONDITIONAL_GET']
+            and not current_app.debug
+            and not session.get('_flashes')
+        )
+
+    def add(self, data):
+        """Add data the page renders (any JSON-serialisable value)."""
+        payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode()
+        self.validators.append(hashlib.sha256(payload).hexdigest())
+
+    def add_response(self, response):
+        """Add a 200 backend response: its ETag, or a digest of its body (which reads it)."""
+        etag = response.headers.get('ETag')
+        if etag:
+            self.validators.append(etag)
+        else:
+            self.validators.append(hashlib.sha256(response.content).hexdigest())
+            self._read.append(response)
+
+    def body_read(self, response):
+        """True if `add_response()` read the body of `response` (a streamed one is then in memory)."""
+        return any(read is response for read in self._read)
+
+    def get(self, path, params=None, stream=False):
+        """GET `path`, revalidating upstream when the browser is revalidating the page.
+
+        Returns the backend response, or None when `not_modified` was set.
+        The response is added as a validator if it is a 200.
+        """
+        key = (current_token(), path, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())))
+        known = page_validators().get(key) if self.enabled and request.if_none_match else None
+        try:
+            if known is not None:
+                response = api.get(path, params=params, stream=stream, headers={'If-None-Match': known})
+                if response.status_code == 304:
+                    response.close()
+                    self.validators.append(known)
+                    if self.fresh():
+                        self.not_modified = True
+                        return None
+                    # Our copy changed for another reason; the body is needed after all
+                    self.validators.pop()
+                    response = api.get(path, params=params, stream=stream)
+            else:
+                response = api.get(path, params=params, stream=stream)
+        except Exception:
+            # Error pages are not determined by the data
+            self.enabled = False
+            raise
+
+        self._responses.append(response)
+        if response.status_code != 200:
+            self.enabled = False
+        elif self.enabled:
+            if response.headers.get('ETag'):
+                page_validators().set(key, response.headers['ETag'])
+            self.add_response(response)
+        return response
+
+    @property
+    def etag(self):
+        if not self.enabled:
+            return None
+        digest = hashlib.sha256()
+        breakers = current_app.extensions['api_client'].breakers
+        for part in (page_version(current_app), current_user.get_id(), current_user.name, request.full_path,
+                     datetime.date.today().year, *sorted(breakers.open_groups()), *self.validators):
+            digest.update(str(part).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()[:32]
+
+    def fresh(self):
+        """True if the browser's copy of the page is current; render nothing and `respond()`."""
+        if self.not_modified:
+            return True
+        etag = self.etag
+        return etag is not None and etag in request.if_none_match
+
+    def respond(self, body=None):
+        """Build the response: 304 if the browser's copy is current, else `body` with the ETag set.
+
+        A 304 closes the backend responses from `get()`: their bodies (still
+        unread if streamed) are not needed, and their connections go back to
+        the pool.
+        """
+        etag = self.etag
+        if self.fresh():
+            for upstream in self._responses:
+                upstream.close()
+            response = make_response('', 304)
+        else:
+            response = make_response(body)
+        if etag is not None:
+            response.set_etag(etag)
+            # Per-matchmaker pages; the browser keeps them but must revalidate each time
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def page_version(app):
+    """Digest of every template and static asset: pages change when any of them does."""
+    version = app.extensions.get('page_version')
+    if version is None:
+        digest = hashlib.sha256()
+        for name in sorted(app.jinja_env.list_templates()):
+            digest.update(name.encode())
+            digest.update(app.jinja_env.loader.get_source(app.jinja_env, name)[0].encode())
+        build = app.extensions.get('assets')
+        if build is not None:
+            digest.update(json.dumps(build.manifest, sort_keys=True).encode())
+        version = app.extensions['page_version'] = digest.hexdigest()
+    return version
+
+
+def page_validators():
+    return current_app.extensions['page_validators']
+
+
+def init_app(app):
+    """Remember backend ETags, so revalidated pages can be revalidated upstream too."""
+    app.extensions['page_validators'] = TTLCache(
+        ttl=24 * 3600,
+        max_entries=app.config['CONDITIONAL_VALIDATOR_MAX_ENTRIES']
+    )
+    return app.extensions['page_validators']
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardStats:
+    """Per-matchmaker `/matchmaker/stats`, kept warm by a background refresher.
+
+    Reads never call the backend: they return the last fetched value (or
+    None before the first fetch completes) and, if it is missing or older
+    than `refresh_interval`, queue a refresh. A refresher thread re-fetches
+    the stats of every matchmaker seen within `idle_timeout`, and forgets
+    matchmakers that have gone idle.
+
+    Refreshes run on their own `workers` threads, not the API client's
+    fan-out pool, so they never queue ahead of the calls a page is waiting for.
+    """
+
+    def __init__(self, client, refresh_interval, idle_timeout, workers=2):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.idle_timeout = idle_timeout
+        # Threads are only started by the first submit, after a forking server has spawned its workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-stats')
+        self._entries = {}  # token -> {'value', 'fetched_at', 'last_seen', 'error', 'refreshing'}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.setdefault(token, self._new_entry())
+            entry['last_seen'] = now
+            value = entry['value']
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None or now - entry['fetched_at'] >= self.refresh_interval:
+            self.refresh_async(token)
+        return value
+
+    def put(self, token, value):
+        """Store stats fetched elsewhere (e.g. as part of a page fan-out)."""
+        with self._lock:
+            entry = self._entries.setdefault(token, self._new_entry())
+            entry.update(value=value, fetched_at=time.monotonic(), last_seen=time.monotonic(), error=None)
+
+    def last_error(self, token):
+        entry = self._entries.get(token)
+        return entry['error'] if entry else None
+
+    def warm(self, token):
+        """Start fetching a matchmaker's stats ahead of the first page view (e.g. at login)."""
+        with self._lock:
+            self._entries.setdefault(token, self._new_entry())['last_seen'] = time.monotonic()
+        self.refresh_async(token)
+
+    def forget(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def refresh_async(self, token):
+        self._start_refresher()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry['refreshing']:
+                return
+            entry['refreshing'] = True
+        self.executor.submit(self._refresh, token)
+
+    def _refresh(self, token):
+        value, error = None, None
+        try:
+            response = self.client.get('/matchmaker/stats', token=token)
+            if response.status_code == 200:
+                value = response.json()
+            else:
+                error = f"/matchmaker/stats returned status {response.status_code}"
+        except Exception as e:
+            error = str(e)
+
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return
+            entry['refreshing'] = False
+            if error is None:
+                entry.update(value=value, fetched_at=time.monotonic(), error=None)
+            else:
+                # Keep serving the last good value
+                entry['error'] = error
+        if error is not None:
+            logger.warning("Stats refresh failed: %s", error)
+
+    def _start_refresher(self):
+        # Started lazily so no thread exists before a forking server spawns its workers
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='dashboard-stats', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            now = time.monotonic()
+            with self._lock:
+                for token, entry in list(self._entries.items()):
+                    if now - entry['last_seen'] > self.idle_timeout:
+                        del self._entries[token]
+                active = list(self._entries)
+            for token in active:
+                self.refresh_async(token)
+
+    @staticmethod
+    def _new_entry():
+        return {'value': None, 'fetched_at': 0.0, 'last_seen': 0.0, 'error': None, 'refreshing': False}
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+def init_app(app):
+    app.extensions['dashboard_stats'] = DashboardStats(
+        app.extensions['api_client'],
+        refresh_interval=app.config['STATS_REFRESH_INTERVAL'],
+        idle_timeout=app.config['STATS_IDLE_TIMEOUT'],
+        workers=app.config['STATS_REFRESH_WORKERS']
+    )
+    return app.extensions['dashboard_stats']
+
+
+def dashboard_stats():
+    return current_app.extensions['dashboard_stats']
@@ -0,0 +1,108 @@
+from flask import current_app, send_from_directory, url_for
+import hashlib
+import os
+import re
+import uuid
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Square variants produced for every picture, in pixels
+VARIANTS = {'thumb': 96, 'medium': 480}
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+MAX_PIXELS = 40_000_000
+
+PICTURE_URL = re.compile(r'/media/pictures/(?P<digest>[0-9a-f]{32})-(?:thumb|medium)\.(?:jpg|webp)$')
+
+
+class InvalidImage(Exception):
+    """The upload could not be decoded as a supported image."""
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def variant_filename(digest, variant, ext):
+    return f"{digest}-{variant}.{ext}"
+
+
+def process_picture(source_path, directory):
+    """Decode, validate and re-encode an uploaded picture into its variants.
+
+    Files are named by the hash of the uploaded bytes, so a duplicate
+    upload reuses the variants already on disk. Returns the hash.
+    """
+    digest = content_hash(source_path)
+    targets = [(variant, ext) for variant in VARIANTS for ext in FORMATS]
+    if all(os.path.exists(os.path.join(directory, variant_filename(digest, v, e))) for v, e in targets):
+        return digest
+
+    try:
+        with Image.open(source_path) as img:
+            if img.format not in ALLOWED_FORMATS:
+                raise InvalidImage(f"Unsupported image format {img.format}")
+            if img.width * img.height > MAX_PIXELS:
+                raise InvalidImage("Image dimensions are too large")
+            # Full decode: truncated or corrupt files fail here, not later
+            img.load()
+            img = ImageOps.exif_transpose(img)
+            img = _flatten(img)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e)) from e
+
+    for variant, size in VARIANTS.items():
+        resized = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+        for ext, (image_format, options) in FORMATS.items():
+            _write(resized, os.path.join(directory, variant_filename(digest, variant, ext)), image_format, options)
+    return digest
+
+
+def _flatten(img):
+    """Convert to RGB, compositing any transparency onto white."""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def _write(img, path, image_format, options):
+    partial_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        img.save(partial_path, image_format, **options)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def picture_url(url, variant='medium', ext='jpg'):
+    """URL of one variant of a processed picture.
+
+    Returns None for pictures that did not go through the pipeline (older
+    uploads, or images hosted by the backend), so templates can fall back
+    to the original URL.
+    """
+    match = PICTURE_URL.search(url or '')
+    if not match:
+        return None
+    return url_for('picture', filename=variant_filename(match.group('digest'), variant, ext))
+
+
+def init_app(app):
+    """Serve processed pictures with immutable cache headers and expose `picture_url` to templates."""
+
+    @app.route('/media/pictures/<path:filename>')
+    def picture(filename):
+        # Names are content hashes, so a given URL never changes
+        response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, max_age=365 * 24 * 3600)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.jinja_env.globals['picture_url'] = picture_url
@@ -0,0 +1,40 @@
+from flask import request
+
+
+class BadQuery(ValueError):
+    """A query argument of a data endpoint is invalid; the message says which."""
+
+
+def page_args(default_limit, max_limit):
+    """(page, limit) from the `page` and `limit` query arguments, clamped to sane values."""
+    try:
+        limit = min(max(int(request.args.get('limit', default_limit)), 1), max_limit)
+        page = max(int(request.args.get('page', 1)), 1)
+    except ValueError:
+        raise BadQuery("page and limit must be integers")
+    return page, limit
+
+
+def requested_fields(default, allowed):
+    """Dotted field names from the `fields` query argument (e.g. `score,user_b.name`), or `default`."""
+    value = request.args.get('fields', '').strip()
+    if not value:
+        return default
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadQuery(f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def select_fields(record, fields):
+    """Copy only `fields` of `record`; 'user_a.name' copies `record['user_a']['name']` into a nested dict."""
+    selected = {}
+    for field in fields:
+        source, target = record, selected
+        *parents, name = field.split('.')
+        for parent in parents:
+            source = source.get(parent) or {}
+            target = target.setdefault(parent, {})
+        target[name] = source.get(name)
+    return selected
@@ -0,0 +1,57 @@
+import io
+import ijson
+
+
+def iter_matches(response, meta=None, body_read=False):
+    """Yield the match objects of a streamed backend response one at a time.
+
+    Accepts either a top-level JSON array or an object with a `matches`
+    array, the two shapes the backend returns. Only one match is built in
+    memory at a time; the raw body and the full parsed tree are never held.
+    Top-level scalar fields of an object payload (e.g. `has_more`) are
+    collected into `meta` if a dict is given. The response is closed when
+    the generator finishes so its connection goes back to the pool.
+
+    The response must have been requested with `stream=True`. If the caller
+    has already read its body (e.g. to digest it for an ETag), it says so
+    with `body_read` and the body is parsed from memory instead.
+    """
+    if body_read:
+        body = io.BytesIO(response.content)
+    else:
+        body = response.raw
+        body.decode_content = True
+    try:
+        events = ijson.parse(body, use_float=True)
+        item_prefix = None
+        for prefix, event, value in events:
+            if item_prefix is None:
+                # The first event tells us the payload shape
+                item_prefix = 'item' if event == 'start_array' else 'matches.item'
+                continue
+
+            if prefix == item_prefix:
+                if event in ('start_map', 'start_array'):
+                    yield _build(events, event, value)
+                else:
+                    yield value
+            elif meta is not None and '.' not in prefix and event in ('string', 'number', 'boolean', 'null'):
+                meta[prefix] = value
+    finally:
+        response.close()
+
+
+def _build(events, event, value):
+    """Assemble one JSON value from the parser events that follow its start event."""
+    builder = ijson.ObjectBuilder()
+    depth = 1
+    builder.event(event, value)
+    for _, event, value in events:
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
@@ -0,0 +1,30 @@
+from flask import current_app
+from services.cache import StaleWhileRevalidate
+
+
+def init_app(app):
+    """Create the process-wide cache of the public matchmaker directory."""
+    client = app.extensions['api_client']
+
+    def fetch_directory():
+        # Runs on a worker thread with no request context, so no bearer header is sent
+        response = client.get('/matchmaker')
+        if response.status_code != 200:
+            raise ValueError(f"/matchmaker returned status {response.status_code}")
+        return response.json()
+
+    app.extensions['matchmaker_directory'] = StaleWhileRevalidate(
+        fetch_directory,
+        refresh_after=app.config['MATCHMAKER_DIRECTORY_REFRESH'],
+        executor=client.executor
+    )
+    return app.extensions['matchmaker_directory']
+
+
+def matchmaker_directory():
+    return current_app.extensions['matchmaker_directory']
+
+
+def get_matchmakers():
+    """Return the cached matchmaker list, or [] if it has never been fetched."""
+    return matchmaker_directory().get(default=[])
@@ -0,0 +1,191 @@
+import time
+from flask import g, request, Response
+from flask.signals import before_render_template, template_rendered
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def endpoint_template(path):
+    """'/user/42/matches?limit=5' -> '/user/{id}/matches'"""
+    path = path.split('?', 1)[0]
+    return '/' + '/'.join('{id}' if part.isdigit() else part for part in path.strip('/').split('/'))
+
+
+class Metrics:
+    """Prometheus metrics for one app, exposed at /metrics.
+
+    Values are kept per worker process; each worker reports its own series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.registry = CollectorRegistry()
+        self.request_latency = Histogram(
+            'frontend_request_duration_seconds', 'Time to produce a response, by route',
+            ['route', 'method'], registry=self.registry, buckets=LATENCY_BUCKETS
+        )
+        self.requests = Counter(
+            'frontend_requests', 'Responses sent, by route and status code',
+            ['route', 'method', 'status'], registry=self.registry
+        )
+        self.render_latency = Histogram(
+            'frontend_template_render_duration_seconds', 'Jinja render time, by template',
+            ['template'], registry=self.registry, buckets=LATENCY_BUCKETS
+        )
+        self.backend_latency = Histogram(
+            'backend_request_duration_seconds', 'Backend API call time, by endpoint template',
+            ['endpoint', 'method'], registry=self.registry, buckets=LATENCY_BUCKETS
+        )
+        self.backend_requests = Counter(
+            'backend_requests', 'Backend API responses, by endpoint template and status code',
+            ['endpoint', 'method', 'status'], registry=self.registry
+        )
+        self.backend_errors = Counter(
+            'backend_errors', 'Backend API calls that raised, by endpoint template and exception type',
+            ['endpoint', 'method', 'error'], registry=self.registry
+        )
+        self.registry.register(CacheCollector(app))
+        self.registry.register(QueueCollector(app))
+        self.registry.register(BreakerCollector(app))
+
+    def observe_backend(self, method, path, elapsed, response=None, error=None):
+        endpoint = self.app.config['API_URL'].rstrip('/') + endpoint_template(path)
+        self.backend_latency.labels(endpoint, method).observe(elapsed)
+        if error is not None:
+            self.backend_errors.labels(endpoint, method, type(error).__name__).inc()
+        else:
+            self.backend_requests.labels(endpoint, method, str(response.status_code)).inc()
+
+
+class CacheCollector:
+    """Reports hit/miss counters for every cache the app keeps in `app.extensions`.
+
+    Any extension whose `stats()` returns `hits` and `misses` counts as a cache.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        hits = CounterMetricFamily('frontend_cache_hits', 'Cache lookups served from cache', labels=['cache'])
+        misses = CounterMetricFamily('frontend_cache_misses', 'Cache lookups that missed', labels=['cache'])
+        entries = GaugeMetricFamily('frontend_cache_entries', 'Entries currently cached', labels=['cache'])
+        for name, cache in self.app.extensions.items():
+            if not callable(getattr(cache, 'stats', None)):
+                continue
+            stats = cache.stats()
+            if 'hits' not in stats or 'misses' not in stats:
+                continue
+            hits.add_metric([name], stats['hits'])
+            misses.add_metric([name], stats['misses'])
+            if 'entries' in stats:
+                entries.add_metric([name], stats['entries'])
+        yield hits
+        yield misses
+        yield entries
+
+
+class QueueCollector:
+    """Reports depth, age and delivery counters for every queue in `app.extensions`.
+
+    Any extension whose `stats()` returns `depth` and `oldest_age` counts as a queue.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        depth = GaugeMetricFamily('frontend_queue_depth', 'Items waiting to be delivered', labels=['queue'])
+        failed_depth = GaugeMetricFamily('frontend_queue_failed_depth', 'Items that gave up and are kept for inspection', labels=['queue'])
+        age = GaugeMetricFamily('frontend_queue_oldest_age_seconds', 'Age of the oldest waiting item', labels=['queue'])
+        delivered = CounterMetricFamily('frontend_queue_delivered', 'Items delivered by this worker', labels=['queue'])
+        retries = CounterMetricFamily('frontend_queue_retries', 'Delivery attempts that will be retried', labels=['queue'])
+        failed = CounterMetricFamily('frontend_queue_failed', 'Items that gave up', labels=['queue'])
+        for name, queue in self.app.extensions.items():
+            if not callable(getattr(queue, 'stats', None)):
+                continue
+            stats = queue.stats()
+            if 'depth' not in stats or 'oldest_age' not in stats:
+                continue
+            depth.add_metric([name], stats['depth'])
+            age.add_metric([name], stats['oldest_age'])
+            failed_depth.add_metric([name], stats.get('failed_depth', 0))
+            delivered.add_metric([name], stats.get('delivered', 0))
+            retries.add_metric([name], stats.get('retries', 0))
+            failed.add_metric([name], stats.get('failed', 0))
+        yield depth
+        yield failed_depth
+        yield age
+        yield delivered
+        yield retries
+        yield failed
+
+
+class BreakerCollector:
+    """Reports the state of each backend endpoint group's circuit breaker."""
+
+    STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        state = GaugeMetricFamily('backend_circuit_state', 'Circuit state by endpoint group (0 closed, 1 half-open, 2 open)', labels=['group'])
+        rejected = CounterMetricFamily('backend_circuit_rejected', 'Calls failed fast by an open circuit', labels=['group'])
+        opened = CounterMetricFamily('backend_circuit_opened', 'Times the circuit opened', labels=['group'])
+        for group, stats in self.app.extensions['api_client'].breakers.stats().items():
+            state.add_metric([group], self.STATES[stats['state']])
+            rejected.add_metric([group], stats['rejected'])
+            opened.add_metric([group], stats['opened'])
+        yield state
+        yield rejected
+        yield opened
+
+
+def init_app(app):
+    """Instrument requests, renders and backend calls, and add the /metrics endpoint."""
+    metrics = Metrics(app)
+    app.extensions['metrics'] = metrics
+    app.extensions['api_client'].hooks.append(metrics.observe_backend)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @before_render_template.connect_via(app, weak=False)
+    def start_render(sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    @template_rendered.connect_via(app, weak=False)
+    def end_render(sender, template, context, **extra):
+        elapsed = time.perf_counter() - g.pop('render_started', time.perf_counter())
+        g.render_seconds = g.get('render_seconds', 0.0) + elapsed
+        metrics.render_latency.labels(template.name or 'string').observe(elapsed)
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.request_latency.labels(route, request.method).observe(total)
+        metrics.requests.labels(route, request.method, str(response.status_code)).inc()
+
+        # Streamed pages finish rendering after this point, so only time spent so far is reported
+        timings = [
+            f"backend;dur={g.get('backend_seconds', 0.0) * 1000:.1f}",
+            f"render;dur={g.get('render_seconds', 0.0) * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}"
+        ]
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(generate_latest(metrics.registry), content_type=CONTENT_TYPE_LATEST)
+
+    return metrics
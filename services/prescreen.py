@@ -0,0 +1,302 @@
+import re
+import numpy as np
+from flask import current_app
+from services.api_client import current_token
+from services.cache import TTLCache
+
+# Ordinal encodings of the UserProfileForm choices; anything else is unknown
+RELIGIOUS_LEVELS = {'secular': 0, 'traditional': 1, 'modern_orthodox': 2, 'yeshivish': 3, 'hassidic': 4}
+KOSHER_LEVELS = {'strict': 0, 'kosher_out': 1, 'vegetarian': 1, 'not_strict': 2}
+SHABBAT_LEVELS = {'strict': 0, 'partial': 1, 'not_observant': 2}
+WANTS_CHILDREN = {'yes': 1, 'undecided': 0, 'no': -1}
+GENDERS = {'male': 0, 'female': 1}
+
+# Preferences a what-if preview can override
+PREFERENCE_FIELDS = ('age_range_min', 'age_range_max', 'height_preference_min', 'height_preference_max',
+                     'religious_preference', 'location_preference')
+
+# Weight of each factor in the overall score, as shown on the compatibility page
+FACTOR_WEIGHTS = {
+    'religious_compatibility': 3,
+    'kosher_compatibility': 2,
+    'shabbat_compatibility': 2,
+    'family_compatibility': 2,
+    'age_compatibility': 1,
+    'location_compatibility': 1,
+}
+# What each factor compares, for its notes: (label, profile field)
+FACTOR_FIELDS = {
+    'religious_compatibility': ('religious level', 'religious_level'),
+    'kosher_compatibility': ('kosher', 'kosher_level'),
+    'shabbat_compatibility': ('shabbat', 'shabbat_observance'),
+    'family_compatibility': ('wants children', 'wants_children'),
+    'age_compatibility': ('age', 'age'),
+    'location_compatibility': ('city', 'city'),
+}
+# Score of a factor when either side has not filled it in
+UNKNOWN_SCORE = 50
+
+
+class PrescreenEngine:
+    """Local, vectorised pre-screening of one matchmaker's applicants against each other.
+
+    The applicants are encoded into NumPy columns (NaN or -1 where a field is
+    missing). `accepts(a, b)` evaluates every hard preference of the
+    applicants at rows `a` against the applicants at rows `b` in one batch;
+    a pair fits when each accepts the other. Missing data never excludes
+    anyone: it is for the backend's full matching to decide. `scores()`
+    gives the weighted factor breakdown, per pair, in the shape of the
+    backend's compatibility payload.
+
+    Hard preferences: opposite gender, age and height within the other's
+    ranges, religious level as preferred, city or country named in the
+    location preference, kosher and Shabbat observance at most one level
+    apart, and not one wanting children where the other does not.
+    """
+
+    def __init__(self, users):
+        self.records = [user for user in users if isinstance(user, dict) and 'id' in user]
+        self.ids = np.array([int(user['id']) for user in self.records], dtype=np.int64)
+        self.rows = {user_id: row for row, user_id in enumerate(self.ids.tolist())}
+
+        def column(field, encode):
+            return _column(self.records, field, encode)
+        self.gender = np.array([GENDERS.get(_text(user.get('gender')), -1) for user in self.records], dtype=np.int8)
+        self.age = column('age', _number)
+        self.height = column('height', _number)
+        self.religious = column('religious_level', lambda value: RELIGIOUS_LEVELS.get(_text(value), np.nan))
+        self.kosher = column('kosher_level', lambda value: KOSHER_LEVELS.get(_text(value), np.nan))
+        self.shabbat = column('shabbat_observance', lambda value: SHABBAT_LEVELS.get(_text(value), np.nan))
+        self.children = column('wants_children', lambda value: WANTS_CHILDREN.get(_text(value), np.nan))
+
+        # Places (cities and countries) are codes into `places`; len(places) means unknown
+        self.places = sorted({place for user in self.records
+                              for place in (_text(user.get('city')), _text(user.get('country'))) if place})
+        codes = {place: code for code, place in enumerate(self.places)}
+        self.city = np.array([codes.get(_text(user.get('city')), len(self.places)) for user in self.records], dtype=np.int32)
+        self.country = np.array([codes.get(_text(user.get('country')), len(self.places)) for user in self.records], dtype=np.int32)
+        self.preferences = self.encode_preferences(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the encoded columns (the records are shared with the applicant index)."""
+        arrays = [*vars(self).values(), *self.preferences.values()]
+        return sum(array.nbytes for array in arrays if isinstance(array, np.ndarray))
+
+    def record(self, user_id):
+        """The applicant record for `user_id`, or None if it is not one of the applicants."""
+        row = self.rows.get(int(user_id))
+        return self.records[row] if row is not None else None
+
+    def encode_preferences(self, users):
+        """Preference columns for `users` (records, or dicts of PREFERENCE_FIELDS)."""
+        def column(field, encode):
+            return _column(users, field, encode)
+        # One row per user: which places its location preference accepts; the
+        # last column is "unknown place", which every preference accepts
+        accepted = np.zeros((len(users), len(self.places) + 1), dtype=bool)
+        accepted[:, -1] = True
+        has_place = np.zeros(len(users), dtype=bool)
+        codes = {place: code for code, place in enumerate(self.places)}
+        for row, user in enumerate(users):
+            wanted = [part.strip() for part in re.split(r'[,;/]|\bor\b|\band\b', _text(user.get('location_preference')))]
+            wanted = [part for part in wanted if part]
+            if wanted and _text(user.get('location_preference')) not in ('any', 'anywhere'):
+                has_place[row] = True
+                accepted[row, [codes[part] for part in wanted if part in codes]] = True
+        return {
+            'age_min': column('age_range_min', _number),
+            'age_max': column('age_range_max', _number),
+            'height_min': column('height_preference_min', _number),
+            'height_max': column('height_preference_max', _number),
+            'religious': column('religious_preference', lambda value: RELIGIOUS_LEVELS.get(_text(value), np.nan)),
+            'has_place': has_place,
+            'places': accepted,
+        }
+
+    def accepts(self, a, b, preferences=None):
+        """Boolean matrix [len(a), len(b)]: does applicant a[i] accept applicant b[j]?
+
+        `preferences` replaces the preference columns of `a` (rows aligned
+        with `a`), for what-if previews.
+        """
+        p = preferences if preferences is not None else {key: values[a] for key, values in self.preferences.items()}
+        gender_a, gender_b = self.gender[a][:, None], self.gender[b][None, :]
+        age_b, height_b, religious_b = self.age[b][None, :], self.height[b][None, :], self.religious[b][None, :]
+        wanted = p['religious'][:, None]
+
+        ok = (gender_a != gender_b) & (gender_a >= 0) & (gender_b >= 0)
+        # Comparisons with NaN are false, so a missing value or bound never excludes
+        ok &= ~(age_b < p['age_min'][:, None]) & ~(age_b > p['age_max'][:, None])
+        ok &= ~(height_b < p['height_min'][:, None]) & ~(height_b > p['height_max'][:, None])
+        ok &= np.isnan(wanted) | np.isnan(religious_b) | (wanted == religious_b)
+        ok &= ~p['has_place'][:, None] | p['places'][:, self.city[b]] | p['places'][:, self.country[b]]
+        ok &= ~(np.abs(self.kosher[a][:, None] - self.kosher[b][None, :]) > 1)
+        ok &= ~(np.abs(self.shabbat[a][:, None] - self.shabbat[b][None, :]) > 1)
+        ok &= ~(self.children[a][:, None] * self.children[b][None, :] < 0)
+        return ok
+
+    def fits(self, a, b, preferences=None):
+        """Pairs that accept each other: `accepts(a, b)` and the transpose of `accepts(b, a)`."""
+        return self.accepts(a, b, preferences) & self.accepts(b, a).T
+
+    def scores(self, a, b):
+        """(overall, {factor: scores}) of 0-100 for the pairs of rows a[i], b[i].
+
+        `a` and `b` broadcast against each other, so `scores(rows[:, None],
+        everyone)` scores every pair of the two.
+        """
+        def distance(values):
+            return np.abs(values[a] - values[b])
+
+        factors = {
+            'religious_compatibility': 100 - 25 * distance(self.religious),
+            'kosher_compatibility': 100 - 40 * distance(self.kosher),
+            'shabbat_compatibility': 100 - 40 * distance(self.shabbat),
+            'age_compatibility': np.clip(100 - 8 * np.maximum(distance(self.age) - 2, 0), 0, 100),
+        }
+
+        children_a, children_b = self.children[a], self.children[b]
+        family = np.where(children_a == children_b, 100, np.where(children_a * children_b < 0, 0, 60))
+        factors['family_compatibility'] = np.where(np.isnan(children_a) | np.isnan(children_b), np.nan, family)
+
+        unknown = len(self.places)
+        city_a, city_b = self.city[a], self.city[b]
+        country_a, country_b = self.country[a], self.country[b]
+        same_city = (city_a == city_b) & (city_a != unknown)
+        same_country = (country_a == country_b) & (country_a != unknown)
+        either_unknown = (city_a == unknown) | (city_b == unknown)
+        factors['location_compatibility'] = np.where(
+            same_city, 100, np.where(same_country, 70, np.where(either_unknown, UNKNOWN_SCORE, 30))
+        )
+
+        overall = np.zeros(np.broadcast_shapes(np.shape(a), np.shape(b)), dtype=np.float32)
+        for name, values in factors.items():
+            values = factors[name] = np.nan_to_num(values, nan=UNKNOWN_SCORE).astype(np.float32, copy=False)
+            overall += FACTOR_WEIGHTS[name] * values
+        overall /= sum(FACTOR_WEIGHTS.values())
+        return overall, factors
+
+    def preview(self, user_id, overrides=None, limit=50):
+        """Best-scoring applicants that fit `user_id`, with its preferences changed by `overrides`.
+
+        Returns (records with a 'prescreen_score', number that fit), or None
+        if `user_id` is not one of the applicants.
+        """
+        row = self.rows.get(int(user_id))
+        if row is None:
+            return None
+        preferences = None
+        if overrides:
+            preferences = self.encode_preferences([{**self.records[row], **overrides}])
+        fitting = np.flatnonzero(self.fits(np.array([row]), np.arange(len(self)), preferences)[0])
+        overall, _ = self.scores(row, fitting)
+        order = np.argsort(-overall, kind='stable')[:limit]
+        return [dict(self.records[j], prescreen_score=round(score, 1))
+                for j, score in zip(fitting[order].tolist(), overall[order].tolist())], len(fitting)
+
+    def compatibility(self, id_a, id_b):
+        """The pair's factor breakdown, shaped like the backend's compatibility payload.
+
+        'fits' says whether the pair meets each other's hard preferences.
+        Each factor's details give both applicants' values.
+        """
+        a, b = self.rows[int(id_a)], self.rows[int(id_b)]
+        overall, factors = self.scores(a, b)
+        compatibility = {}
+        for name, values in factors.items():
+            label, field = FACTOR_FIELDS[name]
+            sides = [self.records[row].get(field) for row in (a, b)]
+            compatibility[name] = {
+                'score': round(float(values), 1),
+                'weight': FACTOR_WEIGHTS[name],
+                'details': {label: ' / '.join('?' if value in (None, '') else str(value) for value in sides)},
+            }
+        return {
+            'score': round(float(overall), 1),
+            'fits': bool(self.fits(np.array([a]), np.array([b]))[0, 0]),
+            'compatibility': compatibility,
+        }
+
+    def screen_all(self, top=10, block=256):
+        """Every applicant's `top` best fitting applicants, screened `block` rows at a time.
+
+        Returns (ids [n, top], scores [n, top], fit counts [n]); an id of -1
+        and score of -1 fill rows with fewer than `top` fits.
+
+        Only men and women can fit each other, and both fitting and scores
+        are symmetric, so each block of men is screened against all the
+        women once and gives both sides' results. Only fitting pairs are
+        scored.
+        """
+        n = len(self)
+        top = min(top, n)
+        best_ids = np.full((n, top), -1, dtype=np.int64)
+        best_scores = np.full((n, top), -1, dtype=np.float32)
+        counts = np.zeros(n, dtype=np.int64)
+        men, women = np.flatnonzero(self.gender == GENDERS['male']), np.flatnonzero(self.gender == GENDERS['female'])
+        if not len(men) or not len(women):
+            return best_ids, best_scores, counts
+        for start in range(0, len(men), block):
+            rows = men[start:start + block]
+            fits = self.fits(rows, women)
+            i, j = np.nonzero(fits)
+            overall = np.full(fits.shape, -1, dtype=np.float32)
+            overall[i, j] = self.scores(rows[i], women[j])[0]
+            counts[rows] = fits.sum(axis=1)
+            counts[women] += fits.sum(axis=0)
+            self._keep_best(best_ids, best_scores, rows, women, overall)
+            self._keep_best(best_ids, best_scores, women, rows, overall.T)
+        return best_ids, best_scores, counts
+
+    def _keep_best(self, best_ids, best_scores, rows, columns, overall):
+        """Merge the best of `overall` [rows, columns] (-1 where a pair does not fit) into the rows' best so far."""
+        top = best_ids.shape[1]
+        if top < overall.shape[1]:
+            part = np.argpartition(-overall, top - 1, axis=1)[:, :top]
+        else:
+            part = np.broadcast_to(np.arange(overall.shape[1]), overall.shape)
+        scores = np.concatenate([best_scores[rows], np.take_along_axis(overall, part, axis=1)], axis=1)
+        ids = np.concatenate([best_ids[rows], self.ids[columns[part]]], axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :top]
+        best_scores[rows] = np.take_along_axis(scores, order, axis=1)
+        best_ids[rows] = np.where(best_scores[rows] >= 0, np.take_along_axis(ids, order, axis=1), -1)
+
+
+def _column(users, field, encode):
+    return np.array([encode(user.get(field)) for user in users], dtype=np.float32)
+
+
+def _text(value):
+    return str(value).strip().casefold() if value is not None else ''
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def prescreen_engine(index):
+    """The pre-screening engine over this matchmaker's applicant index, re-encoded when the index changes."""
+    engines = current_app.extensions['prescreen_engines']
+    cached = engines.get(current_token())
+    if cached is not None and cached[0] == index.version:
+        return cached[1]
+    engine = PrescreenEngine(index.query())
+    engines.set(current_token(), (index.version, engine), size=engine.nbytes)
+    return engine
+
+
+def init_app(app):
+    """Keep one encoded engine per matchmaker, for as long as their applicant index."""
+    app.extensions['prescreen_engines'] = TTLCache(
+        ttl=app.config['APPLICANT_INDEX_TTL'],
+        max_entries=app.config['APPLICANT_INDEX_MAX_ENTRIES'],
+        max_bytes=app.config['PRESCREEN_MAX_BYTES']
+    )
+    return app.extensions['prescreen_engines']
@@ -0,0 +1,285 @@
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+import click
+import hashlib
+import os
+import secrets
+import time
+import uuid
+from models.user import User
+from services import sqlite_db
+from services.cache import TTLCache
+
+serializer = TaggedJSONSerializer()
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries `sid`."""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        self.previous_key = None
+
+    @property
+    def key(self):
+        return session_key(self.sid) if self.sid else None
+
+    def regenerate(self):
+        """Move the data to a new session id and drop the old one (call on login and logout)."""
+        if self.sid:
+            self.previous_key = self.key
+        self.sid = None
+        self.modified = True
+
+
+def session_key(sid):
+    # Stores only see a hash, so a leaked store holds no usable cookie values
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+class MemorySessionStore:
+    """Sessions in this process only: an LRU bounded by entry count. Use with a single worker."""
+
+    def __init__(self, lifetime, max_entries=10000):
+        self.entries = TTLCache(ttl=lifetime, max_entries=max_entries)
+
+    def load(self, key):
+        return self.entries.get(key)
+
+    def save(self, key, payload, expires_at, user_id):
+        self.entries.set(key, (payload, expires_at, user_id))
+
+    def delete(self, key):
+        self.entries.delete(key)
+
+    def delete_user(self, user_id):
+        return self.entries.delete_where(lambda entry: entry[2] == user_id)
+
+
+class FileSystemSessionStore:
+    """One file per session, shared by the worker processes on a host."""
+
+    def __init__(self, folder, purge_interval=3600):
+        self.folder = folder
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, key)
+
+    def load(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                expires_at, user_id, payload = f.read().split('\n', 2)
+        except (OSError, ValueError):
+            return None
+        if float(expires_at) <= time.time():
+            self.delete(key)
+            return None
+        return payload, float(expires_at), user_id or None
+
+    def save(self, key, payload, expires_at, user_id):
+        path = self._path(key)
+        partial_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                f.write(f"{expires_at}\n{user_id or ''}\n{payload}")
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        self._maybe_purge()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_user(self, user_id):
+        deleted = 0
+        for key in os.listdir(self.folder):
+            entry = self.load(key)
+            if entry is not None and entry[2] == user_id:
+                self.delete(key)
+                deleted += 1
+        return deleted
+
+    def _maybe_purge(self):
+        if time.time() - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = time.time()
+        for key in os.listdir(self.folder):
+            if not key.endswith('.part'):
+                # load() removes expired files
+                self.load(key)
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite file, shared by the worker processes on a host."""
+
+    def __init__(self, path, purge_interval=3600):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with sqlite_db.connect(path) as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL, user_id TEXT);'
+                'CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user_id);'
+                'CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at);'
+            )
+
+    def load(self, key):
+        with sqlite_db.connect(self.path) as db:
+            row = db.execute(
+                'SELECT payload, expires_at, user_id FROM sessions WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def save(self, key, payload, expires_at, user_id):
+        with sqlite_db.connect(self.path) as db:
+            db.execute(
+                'INSERT OR REPLACE INTO sessions (key, payload, expires_at, user_id) VALUES (?, ?, ?, ?)',
+                (key, payload, expires_at, user_id)
+            )
+            if time.time() - self._purged_at >= self.purge_interval:
+                self._purged_at = time.time()
+                db.execute('DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+
+    def delete(self, key):
+        with sqlite_db.connect(self.path) as db:
+            db.execute('DELETE FROM sessions WHERE key = ?', (key,))
+
+    def delete_user(self, user_id):
+        with sqlite_db.connect(self.path) as db:
+            return db.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,)).rowcount
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface that keeps session data in `store`.
+
+    Sessions expire `lifetime` seconds after they were last written. An
+    unmodified session is re-written (extending it) once half of that has
+    passed, so active users stay logged in without a write per request.
+    Requests under `exempt_prefixes` (static files) get no session at all.
+    """
+
+    def __init__(self, store, lifetime, exempt_prefixes=()):
+        self.store = store
+        self.lifetime = lifetime
+        self.exempt_prefixes = tuple(exempt_prefixes)
+        # User objects built from session data, reused while the session lives
+        self.users = TTLCache(ttl=300, max_entries=10000)
+
+    def open_session(self, app, request):
+        if request.path.startswith(self.exempt_prefixes):
+            return None
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.store.load(session_key(sid))
+            if entry is not None:
+                payload, expires_at, _ = entry
+                return ServerSideSession(serializer.loads(payload), sid=sid, expires_at=expires_at)
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_key:
+            self.store.delete(session.previous_key)
+            self.users.delete(session.previous_key)
+
+        if not session:
+            if session.sid and session.modified:
+                self.store.delete(session.key)
+                self.users.delete(session.key)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        refresh = session.expires_at is not None and session.expires_at - now < self.lifetime / 2
+        if not (session.modified or refresh):
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        if session.modified:
+            self.users.delete(session.key)
+        user_id = session.get('_user_id')
+        self.store.save(session.key, serializer.dumps(dict(session)), now + self.lifetime,
+                        str(user_id) if user_id is not None else None)
+
+        response.vary.add('Cookie')
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def session_user(user_id):
+    """The logged-in User for this session, built once and reused across its requests."""
+    key = getattr(session, 'key', None)
+    users = current_app.session_interface.users
+    user = users.get(key) if key else None
+    if user is None:
+        user_data = session.get('user_data')
+        if not user_data:
+            return None
+        user = User.from_session(user_data)
+        if key:
+            users.set(key, user)
+    return user if user.get_id() == str(user_id) else None
+
+
+def create_store(app):
+    backend = app.config['SESSION_BACKEND']
+    lifetime = app.permanent_session_lifetime.total_seconds()
+    if backend == 'memory':
+        return MemorySessionStore(lifetime, max_entries=app.config['SESSION_MEMORY_MAX_ENTRIES'])
+    if backend == 'filesystem':
+        return FileSystemSessionStore(app.config['SESSION_FILE_FOLDER'])
+    if backend == 'sqlite':
+        return SQLiteSessionStore(app.config['SESSION_SQLITE_PATH'])
+    raise ValueError(f"Unknown SESSION_BACKEND {backend!r} (expected memory, filesystem or sqlite)")
+
+
+def init_app(app):
+    """Keep sessions server-side and add the `flask revoke-sessions` command."""
+    store = create_store(app)
+    static_prefix = (app.static_url_path or '/static').rstrip('/') + '/'
+    app.session_interface = ServerSessionInterface(
+        store,
+        lifetime=app.permanent_session_lifetime.total_seconds(),
+        exempt_prefixes=(static_prefix, '/assets/', '/media/', '/metrics')
+    )
+    app.extensions['session_users'] = app.session_interface.users
+
+    @app.cli.command('revoke-sessions')
+    @click.argument('matchmaker_id')
+    def revoke_sessions(matchmaker_id):
+        """Log a matchmaker out everywhere by deleting their sessions."""
+        deleted = store.delete_user(str(matchmaker_id))
+        click.echo(f"Revoked {deleted} session(s) for matchmaker {matchmaker_id}")
+
+    return app.session_interface
@@ -0,0 +1,47 @@
+from concurrent.futures import Future
+import threading
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers arriving while
+    it is in flight wait for and share its result (or exception). Nothing
+    is kept once the call finishes, so this only removes duplicates that
+    overlap in time; it is not a cache.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> Future of the in-flight call
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        # hits/misses so the metrics cache collector reports it alongside the caches
+        with self._lock:
+            return {'hits': self.shared, 'misses': self.calls, 'entries': len(self._calls)}
@@ -0,0 +1,25 @@
+import sqlite3
+
+
+class connect:
+    """`with connect(path) as db:` one autocommit SQLite connection.
+
+    A transaction opened inside the block (e.g. `BEGIN IMMEDIATE`) is
+    committed on success and rolled back on error. Connections are
+    short-lived, which keeps them safe to use from any thread or process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.db.in_transaction:
+                self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.db.close()
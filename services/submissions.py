@@ -0,0 +1,225 @@
+from flask import current_app
+import json
+import logging
+import os
+import threading
+import time
+import requests
+from services import sqlite_db
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    data TEXT NOT NULL,
+    picture_path TEXT,
+    picture_name TEXT,
+    picture_mimetype TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_due ON submissions (status, next_attempt_at);
+"""
+
+
+class SubmissionQueue:
+    """Durable queue of form posts waiting to be delivered to the backend.
+
+    Items live in a SQLite file (with any picture spooled next to it), so
+    they survive restarts and are shared by every worker process on the
+    host. Worker threads claim due items, POST them with an
+    `Idempotency-Key` header and delete them once the backend accepts.
+    Connection errors, 429 and 5xx responses are retried with exponential
+    backoff; other 4xx responses, or running out of attempts, mark the
+    item `failed` and keep it (and its picture) for inspection.
+
+    A claimed item is leased for `lease` seconds; if its worker dies, the
+    item becomes due again when the lease runs out.
+    """
+
+    def __init__(self, client, db_path, spool_folder, workers=2, max_attempts=12,
+                 backoff=5.0, max_backoff=600.0, lease=60.0, poll_interval=1.0):
+        self.client = client
+        self.db_path = db_path
+        self.spool_folder = spool_folder
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        os.makedirs(spool_folder, exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite_db.connect(self.db_path)
+
+    def enqueue(self, key, path, data, picture_path=None, picture_name=None, picture_mimetype=None):
+        """Store a submission for delivery. Returns False if `key` was already queued (a resubmit)."""
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO submissions '
+                '(idempotency_key, path, data, picture_path, picture_name, picture_mimetype, created_at, next_attempt_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, path, json.dumps(data), picture_path, picture_name, picture_mimetype, now, now)
+            )
+            added = cursor.rowcount == 1
+        if added:
+            self.start()
+            self._wakeup.set()
+        return added
+
+    def status(self, key):
+        """'pending' or 'failed' for a queued `key`, or None if it is not queued (never, or delivered)."""
+        with self._connect() as db:
+            row = db.execute('SELECT status FROM submissions WHERE idempotency_key = ?', (key,)).fetchone()
+        return row['status'] if row is not None else None
+
+    def start(self):
+        # Started lazily so no thread exists before a forking server spawns its workers
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'submission-queue-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            item = self._claim()
+            if item is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._deliver(item)
+
+    def _claim(self):
+        """Lease the oldest due item to this worker, or return None."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute(
+                "SELECT * FROM submissions WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                'UPDATE submissions SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?',
+                (now + self.lease, row['id'])
+            )
+        item = dict(row)
+        item['attempts'] += 1
+        return item
+
+    def _deliver(self, item):
+        error, retry = None, True
+        picture = None
+        try:
+            files = {}
+            if item['picture_path']:
+                picture = open(item['picture_path'], 'rb')
+                files = {'picture': (item['picture_name'], picture, item['picture_mimetype'])}
+            response = self.client.post(
+                item['path'],
+                data=json.loads(item['data']),
+                files=files,
+                headers={'Idempotency-Key': item['idempotency_key']}
+            )
+            if response.status_code < 300:
+                self._delivered(item)
+                return
+            error = f"{item['path']} returned status {response.status_code}"
+            retry = response.status_code == 429 or response.status_code >= 500
+        except (requests.exceptions.RequestException, OSError) as e:
+            error = str(e)
+            # A spooled picture that has gone missing will not come back
+            retry = isinstance(e, requests.exceptions.RequestException)
+        finally:
+            if picture is not None:
+                picture.close()
+
+        if retry and item['attempts'] < self.max_attempts:
+            delay = min(self.backoff * 2 ** (item['attempts'] - 1), self.max_backoff)
+            with self._connect() as db:
+                db.execute(
+                    'UPDATE submissions SET next_attempt_at = ?, last_error = ? WHERE id = ?',
+                    (time.time() + delay, error, item['id'])
+                )
+            self.retries += 1
+            logger.warning("Submission %s failed: %s (attempt %d/%d, retrying in %.0fs)",
+                           item['idempotency_key'], error, item['attempts'], self.max_attempts, delay)
+        else:
+            with self._connect() as db:
+                db.execute("UPDATE submissions SET status = 'failed', last_error = ? WHERE id = ?", (error, item['id']))
+            self.failed += 1
+            logger.error("Submission %s failed permanently after %d attempts: %s",
+                         item['idempotency_key'], item['attempts'], error)
+
+    def _delivered(self, item):
+        with self._connect() as db:
+            db.execute('DELETE FROM submissions WHERE id = ?', (item['id'],))
+        if item['picture_path'] and os.path.exists(item['picture_path']):
+            os.remove(item['picture_path'])
+        self.delivered += 1
+
+    def stats(self):
+        """Queue depth and age, read from the shared database so every worker reports the same values."""
+        with self._connect() as db:
+            rows = db.execute(
+                'SELECT status, COUNT(*) AS depth, MIN(created_at) AS oldest FROM submissions GROUP BY status'
+            ).fetchall()
+        now = time.time()
+        by_status = {row['status']: row for row in rows}
+        pending = by_status.get('pending')
+        return {
+            'depth': pending['depth'] if pending else 0,
+            'failed_depth': by_status['failed']['depth'] if 'failed' in by_status else 0,
+            'oldest_age': now - pending['oldest'] if pending else 0.0,
+            'delivered': self.delivered,
+            'retries': self.retries,
+            'failed': self.failed
+        }
+
+
+def init_app(app):
+    queue = SubmissionQueue(
+        app.extensions['api_client'],
+        db_path=app.config['SUBMISSION_QUEUE_PATH'],
+        spool_folder=app.config['SUBMISSION_SPOOL_FOLDER'],
+        workers=app.config['SUBMISSION_WORKERS'],
+        max_attempts=app.config['SUBMISSION_MAX_ATTEMPTS'],
+        backoff=app.config['SUBMISSION_RETRY_BACKOFF'],
+        max_backoff=app.config['SUBMISSION_MAX_BACKOFF']
+    )
+    app.extensions['submission_queue'] = queue
+
+    @app.before_request
+    def start_submission_workers():
+        # Items left over from a previous run are delivered without waiting for a new submission
+        queue.start()
+
+    return queue
+
+
+def submission_queue():
+    return current_app.extensions['submission_queue']
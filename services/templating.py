@@ -0,0 +1,89 @@
+import logging
+import os
+from flask import current_app, g
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.exceptions import TemplateError
+from jinja2.ext import Extension
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class FragmentCacheExtension(Extension):
+    """`{% cache key, ... %}...{% endcache %}` keeps a rendered block for reuse.
+
+    The block is rendered once per key and served from `fragment_cache`
+    (set on the environment) until it expires. The key is the template name
+    and line of the tag plus the given expressions, so it must include
+    everything the block shows that can change, e.g. a match card:
+
+        {% cache current_user.id, match.user_a.id, match.user_b.id, match.score %}
+
+    Blocks render normally when no cache is set or the app is in debug mode.
+    A request stores at most `fragment_cache_store_limit` new blocks (reads
+    are not limited), so a long streamed list does not keep every card it
+    renders in memory.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_store_limit=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const(parser.name), nodes.Const(lineno), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', [nodes.Tuple(key, 'load')]), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or current_app.debug:
+            return caller()
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            stored = g.get('fragments_stored', 0)
+            limit = self.environment.fragment_cache_store_limit
+            if limit is None or stored < limit:
+                cache.set(key, fragment, size=len(fragment))
+                g.fragments_stored = stored + 1
+        return fragment
+
+
+def precompile(app):
+    """Compile every template now, so the first requests do not pay for it.
+
+    Compiled templates stay in the environment's in-memory cache; with a
+    bytecode cache, workers started later load the compiled code from disk.
+    """
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except TemplateError:
+            logger.exception("Could not precompile template %s", name)
+    logger.info("Precompiled %d templates", compiled)
+    return compiled
+
+
+def init_app(app):
+    """Set up the bytecode cache and the `{% cache %}` fragment cache for this app's templates."""
+    folder = app.config['TEMPLATE_CACHE_FOLDER']
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(folder)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config['FRAGMENT_CACHE_TTL'] > 0:
+        app.jinja_env.fragment_cache = TTLCache(
+            ttl=app.config['FRAGMENT_CACHE_TTL'],
+            max_entries=app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+            max_bytes=app.config['FRAGMENT_CACHE_MAX_BYTES']
+        )
+        app.jinja_env.fragment_cache_store_limit = app.config['FRAGMENT_CACHE_MAX_PER_REQUEST']
+        app.extensions['fragment_cache'] = app.jinja_env.fragment_cache
@@ -0,0 +1,40 @@
+import os
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """The upload went over its size cap while being written."""
+
+
+def save_upload(file, directory, filename, max_bytes):
+    """Stream an uploaded file to `directory/filename` in chunks.
+
+    The size cap is checked as bytes arrive, so an oversized upload is
+    never held in memory and its partial file is removed. The file only
+    appears under its final name once it is complete. Returns the path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    final_path = os.path.join(directory, filename)
+    partial_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+
+    written = 0
+    try:
+        with open(partial_path, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(partial_path, final_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return final_path
@@ -9,6 +9,9 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize Bootstrap tooltips and popovers
     initBootstrapComponents();
+    
+    // Applicant search box in the navbar
+    initApplicantSearch();
 });
 
 /**
@@ -102,14 +105,14 @@ function initBootstrapComponents() {
  */
 function initMatchFilters() {
     const matchMinScore = document.getElementById('matchMinScore');
-    const matchCards = document.querySelectorAll('.match-card');
     
-    if (matchMinScore && matchCards.length > 0) {
-        matchMinScore.addEventListener('input', function() {
-            const minScore = parseInt(this.value);
+    if (matchMinScore) {
+        function applyMinScore() {
+            const minScore = parseInt(matchMinScore.value);
             document.getElementById('scoreValue').textContent = minScore;
             
-            matchCards.forEach(card => {
+            // Queried each time: cards are added while the list scrolls
+            document.querySelectorAll('.match-card').forEach(card => {
                 const score = parseInt(card.getAttribute('data-score'));
                 if (score >= minScore) {
                     card.style.display = '';
@@ -117,6 +120,373 @@ function initMatchFilters() {
                     card.style.display = 'none';
                 }
             });
+        }
+        
+        matchMinScore.addEventListener('input', applyMinScore);
+        document.addEventListener('list:updated', applyMinScore);
+    }
+}
+
+/**
+ * Infinite scroll and in-place refresh for a server-rendered list.
+ *
+ * `list` carries data-url (its JSON endpoint, e.g. /matches/data?limit=50)
+ * and data-page (the last page already rendered); `sentinel` is the element
+ * after the list, with data-has-next. When the sentinel scrolls into view the
+ * next page is fetched and `renderItem` turns each item into HTML. Returns an
+ * object whose refresh(params) reloads the list from page 1 in place, with
+ * `params` (e.g. filters) added to the query. A 'list:updated' event is
+ * dispatched on the list after every load. If a load fails, the list stops
+ * growing and any element with data-list-fallback (e.g. pagination links) is
+ * shown again.
+ */
+function initInfiniteList(list, sentinel, itemsKey, renderItem, emptyHtml) {
+    let page = parseInt(list.dataset.page || '1');
+    let hasNext = sentinel.dataset.hasNext === 'true';
+    let params = {};
+    let loading = null;
+    let generation = 0;
+    
+    document.querySelectorAll('[data-list-fallback="' + list.id + '"]').forEach(el => el.classList.add('d-none'));
+    
+    function pageUrl(number) {
+        const url = new URL(list.dataset.url, window.location.origin);
+        url.searchParams.set('page', number);
+        Object.entries(params).forEach(([key, value]) => {
+            if (value) {
+                url.searchParams.set(key, value);
+            } else {
+                url.searchParams.delete(key);
+            }
         });
+        return url;
+    }
+    
+    async function load(number, replace) {
+        const current = ++generation;
+        try {
+            // A login redirect or an error page is not JSON: fall back to the links
+            const response = await fetch(pageUrl(number), {headers: {'Accept': 'application/json'}});
+            if (!response.ok || response.redirected) {
+                throw new Error('HTTP ' + response.status);
+            }
+            const data = await response.json();
+            if (current !== generation) {
+                return;  // a refresh started meanwhile; its result wins
+            }
+            const html = data[itemsKey].map(renderItem).join('');
+            if (replace) {
+                list.innerHTML = html || emptyHtml;
+            } else {
+                list.insertAdjacentHTML('beforeend', html);
+            }
+            page = data.page;
+            hasNext = data.has_next;
+            list.dispatchEvent(new CustomEvent('list:updated', {bubbles: true, detail: data}));
+        } catch (error) {
+            console.warn('Could not load ' + list.id + ' page ' + number, error);
+            hasNext = false;
+            document.querySelectorAll('[data-list-fallback="' + list.id + '"]').forEach(el => el.classList.remove('d-none'));
+        }
     }
-} 
\ No newline at end of file
+    
+    function loadNext() {
+        if (hasNext && !loading) {
+            loading = load(page + 1, false).finally(() => {
+                loading = null;
+                // Still in view (short page or fast scroll): keep going
+                if (sentinelVisible) {
+                    loadNext();
+                }
+            });
+        }
+    }
+    
+    let sentinelVisible = false;
+    new IntersectionObserver(entries => {
+        sentinelVisible = entries[0].isIntersecting;
+        if (sentinelVisible) {
+            loadNext();
+        }
+    }, {rootMargin: '600px'}).observe(sentinel);
+    
+    return {
+        refresh(newParams) {
+            if (newParams) {
+                params = newParams;
+            }
+            loading = load(1, true).finally(() => {
+                loading = null;
+            });
+            return loading;
+        }
+    };
+}
+
+/**
+ * HTML-escape a value for the card templates below
+ */
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+}
+
+function displayName(user) {
+    return user.name || ((user.first_name || '') + ' ' + (user.last_name || '')).trim();
+}
+
+function displayLocation(user) {
+    return user.current_location || [user.city, user.country].filter(Boolean).join(', ');
+}
+
+const RELIGIOUS_LEVELS = {
+    secular: 'Secular/Hiloni',
+    traditional: 'Traditional/Masorti',
+    modern_orthodox: 'Modern Orthodox/Dati',
+    yeshivish: 'Yeshivish',
+    hassidic: 'Hassidic/Hasidi'
+};
+
+/**
+ * A match card for matches/index.html, from a /matches/data item (same markup as the template)
+ */
+function matchCardHtml(match) {
+    const score = match.score || 0;
+    const level = score >= 75 ? 'high' : score >= 50 ? 'medium' : 'low';
+    const side = (user, title) => `
+                        <div class="col-6">
+                            <div class="card mb-3">
+                                <div class="card-body p-3">
+                                    <h6 class="card-subtitle mb-2 text-muted">${title}</h6>
+                                    <h5 class="card-title">${escapeHtml(displayName(user))}</h5>
+                                    <p class="card-text mb-1">
+                                        <small class="text-muted">Age:</small> ${escapeHtml(user.age)}
+                                    </p>
+                                    <p class="card-text mb-0">
+                                        <small class="text-muted">Location:</small> 
+                                        ${escapeHtml(displayLocation(user))}
+                                    </p>
+                                </div>
+                            </div>
+                        </div>`;
+    return `
+        <div class="col-12 col-lg-6 mb-4 match-card" data-score="${escapeHtml(score)}">
+            <div class="card shadow-sm">
+                <div class="card-body">
+                    <div class="d-flex justify-content-between align-items-center mb-3">
+                        <h5 class="card-title mb-0">Potential Match</h5>
+                        <div class="match-score ${level}">
+                            ${escapeHtml(score)}%
+                        </div>
+                    </div>
+                    
+                    <div class="row">${side(match.user_a, 'Your Applicant')}${side(match.user_b, 'Potential Match')}
+                    </div>
+                    
+                    <div class="d-flex justify-content-between">
+                        <a href="/matches/compatibility/${encodeURIComponent(match.user_a.id)}/${encodeURIComponent(match.user_b.id)}" class="btn btn-primary">
+                            <i class="fas fa-search me-1"></i> View Compatibility
+                        </a>
+                        <button type="button" class="btn btn-outline-secondary">
+                            <i class="fas fa-star me-1"></i> Save Match
+                        </button>
+                    </div>
+                </div>
+                <div class="card-footer bg-light text-muted">
+                    <small>Match found on ${escapeHtml(match.date_created || 'recent date')}</small>
+                </div>
+            </div>
+        </div>`;
+}
+
+/**
+ * A match card for matches/user_matches.html, from a /matches/user/<id>/data item
+ */
+function userMatchCardHtml(userId, match) {
+    const other = match.user_b;
+    const compatibility = match.compatibility || {};
+    const bar = (label, item, color, details) => item ? `
+                                <div class="mb-2">
+                                    <small class="text-muted">${label}:</small>
+                                    <div class="progress mb-1" style="height: 6px;">
+                                        <div class="progress-bar ${color}" style="width: ${escapeHtml(item.score)}%"></div>
+                                    </div>
+                                    <small>${escapeHtml(item.score)}%</small>${details || ''}
+                                </div>` : '';
+    const religious = compatibility.religious_compatibility;
+    const religiousDetails = religious && religious.details ? `
+                                    <div class="mt-1">${religious.details.kosher ? `
+                                        <small class="d-block text-muted">Kosher: ${escapeHtml(religious.details.kosher)}</small>` : ''}${religious.details.shabbat ? `
+                                        <small class="d-block text-muted">Shabbat: ${escapeHtml(religious.details.shabbat)}</small>` : ''}
+                                    </div>` : '';
+    const breakdown = Object.keys(compatibility).length ? `
+                            <div class="compatibility-details">
+                                <h6 class="text-muted mb-2">Compatibility Breakdown:</h6>${bar('Religious Compatibility', religious, 'bg-info', religiousDetails)}${bar('Family Compatibility', compatibility.family_compatibility, 'bg-success')}
+                            </div>` : '';
+    return `
+                <div class="col-md-6 col-lg-4 mb-4">
+                    <div class="card h-100">
+                        <div class="card-header d-flex justify-content-between align-items-center">
+                            <h6 class="mb-0">${escapeHtml(other.name)}</h6>
+                            <span class="badge bg-primary">${Number(match.compatibility_score || 0).toFixed(1)}%</span>
+                        </div>
+                        <div class="card-body">
+                            <div class="mb-3">
+                                <p class="mb-1"><strong>Age:</strong> ${escapeHtml(other.age)}</p>
+                                <p class="mb-1"><strong>Gender:</strong> ${escapeHtml(other.gender)}</p>
+                                <p class="mb-1"><strong>Location:</strong> ${escapeHtml(other.current_location)}</p>
+                            </div>${breakdown}
+                        </div>
+                        <div class="card-footer">
+                            <div class="btn-group w-100" role="group">
+                                <a href="/users/${encodeURIComponent(other.id)}" class="btn btn-outline-primary btn-sm">
+                                    <i class="fas fa-eye me-1"></i> View
+                                </a>
+                                <a href="/matches/compatibility/${encodeURIComponent(userId)}/${encodeURIComponent(other.id)}" class="btn btn-outline-info btn-sm">
+                                    <i class="fas fa-chart-line me-1"></i> Details
+                                </a>
+                            </div>
+                        </div>
+                    </div>
+                </div>`;
+}
+
+/**
+ * An applicant card for users/index.html, from a /users/data item (same markup as the template)
+ */
+function userCardHtml(user) {
+    const name = escapeHtml(user.name);
+    const picture = user.thumbnail ? `
+                                <picture>${user.thumbnail.webp ? `
+                                    <source srcset="${escapeHtml(user.thumbnail.webp)}" type="image/webp">` : ''}
+                                    <img src="${escapeHtml(user.thumbnail.jpg)}" alt="${name}" class="rounded-circle me-2 object-fit-cover" width="48" height="48" loading="lazy" decoding="async">
+                                </picture>` : '';
+    const religious = user.religious_level ? `
+                        <p class="card-text mb-3">
+                            <small class="text-muted"><i class="fas fa-pray me-1"></i> Religious Level:</small>
+                            <span class="religious-badge ${escapeHtml(user.religious_level)}">
+                                ${escapeHtml(RELIGIOUS_LEVELS[user.religious_level] || user.religious_level.charAt(0).toUpperCase() + user.religious_level.slice(1).toLowerCase())}
+                            </span>
+                        </p>` : '';
+    const id = encodeURIComponent(user.id);
+    return `
+            <div class="col user-card" 
+                 data-name="${name}" 
+                 data-gender="${escapeHtml(user.gender)}"
+                 data-religious="${escapeHtml(user.religious_level)}">
+                <div class="card h-100 shadow-sm">
+                    <div class="card-body">
+                        <div class="d-flex justify-content-between align-items-center mb-2">${picture}
+                            <h5 class="card-title mb-0 me-auto">${name}</h5>
+                            <span class="badge ${user.gender === 'Male' ? 'bg-primary' : 'bg-danger'}">
+                                ${escapeHtml(user.gender)}
+                            </span>
+                        </div>
+                        
+                        <p class="card-text mb-1">
+                            <small class="text-muted"><i class="fas fa-calendar-alt me-1"></i> Age:</small> ${escapeHtml(user.age)}
+                        </p>
+                        ${user.height ? `
+                        <p class="card-text mb-1">
+                            <small class="text-muted"><i class="fas fa-ruler-vertical me-1"></i> Height:</small> ${escapeHtml(user.height)} cm
+                        </p>` : ''}
+                        
+                        <p class="card-text mb-1">
+                            <small class="text-muted"><i class="fas fa-map-marker-alt me-1"></i> Location:</small> 
+                            ${escapeHtml(displayLocation(user))}
+                        </p>
+                        ${religious}
+                        
+                        <div class="d-flex justify-content-between">
+                            <a href="/users/${id}" class="btn btn-sm btn-outline-primary">
+                                <i class="fas fa-eye me-1"></i> View
+                            </a>
+                            <a href="/matches/user/${id}" class="btn btn-sm btn-outline-success">
+                                <i class="fas fa-handshake me-1"></i> Matches
+                            </a>
+                            <a href="/users/${id}/edit" class="btn btn-sm btn-outline-secondary">
+                                <i class="fas fa-edit me-1"></i> Edit
+                            </a>
+                        </div>
+                    </div>
+                </div>
+            </div>`;
+} 
+
+/**
+ * Typeahead for the navbar applicant search.
+ *
+ * Results come from /users/search while typing (debounced; a newer query
+ * aborts the one in flight) and link to the applicant. Arrow keys move
+ * through them and Escape closes them. Submitting the form still goes to
+ * the applicants list filtered by name.
+ */
+function initApplicantSearch() {
+    const input = document.getElementById('applicantSearchInput');
+    const results = document.getElementById('applicantSearchResults');
+    if (!input || !results) {
+        return;
+    }
+    let typing = null;
+    let controller = null;
+    
+    function hide() {
+        results.classList.remove('show');
+        results.innerHTML = '';
+    }
+    
+    async function lookup() {
+        const text = input.value.trim();
+        if (controller) {
+            controller.abort();
+        }
+        if (text.length < 2) {
+            hide();
+            return;
+        }
+        controller = new AbortController();
+        const url = new URL(input.dataset.searchUrl, window.location.origin);
+        url.searchParams.set('q', text);
+        try {
+            const response = await fetch(url, {headers: {'Accept': 'application/json'}, signal: controller.signal});
+            if (!response.ok || response.redirected) {
+                hide();
+                return;
+            }
+            const data = await response.json();
+            results.innerHTML = data.results.map(user => `
+                <a class="dropdown-item" href="${escapeHtml(user.url)}">
+                    <strong>${escapeHtml(user.name)}</strong>
+                    <small class="d-block text-muted">${[user.age, user.city, user.occupation].filter(Boolean).map(escapeHtml).join(' &middot; ')}</small>
+                </a>`).join('') || '<span class="dropdown-item-text text-muted">No applicants found</span>';
+            results.classList.add('show');
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                hide();
+            }
+        }
+    }
+    
+    input.addEventListener('input', function() {
+        clearTimeout(typing);
+        typing = setTimeout(lookup, 150);
+    });
+    input.form.addEventListener('keydown', function(event) {
+        const items = Array.from(results.querySelectorAll('.dropdown-item'));
+        const current = items.indexOf(document.activeElement);
+        if (event.key === 'Escape') {
+            hide();
+            input.focus();
+        } else if (event.key === 'ArrowDown' && items.length) {
+            event.preventDefault();
+            items[Math.min(current + 1, items.length - 1)].focus();
+        } else if (event.key === 'ArrowUp' && current >= 0) {
+            event.preventDefault();
+            (current === 0 ? input : items[current - 1]).focus();
+        }
+    });
+    document.addEventListener('click', function(event) {
+        if (!input.form.contains(event.target)) {
+            hide();
+        }
+    });
+}